@@ -1,28 +1,222 @@
-
-from typing import List, Dict
-from openai import AzureOpenAI
+import logging
+import time
+from typing import AsyncIterator, List, Dict, Optional
 from config import HuggingFaceConfig
+from metrics import LLM_ERRORS
+from prompts import rag_user_prompt_template
+from rag.context import EMPTY_CONTEXT, pack_context
+from rag.vector_store import VectorStore
+from .llm_gateway import LLMError, LLMGateway
+
+logger = logging.getLogger(__name__)
+
+# Role of the pseudo-turn that carries the rolling summary in a history list
+# (see agents.history.HistoryCompactor.view)
+SUMMARY_ROLE = "summary"
+
+
+def format_history(history: List[Dict], max_turns: Optional[int] = None) -> str:
+    """
+    Render the turns of history, or only the last max_turns of them; a
+    rolling summary pseudo-turn (see agents.history.HistoryCompactor.view)
+    is always kept in front. view() already bounds the history and only
+    returns turns the summary does not cover, so RAG agents render all.
+    """
+    summaries = [t for t in history if t.get("role") == SUMMARY_ROLE]
+    turns = [t for t in history if t.get("role") != SUMMARY_ROLE]
+    if max_turns is not None:
+        turns = turns[-max_turns:] if max_turns > 0 else []
+    parts = [f"summary of earlier conversation: {t['content']}" for t in summaries]
+    for turn in turns:
+        role = turn.get("role", "user")
+        content = turn.get("content", "")
+        parts.append(f"{role}: {content}")
+    return "\n".join(parts)
+
 
 class BaseAgent:
-    def __init__(self, client: AzureOpenAI, cfg: HuggingFaceConfig):
+    """
+    Answers a message in one LLM call: retrieve() (nothing by default),
+    build_messages(), then the gateway. Subclasses set name, log_tag and
+    topic and implement build_messages().
+    """
+    # Label used for this agent in metrics
+    name = "agent"
+    # Prefix of this agent's log lines, e.g. "[LOAN]"
+    log_tag = "[AGENT]"
+    # Logged when a query is handled
+    topic = "query"
+
+    def __init__(self, client: LLMGateway, cfg: HuggingFaceConfig):
         self.client = client
         self.cfg = cfg
 
+    @property
+    def retrieval_key(self) -> Optional[tuple]:
+        """
+        Identifies how this agent retrieves; agents with equal keys get
+        identical contexts for the same message. None = no retrieval.
+        """
+        return None
+
+    def retrieve(self, user_message: str) -> Dict:
+        """
+        Packed prompt context for a message (see rag.context.pack_context).
+        Agents without RAG return an empty context.
+        """
+        return EMPTY_CONTEXT
+
+    async def aretrieve(self, user_message: str) -> Dict:
+        return EMPTY_CONTEXT
+
     def chat_completion(self, messages: List[Dict]) -> str:
         """
-        Simple wrapper for Azure OpenAI chat completion.
+        Blocking chat completion through the LLM gateway.
+        Raises LLMError (or a subclass) when no answer could be produced.
         """
-        print(f"[AGENT] Calling Hugging Face model: {self.cfg.chat_model}")
+        logger.debug("[AGENT] Calling model: %s", self.cfg.chat_model)
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.cfg.chat_model,
-                messages=messages,
-                # temperature=temperature,
-            )
-            text = response.choices[0].message.content
-            print("[AGENT] LLM call successful.")
-            return text
-        except Exception as e:
-            print(f"[AGENT][ERROR] LLM call failed: {e}")
-            return "Sorry, something went wrong while generating a response."
+            text = self.client.chat(messages)
+        except LLMError as e:
+            self._record_error(e)
+            raise
+        logger.debug("[AGENT] LLM call successful.")
+        return text
+
+    async def achat_completion(self, messages: List[Dict]) -> str:
+        """
+        Async chat completion; awaits the model without holding a thread.
+        """
+        logger.debug("[AGENT] Calling model (async): %s", self.cfg.chat_model)
+
+        try:
+            text = await self.client.achat(messages)
+        except LLMError as e:
+            self._record_error(e)
+            raise
+        logger.debug("[AGENT] LLM call successful.")
+        return text
+
+    async def astream_completion(self, messages: List[Dict]) -> AsyncIterator[str]:
+        """
+        Async chat completion that yields answer tokens as they arrive.
+        """
+        logger.debug("[AGENT] Streaming from model: %s", self.cfg.chat_model)
+
+        try:
+            async for token in self.client.astream(messages):
+                yield token
+        except LLMError as e:
+            self._record_error(e)
+            raise
+        logger.debug("[AGENT] LLM stream completed.")
+
+    def _record_error(self, exc: LLMError):
+        logger.error(f"[AGENT] LLM call failed ({exc.kind}): {exc}")
+        LLM_ERRORS.labels(agent=self.name, kind=exc.kind).inc()
+
+    def build_messages(self, user_message: str, history: List[Dict],
+                       context: Dict) -> List[Dict]:
+        raise NotImplementedError
+
+    def answer(self, user_message: str, history: List[Dict], context: Dict) -> str:
+        messages = self.build_messages(user_message, history, context)
+        answer = self.chat_completion(messages)
+        logger.debug("%s Generated answer.", self.log_tag)
+        return answer
+
+    async def aanswer(self, user_message: str, history: List[Dict],
+                      context: Dict) -> str:
+        messages = self.build_messages(user_message, history, context)
+        answer = await self.achat_completion(messages)
+        logger.debug("%s Generated answer.", self.log_tag)
+        return answer
+
+    def handle(self, user_message: str, history: List[Dict]) -> str:
+        logger.debug("%s Handling %s...", self.log_tag, self.topic)
+        context = self.retrieve(user_message)
+        return self.answer(user_message, history, context)
+
+    async def ahandle(self, user_message: str, history: List[Dict]) -> str:
+        logger.debug("%s Handling %s...", self.log_tag, self.topic)
+        context = await self.aretrieve(user_message)
+        return await self.aanswer(user_message, history, context)
+
+    async def astream_answer(self, user_message: str, history: List[Dict],
+                             context: Dict) -> AsyncIterator[str]:
+        """
+        Streaming counterpart of aanswer(); yields answer tokens.
+        """
+        messages = self.build_messages(user_message, history, context)
+        async for token in self.astream_completion(messages):
+            yield token
+
+
+class RAGAgent(BaseAgent):
+    """
+    Agent that answers from retrieved document context. Subclasses set
+    name, system_prompt, log_tag and topic; retrieval and prompting are
+    shared.
+    """
+    system_prompt = ""
+    log_tag = "[RAG]"
+
+    def __init__(self, client, cfg, vector_store: VectorStore,
+                 retrieval_mode: str = "dense", k: int = 3,
+                 context_token_budget: int = 1500):
+        super().__init__(client, cfg)
+        self.vector_store = vector_store
+        # "dense", "lexical" or "hybrid" (see VectorStore.search)
+        self.retrieval_mode = retrieval_mode
+        self.k = k
+        self.context_token_budget = context_token_budget
+
+    @property
+    def retrieval_key(self) -> tuple:
+        return (id(self.vector_store), self.retrieval_mode, self.k,
+                self.context_token_budget)
+
+    def retrieve(self, user_message: str) -> Dict:
+        # RAG: retrieve documents
+        timings: Dict = {}
+        hits = self.vector_store.search(
+            user_message, k=self.k, mode=self.retrieval_mode, timings=timings
+        )
+        return self._pack(hits, timings)
+
+    async def aretrieve(self, user_message: str) -> Dict:
+        timings: Dict = {}
+        hits = await self.vector_store.asearch(
+            user_message, k=self.k, mode=self.retrieval_mode, timings=timings
+        )
+        return self._pack(hits, timings)
+
+    def _pack(self, hits: List[Dict], timings: Dict) -> Dict:
+        started = time.perf_counter()
+        context = pack_context(hits, self.context_token_budget)
+        timings["context_build_ms"] = (time.perf_counter() - started) * 1000
+        # per-stage retrieval timings travel with the context
+        context["stage_ms"] = timings
+        logger.debug(
+            "%s Context: %d chunk(s) -> %d span(s), ~%d tokens (%d saved)",
+            self.log_tag, context["chunks"], context["spans"], context["tokens"],
+            context["tokens_saved"],
+        )
+        return context
+
+    def build_messages(self, user_message: str, history: List[Dict],
+                       context: Dict) -> List[Dict]:
+        history_text = format_history(history)
+
+        user_prompt = rag_user_prompt_template.format(
+            context=context["text"],
+            history=history_text,
+            question=user_message,
+        )
+
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+        return messages
@@ -0,0 +1,133 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from .base_agent import SUMMARY_ROLE, BaseAgent
+from prompts import history_summary_system_prompt, history_summary_user_template
+from rag.context import estimate_tokens, truncate_to_tokens
+from session_store import SessionStore
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryCompactor(BaseAgent):
+    """
+    Keeps prompt history bounded for long conversations.
+
+    Turns older than the last keep_recent are folded into a rolling
+    per-session summary (kept in the session store) by a background
+    thread, once at least summarize_every of them have piled up. The
+    agents get view(): the summary as a pseudo-turn followed by the
+    unsummarized recent turns, cut to token_budget.
+    """
+
+    name = "history"
+
+    def __init__(self, client, cfg, sessions: SessionStore,
+                 keep_recent: int = 4, summarize_every: int = 4,
+                 token_budget: int = 800, enabled: bool = True):
+        super().__init__(client, cfg)
+        self.sessions = sessions
+        self.keep_recent = keep_recent
+        self.summarize_every = max(summarize_every, 1)
+        self.token_budget = token_budget
+        self.enabled = enabled
+
+        # One background thread: summaries are cheap to delay, and this
+        # keeps them from competing with request-path LLM calls
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history")
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self.summaries = 0
+        self.failures = 0
+
+    def view(self, session_id: str, turns: List[Dict]) -> List[Dict]:
+        """
+        History for the agents from the recent turns of a session.
+        """
+        summary = self.sessions.get_summary(session_id) if self.enabled else None
+        if summary is not None:
+            turns = [t for t in turns if t.get("seq", -1) > summary["upto_seq"]]
+
+        budget = self.token_budget
+        head: List[Dict] = []
+        if summary is not None:
+            text = summary["summary"]
+            # the summary may use at most half of the budget
+            if estimate_tokens(text) > budget // 2:
+                text = truncate_to_tokens(text, budget // 2)
+            head.append({"role": SUMMARY_ROLE, "content": text, "agent": None})
+            budget -= estimate_tokens(text)
+
+        # Newest turns first; a turn that does not fit is truncated and
+        # everything older is left out
+        kept: List[Dict] = []
+        for turn in reversed(turns):
+            cost = estimate_tokens(turn.get("content") or "")
+            if cost > budget:
+                if budget >= 16:
+                    kept.append(dict(turn, content=truncate_to_tokens(turn["content"], budget)))
+                break
+            kept.append(turn)
+            budget -= cost
+        return head + kept[::-1]
+
+    def schedule(self, session_id: str):
+        """
+        Queue a summary update for the session if enough old turns are waiting.
+        Called after each finished turn; never blocks on the LLM.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if session_id in self._in_flight:
+                return
+            self._in_flight.add(session_id)
+        self.executor.submit(self._summarize, session_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            in_flight = len(self._in_flight)
+        return {
+            "enabled": self.enabled,
+            "summaries": self.summaries,
+            "failures": self.failures,
+            "in_flight": in_flight,
+        }
+
+    def _summarize(self, session_id: str):
+        try:
+            summary = self.sessions.get_summary(session_id)
+            upto = summary["upto_seq"] if summary is not None else -1
+            turns = [t for t in self.sessions.load(session_id) if t["seq"] > upto]
+            old = turns[:-self.keep_recent] if self.keep_recent > 0 else turns
+            if len(old) < self.summarize_every:
+                return
+
+            turns_text = "\n".join(f"{t['role']}: {t['content']}" for t in old)
+            messages = [
+                {"role": "system", "content": history_summary_system_prompt},
+                {
+                    "role": "user",
+                    "content": history_summary_user_template.format(
+                        summary=summary["summary"] if summary is not None else "(none)",
+                        turns=turns_text,
+                    ),
+                },
+            ]
+            text = self.chat_completion(messages).strip()
+            if not text:
+                self.failures += 1
+                return
+            self.sessions.set_summary(session_id, text, old[-1]["seq"])
+            self.summaries += 1
+            logger.debug(
+                "[HISTORY] Summarized %d turn(s) of session %s (up to seq=%d)",
+                len(old), session_id, old[-1]["seq"],
+            )
+        except Exception as exc:
+            self.failures += 1
+            logger.error(f"[HISTORY] Summary update failed for {session_id}: {exc}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(session_id)
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from prompts import intent_router_examples
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingIntentRouter:
+    """
+    Local intent classifier using the MiniLM sentence embeddings.
+
+    Each intent is represented by the normalized centroid of its labelled
+    examples; a message is assigned to the closest centroid. Confidence
+    is the softmax probability of the winning intent over the
+    temperature-scaled cosine similarities.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        examples: Dict[str, List[str]] = intent_router_examples,
+        temperature: float = 0.05,
+        executor: Optional[Executor] = None,
+    ):
+        self.embed_fn = embed_fn
+        # Where aclassify() runs the CPU-bound embedding (None = loop default)
+        self.executor = executor
+        self.examples = examples
+        self.temperature = temperature
+        self.labels: List[str] = []
+        self.centroids = None
+
+    def fit(self):
+        """
+        Embed the labelled examples and compute one centroid per intent.
+        """
+        logger.info("[ROUTER] Building intent centroids...")
+        labels = list(self.examples)
+        centroids = []
+        for label in labels:
+            vectors = np.asarray(self.embed_fn(self.examples[label]), dtype=np.float32)
+            centroid = vectors.mean(axis=0)
+            centroids.append(centroid / np.linalg.norm(centroid))
+        self.labels = labels
+        self.centroids = np.stack(centroids)
+        logger.info(f"[ROUTER] Centroids ready for intents: {labels}")
+        return self
+
+    def classify(self, user_message: str) -> Dict:
+        """
+        Returns {"intent", "confidence", "scores", "latency_ms"}.
+        """
+        if self.centroids is None:
+            self.fit()
+
+        start = time.perf_counter()
+        query = np.asarray(self.embed_fn([user_message])[0], dtype=np.float32)
+        sims = self.centroids @ query
+
+        logits = sims / self.temperature
+        probs = np.exp(logits - logits.max())
+        probs /= probs.sum()
+        best = int(np.argmax(probs))
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        return {
+            "intent": self.labels[best],
+            "confidence": float(probs[best]),
+            "scores": {
+                label: round(float(sim), 4)
+                for label, sim in zip(self.labels, sims)
+            },
+            "latency_ms": latency_ms,
+        }
+
+    async def aclassify(self, user_message: str) -> Dict:
+        """
+        Async classify(), executed off the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.classify, user_message)
@@ -0,0 +1,427 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+import aiohttp
+
+from config import UNUSED_API_TOKEN, HuggingFaceConfig, LLMGatewayConfig
+from metrics import LLM_CIRCUIT_OPEN, LLM_HEDGES, LLM_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# Default OpenAI-compatible endpoint of the Hugging Face inference router
+HF_ROUTER_BASE_URL = "https://router.huggingface.co/v1"
+
+# Upstream statuses worth retrying (rate limited / overloaded / restarting)
+_TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """
+    The LLM could not produce an answer. Subclasses tell callers why.
+    """
+    kind = "error"
+    status_code = 502
+
+
+class LLMTimeoutError(LLMError):
+    """
+    No answer within the call deadline.
+    """
+    kind = "timeout"
+    status_code = 504
+
+
+class LLMUnavailableError(LLMError):
+    """
+    The backend is down or overloaded (retries exhausted, or the circuit
+    breaker is open and the call was not attempted).
+    """
+    kind = "unavailable"
+    status_code = 503
+
+
+class _TransientError(Exception):
+    def __init__(self, message: str, timeout: bool = False):
+        super().__init__(message)
+        self.timeout = timeout
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After failure_threshold transient failures in a row the circuit opens
+    and calls fail fast for reset_seconds. Then a single probe call is let
+    through (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        # start time of the half-open probe in flight, if any
+        self._probing: Optional[float] = None
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if now - self._opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(now)
+            if state == "closed":
+                return True
+            # a probe that never reported back (e.g. cancelled) is replaced
+            if state == "half_open" and (
+                self._probing is None or now - self._probing > self.reset_seconds
+            ):
+                self._probing = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = None
+        LLM_CIRCUIT_OPEN.set(0)
+
+    def record_failure(self):
+        opened = False
+        with self._lock:
+            self._failures += 1
+            if self._probing is not None:
+                # the probe failed: stay open for another period
+                opened = True
+            elif self._opened_at is None and self._failures >= self.failure_threshold:
+                opened = True
+            if opened:
+                self._opened_at = time.monotonic()
+                self._probing = None
+                self.opened += 1
+        if opened:
+            logger.warning(
+                f"[LLM] Circuit open for {self.reset_seconds:.0f}s "
+                f"after {self._failures} consecutive failure(s)"
+            )
+            LLM_CIRCUIT_OPEN.set(1)
+
+
+class LLMGateway:
+    """
+    Resilient client for an OpenAI-compatible chat completions endpoint.
+
+    - pooled keep-alive connections (one aiohttp session per event loop)
+    - a deadline per call, covering all of its attempts
+    - exponential backoff with jitter on transient errors (timeouts,
+      connection errors, 408/429/5xx); other errors are not retried
+    - optional hedging: when an attempt is slower than hedge_after_ms a
+      second identical request is sent and the first answer wins
+      (non-streaming calls only)
+    - a circuit breaker that fails fast while the backend is down
+
+    Failures raise LLMTimeoutError / LLMUnavailableError / LLMError.
+    The blocking chat() runs on a private event loop thread, so sync
+    callers share the same pool and policies.
+    """
+
+    def __init__(self, cfg: HuggingFaceConfig, gw_cfg: LLMGatewayConfig):
+        self.cfg = cfg
+        self.gw_cfg = gw_cfg
+        base = (gw_cfg.chat_url or cfg.base_url or HF_ROUTER_BASE_URL).rstrip("/")
+        if base.endswith("/chat/completions"):
+            self.url = base
+        elif base.endswith("/v1"):
+            self.url = f"{base}/chat/completions"
+        else:
+            self.url = f"{base}/v1/chat/completions"
+
+        self.headers = {"Content-Type": "application/json"}
+        if cfg.api_token and cfg.api_token != UNUSED_API_TOKEN:
+            self.headers["Authorization"] = f"Bearer {cfg.api_token}"
+
+        self.breaker = CircuitBreaker(gw_cfg.breaker_failures, gw_cfg.breaker_reset_seconds)
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+        self._sessions_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.failures = 0
+        logger.info(f"[LLM] Gateway for {self.url} (model {cfg.chat_model})")
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    async def achat(self, messages: List[Dict]) -> str:
+        """
+        Full answer text for the messages.
+        """
+        payload = {"model": self.cfg.chat_model, "messages": messages}
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.gw_cfg.deadline_seconds
+        self.calls += 1
+
+        attempt = 0
+        while True:
+            self._check_breaker()
+            try:
+                text = await self._hedged(payload, deadline)
+            except _TransientError as exc:
+                self.breaker.record_failure()
+                attempt += 1
+                await self._backoff(attempt, deadline, exc)
+                continue
+            except LLMError:
+                # the backend answered, it just rejected the request
+                self.breaker.record_success()
+                raise
+            self.breaker.record_success()
+            return text
+
+    async def astream(self, messages: List[Dict]) -> AsyncIterator[str]:
+        """
+        Answer fragments as they arrive. Attempts are retried only until
+        the first fragment; a failure after that raises LLMError.
+        """
+        payload = {"model": self.cfg.chat_model, "messages": messages, "stream": True}
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.gw_cfg.deadline_seconds
+        self.calls += 1
+
+        attempt = 0
+        while True:
+            self._check_breaker()
+            emitted = False
+            try:
+                async for token in self._stream_attempt(payload, deadline):
+                    emitted = True
+                    yield token
+            except _TransientError as exc:
+                self.breaker.record_failure()
+                if emitted:
+                    self.failures += 1
+                    raise LLMError(f"Stream interrupted: {exc}") from exc
+                attempt += 1
+                await self._backoff(attempt, deadline, exc)
+                continue
+            except LLMError:
+                self.breaker.record_success()
+                raise
+            self.breaker.record_success()
+            return
+
+    def chat(self, messages: List[Dict]) -> str:
+        """
+        Blocking achat() for threads that are not running an event loop.
+        """
+        future = asyncio.run_coroutine_threadsafe(self.achat(messages), self._private_loop())
+        return future.result()
+
+    def stats(self) -> Dict:
+        return {
+            "url": self.url,
+            "circuit": self.breaker.state,
+            "circuit_opened": self.breaker.opened,
+            "calls": self.calls,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "failures": self.failures,
+        }
+
+    async def aclose(self):
+        """
+        Close every pooled session: the running loop's directly, those of
+        other running loops (e.g. the private loop of chat()) on their
+        own loop. Sessions of loops that are already closed are dropped.
+        """
+        current = asyncio.get_running_loop()
+        with self._sessions_lock:
+            sessions = list(self._sessions.items())
+            self._sessions.clear()
+        for loop, session in sessions:
+            if loop is current:
+                await session.close()
+            elif loop.is_running():
+                future = asyncio.run_coroutine_threadsafe(session.close(), loop)
+                try:
+                    await asyncio.wait_for(asyncio.wrap_future(future), timeout=5)
+                except (asyncio.TimeoutError, RuntimeError) as exc:
+                    logger.warning(f"[LLM] Could not close a session of another loop: {exc}")
+
+    async def arelease(self):
+        """
+        Close the running loop's session. Call before a short-lived loop
+        (asyncio.run) ends; the next call on another loop opens a new one.
+        """
+        loop = asyncio.get_running_loop()
+        with self._sessions_lock:
+            session = self._sessions.pop(loop, None)
+        if session is not None:
+            await session.close()
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            self.failures += 1
+            raise LLMUnavailableError("LLM backend unavailable (circuit open)")
+
+    async def _backoff(self, attempt: int, deadline: float, exc: _TransientError):
+        loop = asyncio.get_running_loop()
+        remaining = deadline - loop.time()
+        delay = min(
+            self.gw_cfg.backoff_max_ms,
+            self.gw_cfg.backoff_base_ms * (2 ** (attempt - 1)),
+        ) / 1000.0
+        delay *= random.uniform(0.5, 1.0)
+        if attempt > self.gw_cfg.max_retries or delay >= remaining:
+            self.failures += 1
+            if exc.timeout or remaining <= 0:
+                raise LLMTimeoutError(f"LLM call timed out: {exc}") from exc
+            raise LLMUnavailableError(f"LLM backend failed: {exc}") from exc
+        logger.warning(f"[LLM] Attempt {attempt} failed ({exc}); retrying in {delay:.2f}s")
+        self.retries += 1
+        LLM_RETRIES.inc()
+        await asyncio.sleep(delay)
+
+    def _attempt_timeout(self, deadline: float) -> float:
+        remaining = deadline - asyncio.get_running_loop().time()
+        if remaining <= 0:
+            raise _TransientError("deadline exceeded", timeout=True)
+        return min(self.gw_cfg.attempt_timeout_seconds, remaining)
+
+    async def _session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        with self._sessions_lock:
+            # A session keeps its loop alive, so entries of loops that
+            # ended without arelease() are dropped here
+            for stale in [other for other in self._sessions if other.is_closed()]:
+                del self._sessions[stale]
+            session = self._sessions.get(loop)
+            if session is None or session.closed:
+                session = aiohttp.ClientSession(
+                    headers=self.headers,
+                    connector=aiohttp.TCPConnector(
+                        limit=self.gw_cfg.pool_size, keepalive_timeout=60
+                    ),
+                )
+                self._sessions[loop] = session
+        return session
+
+    async def _hedged(self, payload: Dict, deadline: float) -> str:
+        hedge_after = self.gw_cfg.hedge_after_ms / 1000.0
+        if hedge_after <= 0:
+            return await self._attempt(payload, deadline)
+
+        first = asyncio.ensure_future(self._attempt(payload, deadline))
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_after)
+            if done:
+                return first.result()
+
+            self.hedges += 1
+            LLM_HEDGES.inc()
+            pending.add(asyncio.ensure_future(self._attempt(payload, deadline)))
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _attempt(self, payload: Dict, deadline: float) -> str:
+        timeout = aiohttp.ClientTimeout(total=self._attempt_timeout(deadline))
+        session = await self._session()
+        try:
+            async with session.post(self.url, json=payload, timeout=timeout) as resp:
+                if resp.status != 200:
+                    await self._raise_for_status(resp)
+                body = await resp.json(content_type=None)
+        except asyncio.TimeoutError as exc:
+            raise _TransientError("attempt timed out", timeout=True) from exc
+        except aiohttp.ClientError as exc:
+            raise _TransientError(f"connection error: {exc}") from exc
+
+        try:
+            return body["choices"][0]["message"]["content"] or ""
+        except (KeyError, IndexError, TypeError) as exc:
+            raise LLMError(f"Malformed LLM response: {str(body)[:200]}") from exc
+
+    async def _stream_attempt(self, payload: Dict, deadline: float) -> AsyncIterator[str]:
+        # Deadline bounds the wait for the response and for each chunk,
+        # not the length of the whole answer
+        wait = self._attempt_timeout(deadline)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=wait, sock_read=wait)
+        session = await self._session()
+        try:
+            async with session.post(self.url, json=payload, timeout=timeout) as resp:
+                if resp.status != 200:
+                    await self._raise_for_status(resp)
+                async for raw in resp.content:
+                    line = raw.decode("utf-8").strip()
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        return
+                    try:
+                        chunk = json.loads(data)
+                    except ValueError as exc:
+                        raise LLMError(f"Malformed stream chunk: {data[:200]}") from exc
+                    if "error" in chunk:
+                        raise _TransientError(f"stream error: {chunk['error']}")
+                    choices = chunk.get("choices") or []
+                    delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                    if delta:
+                        yield delta
+        except asyncio.TimeoutError as exc:
+            raise _TransientError("stream timed out", timeout=True) from exc
+        except aiohttp.ClientError as exc:
+            raise _TransientError(f"connection error: {exc}") from exc
+
+    async def _raise_for_status(self, resp: aiohttp.ClientResponse):
+        detail = (await resp.text())[:200]
+        if resp.status in _TRANSIENT_STATUSES:
+            raise _TransientError(f"HTTP {resp.status}: {detail}", timeout=resp.status in (408, 504))
+        # Bad request / auth / unknown model: retrying will not help
+        self.failures += 1
+        raise LLMError(f"LLM request rejected (HTTP {resp.status}): {detail}")
+
+    def _private_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="llm-gateway", daemon=True
+                ).start()
+                self._loop = loop
+            return self._loop
@@ -1,15 +1,118 @@
+import logging
+import time
+from typing import List, Dict, Optional
+from .base_agent import BaseAgent, format_history
+from .intent_router import EmbeddingIntentRouter
+from .llm_gateway import LLMError
+from metrics import LLM_FALLBACKS
+from prompts import supervisor_system_prompt
 
-from typing import List, Dict
-from .base_agent import BaseAgent
-from prompts import supervisor_system_prompt 
+logger = logging.getLogger(__name__)
 
 class SupervisorAgent(BaseAgent):
+    name = "supervisor"
+
+    def __init__(self, client, cfg, router: Optional[EmbeddingIntentRouter] = None,
+                 min_confidence: float = 0.6):
+        super().__init__(client, cfg)
+        # Local embedding router; when None every decision goes to the LLM
+        self.router = router
+        self.min_confidence = min_confidence
+
+    def route(self, user_message: str, history: List[Dict]) -> Dict:
+        """
+        Decide the intent, preferring the local router and falling back to
+        the LLM when its confidence is below min_confidence. If the LLM
+        call fails the low-confidence local intent is used instead; without
+        a local router the LLMError propagates.
+
+        Returns {"intent", "method", "confidence", "latency_ms"}.
+        """
+        start = time.perf_counter()
+        local = self.router.classify(user_message) if self.router is not None else None
+        decision = self._local_decision(local, start)
+        if decision is not None:
+            return decision
+
+        try:
+            intent = self.decide_agent(user_message, history)
+        except LLMError as exc:
+            return self._degraded_decision(exc, local, start)
+        return self._llm_decision(intent, local, start)
+
+    async def aroute(self, user_message: str, history: List[Dict]) -> Dict:
+        """
+        Async route(); local classification runs on the router's executor.
+        """
+        start = time.perf_counter()
+        local = None
+        if self.router is not None:
+            local = await self.router.aclassify(user_message)
+        decision = self._local_decision(local, start)
+        if decision is not None:
+            return decision
+
+        try:
+            intent = await self.adecide_agent(user_message, history)
+        except LLMError as exc:
+            return self._degraded_decision(exc, local, start)
+        return self._llm_decision(intent, local, start)
+
     def decide_agent(self, user_message: str, history: List[Dict]) -> str:
+        messages = self._routing_messages(user_message, history)
+        raw_output = self.chat_completion(messages).strip().lower()
+        return self._parse_intent(raw_output)
+
+    async def adecide_agent(self, user_message: str, history: List[Dict]) -> str:
+        messages = self._routing_messages(user_message, history)
+        raw_output = (await self.achat_completion(messages)).strip().lower()
+        return self._parse_intent(raw_output)
+
+    def _local_decision(self, local: Optional[Dict], start: float) -> Optional[Dict]:
+        if local is None:
+            return None
+        logger.debug(
+            "[SUPERVISOR] Local routing: %s (confidence=%.3f, %.2f ms)",
+            local["intent"], local["confidence"], local["latency_ms"],
+        )
+        if local["confidence"] < self.min_confidence:
+            logger.debug("[SUPERVISOR] Low confidence, falling back to LLM routing.")
+            LLM_FALLBACKS.labels(kind="router_low_confidence").inc()
+            return None
+        return {
+            "intent": local["intent"],
+            "method": "local",
+            "confidence": local["confidence"],
+            "latency_ms": (time.perf_counter() - start) * 1000,
+        }
+
+    def _llm_decision(self, intent: str, local: Optional[Dict], start: float) -> Dict:
+        return {
+            "intent": intent,
+            "method": "llm" if local is None else "llm_fallback",
+            "confidence": local["confidence"] if local is not None else None,
+            "latency_ms": (time.perf_counter() - start) * 1000,
+        }
+
+    def _degraded_decision(self, exc: LLMError, local: Optional[Dict],
+                           start: float) -> Dict:
+        if local is None:
+            raise exc
+        logger.warning(
+            f"[SUPERVISOR] LLM routing failed ({exc.kind}); "
+            f"using local intent {local['intent']!r}"
+        )
+        LLM_FALLBACKS.labels(kind="router_llm_failed").inc()
+        return {
+            "intent": local["intent"],
+            "method": "local_degraded",
+            "confidence": local["confidence"],
+            "latency_ms": (time.perf_counter() - start) * 1000,
+        }
+
+    def _routing_messages(self, user_message: str, history: List[Dict]) -> List[Dict]:
         # Create a small text view of recent history
-        history_text_parts = []
-        for turn in history[-5:]:
-            history_text_parts.append(f"{turn['role']}: {turn['content']}")
-        history_text = "\n".join(history_text_parts)
+        history_text = format_history(history, max_turns=5)
 
         user_prompt = f"""
 User message:
@@ -23,9 +126,10 @@ Recent history:
             {"role": "system", "content": supervisor_system_prompt },
             {"role": "user", "content": user_prompt},
         ]
+        return messages
 
-        raw_output = self.chat_completion(messages).strip().lower()
-        print(f"[SUPERVISOR] Raw routing decision: {raw_output!r}")
+    def _parse_intent(self, raw_output: str) -> str:
+        logger.debug("[SUPERVISOR] Raw routing decision: %r", raw_output)
 
         # Normalize result
         if "bfsi" in raw_output:
@@ -36,5 +140,5 @@ Recent history:
             return "unwanted"
 
         # Fallback
-        print("[SUPERVISOR] Could not clearly parse intent. Defaulting to 'general'.")
+        logger.warning("[SUPERVISOR] Could not clearly parse intent. Defaulting to 'general'.")
         return "general"
@@ -0,0 +1,260 @@
+# benchmarks/bench_multiworker.py
+"""
+Throughput of the service under 1, 2, 4... uvicorn worker processes
+sharing one index and one session store.
+
+    python -m benchmarks.bench_multiworker
+    python -m benchmarks.bench_multiworker --workers 1,2,4,8 --sessions 400
+
+The numpy index is built once from --data into a temporary directory
+(python -m rag.ingest), then for every worker count the service is
+started with VECTOR_BACKEND=numpy on that directory, SESSION_STORE=sqlite
+and the LLM replaced by tools.mock_llm_server. Once /ready answers, the
+multi-turn load driver (tools.load_driver) replays --sessions sessions.
+Each run reports throughput, latency percentiles, the resident memory of
+every worker and whether each session's turns were stored without gaps
+(turns of one session land on different workers). Results go to
+benchmarks/results/multiworker-<commit>.json.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional
+
+from benchmarks.bench_rag import _git_commit, _int_list
+from tools import load_driver
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float,
+                     streak: int = 1) -> float:
+    """
+    Poll url until it answers 200 streak times in a row; returns the
+    seconds it took. Each probe is a new connection, so with several
+    workers a long streak means they are all built, not just one.
+    """
+    start = time.perf_counter()
+    ok = 0
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"{process.args[:4]} exited with {process.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=2) as resp:
+                ok = ok + 1 if resp.status == 200 else 0
+        except (urllib.error.URLError, OSError):
+            ok = 0
+        if ok >= streak:
+            return time.perf_counter() - start
+        time.sleep(0.05 if ok else 0.5)
+    raise TimeoutError(f"{url} not ready after {timeout:.0f}s")
+
+
+def worker_pids(pid: int) -> List[int]:
+    """
+    Worker processes forked by the uvicorn supervisor pid, without the
+    multiprocessing resource tracker (Linux only; empty elsewhere).
+    """
+    workers = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                for child in f.read().split():
+                    with open(f"/proc/{child}/cmdline", "rb") as cmd:
+                        if b"resource_tracker" not in cmd.read():
+                            workers.append(int(child))
+    except OSError:
+        pass
+    return workers
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def check_sessions(db_path: str) -> Dict:
+    """
+    Sessions whose stored turns are not exactly seq 0..next_seq-1.
+    """
+    db = sqlite3.connect(db_path, timeout=30)
+    try:
+        rows = db.execute(
+            "SELECT s.session_id, s.next_seq, COUNT(t.seq), MIN(t.seq), MAX(t.seq) "
+            "FROM sessions s LEFT JOIN turns t ON t.session_id = s.session_id "
+            "GROUP BY s.session_id"
+        ).fetchall()
+    finally:
+        db.close()
+    broken = [
+        session_id for session_id, next_seq, count, low, high in rows
+        if count != next_seq or low != 0 or high != next_seq - 1
+    ]
+    return {
+        "sessions": len(rows),
+        "turns": sum(row[2] for row in rows),
+        "sessions_with_gaps": len(broken),
+    }
+
+
+def run_workers(workers: int, env: Dict[str, str], args) -> Dict:
+    url = f"http://127.0.0.1:{args.port}"
+    db_path = env["SESSION_DB_PATH"]
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    # /metrics of any worker then covers all of them
+    metrics_dir = os.path.join(os.path.dirname(db_path), "metrics")
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+    env = dict(env, PROMETHEUS_MULTIPROC_DIR=metrics_dir)
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        ready_s = wait_until_ready(f"{url}/ready", server, args.ready_timeout,
+                                   streak=5 * workers)
+        pids = worker_pids(server.pid) or [server.pid]
+        rss_idle = [rss_mb(pid) for pid in pids]
+
+        load = asyncio.run(load_driver.run(argparse.Namespace(
+            url=url,
+            concurrency=args.concurrency,
+            sessions=args.sessions,
+            turns=args.turns,
+            think_ms=0.0,
+            unwanted_share=0.05,
+            stream=False,
+            timeout=300.0,
+            seed=args.seed,
+        )))
+        rss_loaded = [rss_mb(pid) for pid in pids]
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+    return {
+        "workers": workers,
+        "ready_s": ready_s,
+        "requests": load["requests"],
+        "errors": load["errors"],
+        "throughput_rps": load["throughput_rps"],
+        "latency": load["latency"],
+        "worker_rss_mb": {"idle": rss_idle, "loaded": rss_loaded},
+        "total_rss_mb": sum(value for value in rss_loaded if value is not None),
+        "session_store": check_sessions(db_path),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-worker throughput benchmark.")
+    parser.add_argument("--data", default="data", help="directory with sample PDFs")
+    parser.add_argument("--workers", type=_int_list, default=[1, 2, 4])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=32,
+                        help="sessions in flight at the same time")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--mock-port", type=int, default=8001)
+    parser.add_argument("--mock-latency-ms", type=float, default=200.0)
+    parser.add_argument("--mock-tokens-per-sec", type=float, default=0.0,
+                        help="answer streaming rate of the mock LLM (0: all at once), "
+                             "kept high so the workers, not the LLM, are the bottleneck")
+    parser.add_argument("--embed-engine", default=None,
+                        help="EMBED_ENGINE of the workers (default: environment)")
+    parser.add_argument("--ready-timeout", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None,
+                        help="result file (default: benchmarks/results/multiworker-<commit>.json)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_multiworker_")
+    env = dict(
+        os.environ,
+        HF_HUB_OFFLINE=os.environ.get("HF_HUB_OFFLINE", "1"),
+        TRANSFORMERS_OFFLINE=os.environ.get("TRANSFORMERS_OFFLINE", "1"),
+        LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"),
+        HF_BASE_URL=f"http://127.0.0.1:{args.mock_port}",
+        VECTOR_BACKEND="numpy",
+        VECTOR_PERSIST_DIR=os.path.join(workdir, "index"),
+        DATA_DIR=args.data,
+        UPLOAD_DIR=os.path.join(workdir, "uploads"),
+        SESSION_STORE="sqlite",
+        SESSION_DB_PATH=os.path.join(workdir, "sessions.sqlite"),
+    )
+    if args.embed_engine:
+        env["EMBED_ENGINE"] = args.embed_engine
+
+    mock = subprocess.Popen(
+        [sys.executable, "-m", "tools.mock_llm_server", "--port", str(args.mock_port),
+         "--latency-ms", str(args.mock_latency_ms),
+         "--tokens-per-sec", str(args.mock_tokens_per_sec), "--seed", str(args.seed)],
+        env=env,
+    )
+    runs = []
+    try:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "rag.ingest", args.data], env=env, check=True)
+        build_s = time.perf_counter() - start
+        print(f"[MULTIWORKER] Index built once in {build_s:.1f}s")
+
+        for workers in args.workers:
+            result = run_workers(workers, env, args)
+            runs.append(result)
+            print(
+                f"[MULTIWORKER] {workers} worker(s): {result['throughput_rps']:.1f} req/s, "
+                f"p95 {result['latency']['p95_ms']:.0f} ms, {result['errors']} error(s), "
+                f"{result['total_rss_mb']:.0f} MB RSS, "
+                f"{result['session_store']['sessions_with_gaps']} broken session(s)"
+            )
+    finally:
+        mock.terminate()
+        mock.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = runs[0]["throughput_rps"] if runs and runs[0]["throughput_rps"] else None
+    for result in runs:
+        result["speedup"] = (
+            result["throughput_rps"] / baseline if baseline and result["throughput_rps"] else None
+        )
+
+    commit = _git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "cpu_count": os.cpu_count(),
+            "index_build_s": build_s,
+            "args": vars(args),
+        },
+        "results": runs,
+    }
+    output = args.output or os.path.join("benchmarks", "results", f"multiworker-{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[MULTIWORKER] Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
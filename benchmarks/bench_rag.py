@@ -0,0 +1,325 @@
+# benchmarks/bench_rag.py
+"""
+Offline micro-benchmarks for the RAG hot paths.
+
+    python -m benchmarks.bench_rag
+    python -m benchmarks.bench_rag --sizes 1000,10000 --backends numpy
+    python -m benchmarks.bench_rag --compare benchmarks/results/rag-<old>.json
+
+Covers PDF extraction (data/*.pdf), chunking, embedding at several batch
+sizes, add_documents and search latency against synthetic corpora of
+increasing size. No LLM or network access is needed; the embedding model
+must already be in the local Hugging Face cache. Results are written as
+JSON (one file per run, named after the current commit) so runs can be
+compared between commits with --compare.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List
+
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import numpy as np
+
+from config import configure_logging
+from prompts import intent_router_examples
+from rag.vector_store import (
+    RETRIEVAL_MODES,
+    VectorStore,
+    chunk_text,
+    extract_text_from_pdf,
+    make_chunk_id,
+)
+
+# Vocabulary for synthetic BFSI-like text, so BM25 sees realistic term overlap
+_VOCAB = (
+    "loan emi interest rate tenure principal borrower lender collateral "
+    "repayment prepayment foreclosure penalty credit score kyc income "
+    "eligibility processing fee disbursement sanction mortgage property "
+    "insurance premium policy claim nominee deposit savings account "
+    "branch statement overdraft card limit annual charges late payment "
+    "the bank shall may be applicable as per terms conditions customer "
+    "agreement schedule monthly quarterly fixed floating benchmark reset"
+).split()
+
+EMBEDDING_DIM = 384  # all-MiniLM-L6-v2
+
+
+def _summary(samples_ms: List[float]) -> Dict:
+    ordered = sorted(samples_ms)
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.fmean(ordered),
+        "p50_ms": ordered[len(ordered) // 2],
+        "p95_ms": ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)],
+        "min_ms": ordered[0],
+        "max_ms": ordered[-1],
+    }
+
+
+def _time_ms(fn: Callable, repeats: int) -> List[float]:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def synthetic_text(n_words: int, rng: random.Random) -> str:
+    words = []
+    while len(words) < n_words:
+        sentence = rng.choices(_VOCAB, k=rng.randint(8, 20))
+        sentence[-1] += "."
+        words.extend(sentence)
+    return " ".join(words[:n_words])
+
+
+def synthetic_docs(n_chunks: int, rng: random.Random) -> List[Dict]:
+    docs = []
+    for i in range(n_chunks):
+        doc_hash = f"synthetic-{i // 20}"
+        text = synthetic_text(rng.randint(120, 200), rng)
+        docs.append(
+            {
+                "id": make_chunk_id(doc_hash, i % 20, text),
+                "text": text,
+                "metadata": {
+                    "category": "synthetic",
+                    "source": f"synthetic/doc{i // 20}.pdf",
+                    "doc_hash": doc_hash,
+                    "chunk_index": i % 20,
+                },
+            }
+        )
+    return docs
+
+
+def random_embeddings(n: int, seed: int) -> List[List[float]]:
+    vectors = np.random.default_rng(seed).standard_normal((n, EMBEDDING_DIM))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32).tolist()
+
+
+def bench_extract(pdf_paths: List[str], repeats: int) -> Dict:
+    results = {}
+    for path in pdf_paths:
+        text = extract_text_from_pdf(path, verbose=False)
+        samples = _time_ms(lambda: extract_text_from_pdf(path, verbose=False), repeats)
+        results[os.path.basename(path)] = dict(
+            _summary(samples),
+            bytes=os.path.getsize(path),
+            chars=len(text),
+        )
+    return results
+
+
+def bench_chunk(texts: Dict[str, str], repeats: int) -> Dict:
+    results = {}
+    for name, text in texts.items():
+        n_words = len(text.split())
+        samples = _time_ms(lambda: chunk_text(text), repeats)
+        stats = _summary(samples)
+        results[name] = dict(
+            stats,
+            words=n_words,
+            chunks=len(chunk_text(text)),
+            words_per_sec=n_words / (stats["p50_ms"] / 1000) if stats["p50_ms"] else None,
+        )
+    return results
+
+
+def bench_embed(texts: List[str], batch_sizes: List[int], total: int) -> Dict:
+    # No embedding cache, so every call reaches the model
+    store = VectorStore(
+        collection_name="bench_embed",
+        backend="numpy",
+        embed_batch_max=max(batch_sizes),
+    )
+    store.embed(texts[:8])  # load the model outside the measurement
+
+    results = {}
+    pool = (texts * (total // max(len(texts), 1) + 1))[:total]
+    for batch_size in batch_sizes:
+        batches = [pool[i:i + batch_size] for i in range(0, len(pool), batch_size)]
+        start = time.perf_counter()
+        per_batch = []
+        for batch in batches:
+            t0 = time.perf_counter()
+            store.embed(batch)
+            per_batch.append((time.perf_counter() - t0) * 1000)
+        elapsed = time.perf_counter() - start
+        results[str(batch_size)] = dict(
+            _summary(per_batch),
+            texts=len(pool),
+            texts_per_sec=len(pool) / elapsed,
+        )
+    return results
+
+
+def bench_corpus(backend: str, sizes: List[int], queries: List[str],
+                 k: int, seed: int) -> Dict:
+    """
+    add_documents throughput and search latency per corpus size. Corpus
+    vectors are random (the index cost does not depend on their content);
+    query embeddings are real, so dense latency includes the model call.
+    """
+    results = {}
+    for size in sizes:
+        rng = random.Random(seed + size)
+        docs = synthetic_docs(size, rng)
+        embeddings = random_embeddings(size, seed + size)
+        store = VectorStore(
+            collection_name=f"bench_{backend}_{size}",
+            backend=backend,
+        )
+        store.embed(queries[:1])  # model load
+
+        start = time.perf_counter()
+        for i in range(0, size, 1000):
+            store.add_documents(docs[i:i + 1000], embeddings[i:i + 1000])
+        add_s = time.perf_counter() - start
+
+        search = {}
+        for mode in RETRIEVAL_MODES:
+            samples = []
+            for query in queries:
+                t0 = time.perf_counter()
+                store.similarity_search(query, k=k, mode=mode)
+                samples.append((time.perf_counter() - t0) * 1000)
+            search[mode] = _summary(samples)
+
+        results[str(size)] = {
+            "add_documents": {
+                "seconds": add_s,
+                "docs_per_sec": size / add_s if add_s else None,
+            },
+            "search": search,
+        }
+        print(f"[BENCH] {backend} corpus={size}: add {add_s:.2f}s, "
+              f"dense p50 {search['dense']['p50_ms']:.2f} ms")
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def _flatten(node, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    if isinstance(node, dict):
+        for key, value in node.items():
+            flat.update(_flatten(value, f"{prefix}{key}/"))
+    elif isinstance(node, (int, float)) and not isinstance(node, bool):
+        flat[prefix.rstrip("/")] = float(node)
+    return flat
+
+
+def compare(baseline: Dict, current: Dict, threshold: float = 0.10):
+    """
+    Print latency metrics (p50) that moved by more than threshold.
+    """
+    old = _flatten(baseline["results"])
+    new = _flatten(current["results"])
+    print(f"[BENCH] Comparing {baseline['meta']['commit']} -> {current['meta']['commit']}")
+    changed = 0
+    for key in sorted(set(old) & set(new)):
+        if not key.endswith("p50_ms") or not old[key]:
+            continue
+        ratio = new[key] / old[key]
+        if abs(ratio - 1.0) > threshold:
+            changed += 1
+            label = "SLOWER" if ratio > 1 else "faster"
+            print(f"  {label:6s} {key}: {old[key]:.3f} -> {new[key]:.3f} ms ({ratio:.2f}x)")
+    if not changed:
+        print(f"  no p50 change above {threshold:.0%}")
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline RAG micro-benchmarks.")
+    parser.add_argument("--data", default="data", help="directory with sample PDFs")
+    parser.add_argument("--sizes", type=_int_list, default=[1000, 5000, 20000],
+                        help="synthetic corpus sizes in chunks")
+    parser.add_argument("--batch-sizes", type=_int_list, default=[1, 8, 32, 128],
+                        help="embedding batch sizes")
+    parser.add_argument("--embed-texts", type=int, default=512,
+                        help="texts embedded per batch-size run")
+    parser.add_argument("--backends", default="numpy,chroma")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default=None,
+                        help="result file (default: benchmarks/results/rag-<commit>.json)")
+    parser.add_argument("--compare", default=None,
+                        help="earlier result file to compare against")
+    args = parser.parse_args()
+    configure_logging()
+
+    commit = _git_commit()
+    pdf_paths = sorted(glob.glob(os.path.join(args.data, "*.pdf")))
+    pdf_texts = {
+        os.path.basename(p): extract_text_from_pdf(p, verbose=False) for p in pdf_paths
+    }
+    rng = random.Random(args.seed)
+    chunk_inputs = dict(pdf_texts)
+    for n_words in (10_000, 100_000):
+        chunk_inputs[f"synthetic_{n_words}_words"] = synthetic_text(n_words, rng)
+
+    embed_texts = [c for text in pdf_texts.values() for c in chunk_text(text)]
+    embed_texts = embed_texts or [d["text"] for d in synthetic_docs(64, rng)]
+    queries = intent_router_examples["bfsi"]
+
+    results = {
+        "extract_text_from_pdf": bench_extract(pdf_paths, args.repeats),
+        "chunk_text": bench_chunk(chunk_inputs, args.repeats),
+        "embed": bench_embed(embed_texts, args.batch_sizes, args.embed_texts),
+        "corpus": {
+            backend: bench_corpus(backend, args.sizes, queries, args.k, args.seed)
+            for backend in args.backends.split(",")
+            if backend
+        },
+    }
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+
+    output = args.output or os.path.join("benchmarks", "results", f"rag-{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[BENCH] Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
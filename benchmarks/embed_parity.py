@@ -0,0 +1,237 @@
+# benchmarks/embed_parity.py
+"""
+Parity check of the embedding engines and vector storage dtypes against
+the full-precision model.
+
+    python -m benchmarks.embed_parity
+    python -m benchmarks.embed_parity --engines torch-int8,onnx-int8 --k 5
+
+For every engine (rag.embedders.EMBEDDING_ENGINES) it reports load time,
+RSS growth, corpus encode throughput, single-query encode latency, cosine
+similarity to the reference vectors and recall@k of its search results
+against the reference results. For every numpy storage dtype (float32,
+float16, int8 + rescoring) it reports recall@k against exact float32
+search and the bytes stored per vector. The corpus is the chunked PDFs
+under --data; queries are the router examples plus the opening words of
+sampled chunks. Results go to benchmarks/results/parity-<commit>.json.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import numpy as np
+
+from benchmarks.bench_rag import _git_commit, _summary, synthetic_text
+from config import configure_logging
+from prompts import intent_router_examples
+from rag.backends import NumpyFlatBackend
+from rag.embedders import EMBEDDING_ENGINES, load_embedding_model
+from rag.vector_store import EMBEDDING_MODEL_NAME, chunk_text, extract_text_from_pdf
+
+
+def rss_mb() -> Optional[float]:
+    """
+    Resident set size of this process (Linux only).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> List[List[int]]:
+    scores = queries @ corpus.T
+    return [list(np.argsort(-row)[:k]) for row in scores]
+
+
+def recall(reference: List[List], candidate: List[List]) -> float:
+    return float(np.mean([
+        len(set(ref) & set(cand)) / len(ref) for ref, cand in zip(reference, candidate)
+    ]))
+
+
+def encode(model, texts: List[str], batch_size: int) -> np.ndarray:
+    return np.asarray(
+        model.encode(texts, batch_size=batch_size, show_progress_bar=False,
+                     normalize_embeddings=True),
+        dtype=np.float32,
+    )
+
+
+def check_engine(engine: str, corpus: List[str], queries: List[str],
+                 reference: Optional[Dict], k: int, batch_size: int,
+                 onnx_file: Optional[str]) -> Dict:
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    model = load_embedding_model(EMBEDDING_MODEL_NAME, engine, onnx_file)
+    encode(model, queries[:2], batch_size)  # first call outside the timings
+    load_s = time.perf_counter() - start
+    rss_after = rss_mb()
+
+    start = time.perf_counter()
+    corpus_vectors = encode(model, corpus, batch_size)
+    corpus_s = time.perf_counter() - start
+    query_ms = []
+    query_vectors = []
+    for query in queries:
+        t0 = time.perf_counter()
+        query_vectors.append(encode(model, [query], 1)[0])
+        query_ms.append((time.perf_counter() - t0) * 1000)
+    query_vectors = np.stack(query_vectors)
+
+    result = {
+        "load_s": load_s,
+        "rss_delta_mb": (
+            rss_after - rss_before if rss_before is not None and rss_after is not None else None
+        ),
+        "corpus_texts_per_sec": len(corpus) / corpus_s if corpus_s else None,
+        "query_encode": _summary(query_ms),
+        "vectors": {"corpus": corpus_vectors, "queries": query_vectors},
+    }
+    if reference is not None:
+        ref = reference["vectors"]
+        cosine = np.sum(corpus_vectors * ref["corpus"], axis=1)
+        result["cosine_to_reference"] = {
+            "mean": float(cosine.mean()),
+            "min": float(cosine.min()),
+        }
+        result[f"recall@{k}"] = recall(
+            top_k(ref["corpus"], ref["queries"], k),
+            top_k(corpus_vectors, query_vectors, k),
+        )
+    return result
+
+
+def check_storage(corpus_vectors: np.ndarray, query_vectors: np.ndarray, k: int) -> Dict:
+    ids = [f"c{i}" for i in range(len(corpus_vectors))]
+    metadatas = [{} for _ in ids]
+    texts = [""] * len(ids)
+    results, exact = {}, None
+    for dtype in NumpyFlatBackend.DTYPES:
+        index_dir = tempfile.mkdtemp(prefix=f"parity_{dtype}_")
+        try:
+            backend = NumpyFlatBackend(index_dir, dtype=dtype)
+            backend.add(ids, texts, metadatas, corpus_vectors)
+            latencies, found = [], []
+            for query in query_vectors:
+                t0 = time.perf_counter()
+                found.append([hit["id"] for hit in backend.query(query, k)])
+                latencies.append((time.perf_counter() - t0) * 1000)
+            sizes = {
+                name: os.path.getsize(os.path.join(index_dir, name))
+                for name in os.listdir(index_dir)
+                if not name.startswith(("chunks", "manifest"))
+            }
+        finally:
+            shutil.rmtree(index_dir, ignore_errors=True)
+        exact = exact or found
+        results[dtype] = {
+            f"recall@{k}": recall(exact, found),
+            # on disk, and read by the full scan (the int8 rescoring copy
+            # is only touched for candidate rows)
+            "bytes_per_vector": sum(sizes.values()) / len(ids),
+            "scan_bytes_per_vector": sum(
+                size for name, size in sizes.items() if not name.startswith("rescore")
+            ) / len(ids),
+            "query": _summary(latencies),
+        }
+    return results
+
+
+def build_inputs(data_dir: str, min_chunks: int, chunk_queries: int,
+                 rng: random.Random):
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(data_dir, "*.pdf"))):
+        corpus.extend(chunk_text(extract_text_from_pdf(path, verbose=False)))
+    while len(corpus) < min_chunks:
+        corpus.append(synthetic_text(rng.randint(120, 200), rng))
+    queries = intent_router_examples["bfsi"] + intent_router_examples["general"]
+    for text in rng.sample(corpus, min(chunk_queries, len(corpus))):
+        queries.append(" ".join(text.split()[:12]))
+    return corpus, queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding engine / storage parity check.")
+    parser.add_argument("--data", default="data", help="directory with sample PDFs")
+    parser.add_argument("--engines", default=",".join(EMBEDDING_ENGINES),
+                        help="engines to compare; the first is the reference")
+    parser.add_argument("--onnx-file", default=None, help="override the ONNX export")
+    parser.add_argument("--min-chunks", type=int, default=500,
+                        help="pad the PDF corpus with synthetic chunks up to this size")
+    parser.add_argument("--chunk-queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default=None,
+                        help="result file (default: benchmarks/results/parity-<commit>.json)")
+    args = parser.parse_args()
+    configure_logging()
+
+    rng = random.Random(args.seed)
+    corpus, queries = build_inputs(args.data, args.min_chunks, args.chunk_queries, rng)
+    print(f"[PARITY] {len(corpus)} corpus chunk(s), {len(queries)} quer(ies)")
+
+    engines: Dict[str, Dict] = {}
+    reference, reference_name = None, None
+    for engine in [e for e in args.engines.split(",") if e]:
+        try:
+            result = check_engine(engine, corpus, queries, reference, args.k,
+                                  args.batch_size, args.onnx_file)
+        except Exception as exc:
+            print(f"[PARITY] {engine}: skipped ({exc})")
+            engines[engine] = {"error": str(exc)}
+            continue
+        if reference is None:
+            reference, reference_name = result, engine
+        engines[engine] = result
+        print(
+            f"[PARITY] {engine}: load {result['load_s']:.1f}s, "
+            f"query p50 {result['query_encode']['p50_ms']:.2f} ms, "
+            f"recall@{args.k} {result.get(f'recall@{args.k}', 1.0):.3f}"
+        )
+
+    storage = None
+    if reference is not None:
+        storage = check_storage(
+            reference["vectors"]["corpus"], reference["vectors"]["queries"], args.k
+        )
+        for dtype, result in storage.items():
+            print(f"[PARITY] storage {dtype}: recall@{args.k} {result[f'recall@{args.k}']:.3f}, "
+                  f"{result['scan_bytes_per_vector']:.0f} B/vector scanned")
+    for result in engines.values():
+        result.pop("vectors", None)
+
+    commit = _git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "reference": reference_name,
+            "args": vars(args),
+        },
+        "results": {"engines": engines, "storage": storage},
+    }
+    output = args.output or os.path.join("benchmarks", "results", f"parity-{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[PARITY] Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,41 @@
 # Configuration management for Hugging Face client
 
+import logging
 import os
+from typing import Optional
 from dotenv import load_dotenv
 from pydantic import BaseModel, field_validator
-from huggingface_hub import InferenceClient
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
 
+def configure_logging():
+    """
+    Set up root logging; LOG_LEVEL (default INFO) sets the verbosity.
+    Per-request pipeline details are logged at DEBUG.
+    """
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
+
+# Placeholder token when HF_BASE_URL is set without HUGGINGFACEHUB_API_TOKEN;
+# never sent upstream
+UNUSED_API_TOKEN = "unused"
+
+
 class HuggingFaceConfig(BaseModel):
     """
     Configuration model for Hugging Face Inference API
     """
     api_token: str
     chat_model: str
+    # OpenAI-compatible endpoint used instead of the HF Inference API,
+    # e.g. the local mock in tools/mock_llm_server.py
+    base_url: Optional[str] = None
 
     @field_validator("api_token", "chat_model")
     @classmethod
@@ -25,41 +47,403 @@ class HuggingFaceConfig(BaseModel):
 
 def get_hf_config() -> HuggingFaceConfig:
     """
-    Load Hugging Face configuration from environment variables
+    Load Hugging Face configuration from environment variables.
+
+    HF_BASE_URL points the clients at another OpenAI-compatible chat
+    completions server; the API token is optional then, and still sent
+    when set.
     """
     try:
+        base_url = os.getenv("HF_BASE_URL") or None
         cfg = HuggingFaceConfig(
-            api_token=os.getenv("HUGGINGFACEHUB_API_TOKEN", ""),
+            api_token=os.getenv("HUGGINGFACEHUB_API_TOKEN") or (UNUSED_API_TOKEN if base_url else ""),
+            base_url=base_url,
             chat_model=os.getenv(
                 "HF_CHAT_MODEL",
                 "mistralai/Mistral-7B-Instruct-v0.2"
             ),
         )
 
-        print("[CONFIG] Loaded HuggingFaceConfig ->", cfg.model_dump())
+        logger.info("[CONFIG] Loaded HuggingFaceConfig -> %s", cfg.model_dump())
         return cfg
 
     except Exception as exc:
-        print("[CONFIG ERROR] Failed to load HuggingFaceConfig:", exc)
+        logger.error("[CONFIG] Failed to load HuggingFaceConfig: %s", exc)
         raise
 
 
-def get_hf_client(cfg: HuggingFaceConfig) -> InferenceClient:
+class LLMGatewayConfig(BaseModel):
     """
-    Create Hugging Face inference client
+    Configuration model for the resilient LLM gateway (agents/llm_gateway.py)
     """
-    print("[CONFIG] Creating Hugging Face InferenceClient...")
+    chat_url: Optional[str] = None
+    deadline_seconds: float = 30.0
+    attempt_timeout_seconds: float = 20.0
+    max_retries: int = 2
+    backoff_base_ms: float = 250.0
+    backoff_max_ms: float = 4000.0
+    hedge_after_ms: float = 0.0
+    breaker_failures: int = 5
+    breaker_reset_seconds: float = 30.0
+    pool_size: int = 100
 
-    try:
-        client = InferenceClient(
-            model=cfg.chat_model,
-            token=cfg.api_token,
-            timeout=120
-        )
 
-        print("[CONFIG] Hugging Face client created successfully.")
-        return client
+def get_llm_gateway_config() -> LLMGatewayConfig:
+    """
+    Load LLM gateway configuration from environment variables.
 
-    except Exception as exc:
-        print("[CONFIG ERROR] Failed to create Hugging Face client:", exc)
-        raise
+    LLM_DEADLINE_SECONDS bounds a whole call including retries, each
+    attempt gets at most LLM_ATTEMPT_TIMEOUT_SECONDS. Transient failures
+    are retried LLM_MAX_RETRIES times with exponential backoff starting at
+    LLM_BACKOFF_BASE_MS. LLM_HEDGE_AFTER_MS > 0 sends a duplicate request
+    when an attempt is slower than that. After LLM_BREAKER_FAILURES
+    consecutive failures calls fail fast for LLM_BREAKER_RESET_SECONDS.
+    LLM_POOL_SIZE caps pooled connections; LLM_CHAT_URL overrides the
+    endpoint (default: HF_BASE_URL or the Hugging Face router).
+    """
+    cfg = LLMGatewayConfig(
+        chat_url=os.getenv("LLM_CHAT_URL") or None,
+        deadline_seconds=float(os.getenv("LLM_DEADLINE_SECONDS", "30")),
+        attempt_timeout_seconds=float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", "20")),
+        max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+        backoff_base_ms=float(os.getenv("LLM_BACKOFF_BASE_MS", "250")),
+        backoff_max_ms=float(os.getenv("LLM_BACKOFF_MAX_MS", "4000")),
+        hedge_after_ms=float(os.getenv("LLM_HEDGE_AFTER_MS", "0")),
+        breaker_failures=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+        breaker_reset_seconds=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30")),
+        pool_size=int(os.getenv("LLM_POOL_SIZE", "100")),
+    )
+    logger.info("[CONFIG] Loaded LLMGatewayConfig -> %s", cfg.model_dump())
+    return cfg
+
+
+class VectorStoreConfig(BaseModel):
+    """
+    Configuration model for the vector store / document index
+    """
+    persist_dir: Optional[str] = None
+    collection_name: str = "bfsi_docs"
+    embed_cache_size: int = 10000
+    embed_cache_path: Optional[str] = None
+    executor_workers: int = 4
+    data_dir: str = "data"
+    ingest_workers: Optional[int] = None
+    upload_dir: str = "data/uploads"
+    backend: str = "chroma"
+    vector_dtype: str = "float32"
+    embed_batch_max: int = 32
+    embed_batch_wait_ms: float = 5.0
+    embed_engine: str = "torch"
+    onnx_file: Optional[str] = None
+    dedup_enabled: bool = True
+    dedup_threshold: float = 0.9
+    refresh_seconds: float = 1.0
+
+    @field_validator("backend")
+    @classmethod
+    def known_backend(cls, v: str) -> str:
+        if v not in ("chroma", "numpy"):
+            raise ValueError("VECTOR_BACKEND must be 'chroma' or 'numpy'")
+        return v
+
+    @field_validator("vector_dtype")
+    @classmethod
+    def known_dtype(cls, v: str) -> str:
+        if v not in ("float32", "float16", "int8"):
+            raise ValueError("VECTOR_DTYPE must be 'float32', 'float16' or 'int8'")
+        return v
+
+    @field_validator("embed_engine")
+    @classmethod
+    def known_engine(cls, v: str) -> str:
+        if v not in ("torch", "torch-int8", "onnx", "onnx-int8"):
+            raise ValueError("EMBED_ENGINE must be 'torch', 'torch-int8', 'onnx' or 'onnx-int8'")
+        return v
+
+    @field_validator("dedup_threshold")
+    @classmethod
+    def valid_threshold(cls, v: float) -> float:
+        if not 0.0 < v <= 1.0:
+            raise ValueError("DEDUP_THRESHOLD must be in (0, 1]")
+        return v
+
+
+def get_vector_store_config() -> VectorStoreConfig:
+    """
+    Load vector store configuration from environment variables.
+
+    VECTOR_PERSIST_DIR enables the persistent on-disk index; when unset
+    the store stays in-memory and is rebuilt on every start.
+    EMBED_CACHE_SIZE bounds the in-memory embedding LRU (0 disables the
+    cache) and EMBED_CACHE_PATH adds the on-disk SQLite tier.
+    VECTOR_EXECUTOR_WORKERS bounds the thread pool that runs embedding and
+    Chroma calls for the async request path.
+    DATA_DIR is bulk-ingested at startup with INGEST_WORKERS extraction
+    processes (default: CPU count). Documents uploaded through the API
+    are stored in UPLOAD_DIR (inside DATA_DIR by default, so they are
+    picked up again after a restart).
+    VECTOR_BACKEND selects the retrieval backend: "chroma" or "numpy"
+    (memory-mapped flat index stored as VECTOR_DTYPE float32/float16, or
+    int8 with float16 rescoring).
+    Query embeddings from concurrent requests are batched: the batcher
+    waits up to EMBED_BATCH_WAIT_MS for up to EMBED_BATCH_MAX texts.
+    EMBED_ENGINE selects the model runtime: torch (full precision),
+    torch-int8, onnx or onnx-int8 (ONNX Runtime; EMBED_ONNX_FILE overrides
+    the export file).
+    DEDUP_ENABLED folds near-duplicate chunks at ingest into one stored
+    representative with back-references to every source; DEDUP_THRESHOLD
+    is the minimum estimated Jaccard similarity of their word 5-grams.
+    VECTOR_REFRESH_SECONDS is how often searches check for chunks written
+    by other worker processes sharing a numpy index.
+    """
+    cfg = VectorStoreConfig(
+        persist_dir=os.getenv("VECTOR_PERSIST_DIR") or None,
+        collection_name=os.getenv("VECTOR_COLLECTION", "bfsi_docs"),
+        embed_cache_size=int(os.getenv("EMBED_CACHE_SIZE", "10000")),
+        embed_cache_path=os.getenv("EMBED_CACHE_PATH") or None,
+        executor_workers=int(os.getenv("VECTOR_EXECUTOR_WORKERS", "4")),
+        data_dir=os.getenv("DATA_DIR", "data"),
+        ingest_workers=int(os.getenv("INGEST_WORKERS", "0")) or None,
+        upload_dir=os.getenv("UPLOAD_DIR", "data/uploads"),
+        backend=os.getenv("VECTOR_BACKEND", "chroma").lower(),
+        vector_dtype=os.getenv("VECTOR_DTYPE", "float32").lower(),
+        embed_batch_max=int(os.getenv("EMBED_BATCH_MAX", "32")),
+        embed_batch_wait_ms=float(os.getenv("EMBED_BATCH_WAIT_MS", "5")),
+        embed_engine=os.getenv("EMBED_ENGINE", "torch").lower(),
+        onnx_file=os.getenv("EMBED_ONNX_FILE") or None,
+        dedup_enabled=os.getenv("DEDUP_ENABLED", "true").lower() == "true",
+        dedup_threshold=float(os.getenv("DEDUP_THRESHOLD", "0.9")),
+        refresh_seconds=float(os.getenv("VECTOR_REFRESH_SECONDS", "1.0")),
+    )
+    logger.info("[CONFIG] Loaded VectorStoreConfig -> %s", cfg.model_dump())
+    return cfg
+
+
+class AnswerCacheConfig(BaseModel):
+    """
+    Configuration model for the cross-session semantic answer cache
+    """
+    enabled: bool = True
+    threshold: float = 0.95
+    ttl_seconds: float = 3600.0
+    max_entries: int = 1000
+
+
+def get_answer_cache_config() -> AnswerCacheConfig:
+    """
+    Load semantic answer cache configuration from environment variables
+    """
+    cfg = AnswerCacheConfig(
+        enabled=os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true",
+        threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+        ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+        max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+    )
+    logger.info("[CONFIG] Loaded AnswerCacheConfig -> %s", cfg.model_dump())
+    return cfg
+
+
+class RouterConfig(BaseModel):
+    """
+    Configuration model for intent routing
+    """
+    mode: str = "llm"
+    min_confidence: float = 0.6
+
+    @field_validator("mode")
+    @classmethod
+    def known_mode(cls, v: str) -> str:
+        if v not in ("llm", "local"):
+            raise ValueError("ROUTER_MODE must be 'llm' or 'local'")
+        return v
+
+
+def get_router_config() -> RouterConfig:
+    """
+    Load intent routing configuration from environment variables.
+
+    ROUTER_MODE=local classifies with the MiniLM embeddings and only calls
+    the LLM when the local confidence is below ROUTER_MIN_CONFIDENCE.
+    """
+    cfg = RouterConfig(
+        mode=os.getenv("ROUTER_MODE", "llm").lower(),
+        min_confidence=float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.6")),
+    )
+    logger.info("[CONFIG] Loaded RouterConfig -> %s", cfg.model_dump())
+    return cfg
+
+
+class RetrievalConfig(BaseModel):
+    """
+    Configuration model for per-agent retrieval
+    """
+    bfsi_mode: str = "hybrid"
+    bfsi_k: int = 3
+    general_mode: str = "dense"
+    general_k: int = 3
+    context_token_budget: int = 1500
+    speculative: bool = True
+
+    @field_validator("bfsi_mode", "general_mode")
+    @classmethod
+    def known_mode(cls, v: str) -> str:
+        if v not in ("dense", "lexical", "hybrid"):
+            raise ValueError("Retrieval mode must be 'dense', 'lexical' or 'hybrid'")
+        return v
+
+
+def get_retrieval_config() -> RetrievalConfig:
+    """
+    Load per-agent retrieval configuration from environment variables.
+
+    BFSI_RETRIEVAL_MODE / GENERAL_RETRIEVAL_MODE pick dense, lexical (BM25)
+    or hybrid (reciprocal-rank fusion of both) retrieval; *_RETRIEVAL_K
+    set the number of chunks retrieved for each agent. CONTEXT_TOKEN_BUDGET
+    caps the (approximate) prompt tokens spent on retrieved context.
+    SPECULATIVE_RETRIEVAL runs BFSI retrieval concurrently with routing.
+    """
+    cfg = RetrievalConfig(
+        bfsi_mode=os.getenv("BFSI_RETRIEVAL_MODE", "hybrid").lower(),
+        bfsi_k=int(os.getenv("BFSI_RETRIEVAL_K", "3")),
+        general_mode=os.getenv("GENERAL_RETRIEVAL_MODE", "dense").lower(),
+        general_k=int(os.getenv("GENERAL_RETRIEVAL_K", "3")),
+        context_token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500")),
+        speculative=os.getenv("SPECULATIVE_RETRIEVAL", "true").lower() == "true",
+    )
+    logger.info("[CONFIG] Loaded RetrievalConfig -> %s", cfg.model_dump())
+    return cfg
+
+
+class BatchChatConfig(BaseModel):
+    """
+    Configuration model for the /chat/batch endpoint
+    """
+    max_items: int = 10000
+    concurrency: int = 8
+    max_concurrency: int = 64
+    embed_window: int = 256
+
+
+def get_batch_chat_config() -> BatchChatConfig:
+    """
+    Load batch chat configuration from environment variables.
+
+    BATCH_MAX_ITEMS caps the items of one /chat/batch request.
+    BATCH_CONCURRENCY is the default number of turns in flight per batch;
+    a request may ask for up to BATCH_MAX_CONCURRENCY. Queries are
+    embedded BATCH_EMBED_WINDOW at a time, one window ahead of the turns
+    (only with the embedding cache enabled, which carries the vectors).
+    """
+    cfg = BatchChatConfig(
+        max_items=int(os.getenv("BATCH_MAX_ITEMS", "10000")),
+        concurrency=int(os.getenv("BATCH_CONCURRENCY", "8")),
+        max_concurrency=int(os.getenv("BATCH_MAX_CONCURRENCY", "64")),
+        embed_window=int(os.getenv("BATCH_EMBED_WINDOW", "256")),
+    )
+    logger.info("[CONFIG] Loaded BatchChatConfig -> %s", cfg.model_dump())
+    return cfg
+
+
+class SessionStoreConfig(BaseModel):
+    """
+    Configuration model for chat session storage
+    """
+    backend: str = "memory"
+    path: str = ".index/sessions.sqlite"
+    max_turns: int = 50
+    history_window: int = 10
+    idle_ttl_seconds: float = 86400.0
+    max_sessions: int = 10000
+    max_memory_mb: float = 64.0
+
+    @field_validator("backend")
+    @classmethod
+    def known_backend(cls, v: str) -> str:
+        if v not in ("memory", "sqlite"):
+            raise ValueError("SESSION_STORE must be 'memory' or 'sqlite'")
+        return v
+
+
+def get_session_store_config() -> SessionStoreConfig:
+    """
+    Load session store configuration from environment variables.
+
+    SESSION_STORE=memory keeps sessions in a bounded LRU (SESSION_MAX_SESSIONS,
+    SESSION_MAX_MEMORY_MB); SESSION_STORE=sqlite persists them in
+    SESSION_DB_PATH. Each session keeps its last SESSION_MAX_TURNS turns and
+    is dropped after SESSION_IDLE_TTL_SECONDS without activity. The agents
+    are given the last SESSION_HISTORY_WINDOW turns.
+    """
+    cfg = SessionStoreConfig(
+        backend=os.getenv("SESSION_STORE", "memory").lower(),
+        path=os.getenv("SESSION_DB_PATH", ".index/sessions.sqlite"),
+        max_turns=int(os.getenv("SESSION_MAX_TURNS", "50")),
+        history_window=int(os.getenv("SESSION_HISTORY_WINDOW", "10")),
+        idle_ttl_seconds=float(os.getenv("SESSION_IDLE_TTL_SECONDS", "86400")),
+        max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", "10000")),
+        max_memory_mb=float(os.getenv("SESSION_MAX_MEMORY_MB", "64")),
+    )
+    logger.info("[CONFIG] Loaded SessionStoreConfig -> %s", cfg.model_dump())
+    return cfg
+
+
+class HistoryConfig(BaseModel):
+    """
+    Configuration model for prompt history compaction
+    """
+    summary_enabled: bool = True
+    keep_recent: int = 4
+    summarize_every: int = 4
+    token_budget: int = 800
+
+
+def get_history_config() -> HistoryConfig:
+    """
+    Load history compaction configuration from environment variables.
+
+    Turns older than the last HISTORY_KEEP_RECENT are folded into a rolling
+    summary in the background once HISTORY_SUMMARIZE_EVERY of them are
+    waiting (HISTORY_SUMMARY_ENABLED=false turns this off). The history
+    given to each agent is capped at about HISTORY_TOKEN_BUDGET tokens.
+    """
+    cfg = HistoryConfig(
+        summary_enabled=os.getenv("HISTORY_SUMMARY_ENABLED", "true").lower() == "true",
+        keep_recent=int(os.getenv("HISTORY_KEEP_RECENT", "4")),
+        summarize_every=int(os.getenv("HISTORY_SUMMARIZE_EVERY", "4")),
+        token_budget=int(os.getenv("HISTORY_TOKEN_BUDGET", "800")),
+    )
+    logger.info("[CONFIG] Loaded HistoryConfig -> %s", cfg.model_dump())
+    return cfg
+
+
+class StartupConfig(BaseModel):
+    """
+    Configuration model for service startup
+    """
+    mode: str = "lazy"
+    warmup: bool = True
+
+    @field_validator("mode")
+    @classmethod
+    def known_mode(cls, v: str) -> str:
+        if v not in ("lazy", "eager"):
+            raise ValueError("STARTUP_MODE must be 'lazy' or 'eager'")
+        return v
+
+
+def get_startup_config() -> StartupConfig:
+    """
+    Load startup configuration from environment variables.
+
+    STARTUP_MODE=lazy (default) lets the server accept connections right
+    away and builds the service in the background; until it is ready,
+    /ready and the API endpoints answer 503. STARTUP_MODE=eager builds it
+    before the server starts listening. STARTUP_WARMUP=false skips the
+    model warmup.
+    """
+    cfg = StartupConfig(
+        mode=os.getenv("STARTUP_MODE", "lazy").lower(),
+        warmup=os.getenv("STARTUP_WARMUP", "true").lower() == "true",
+    )
+    logger.info("[CONFIG] Loaded StartupConfig -> %s", cfg.model_dump())
+    return cfg
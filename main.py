@@ -1,88 +1,593 @@
-from typing import Dict, List
-from fastapi import FastAPI
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional, Union
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from config import get_hf_client, get_hf_config
-from rag.vector_store import VectorStore
+from config import (
+    configure_logging,
+    get_answer_cache_config,
+    get_batch_chat_config,
+    get_history_config,
+    get_hf_config,
+    get_llm_gateway_config,
+    get_retrieval_config,
+    get_router_config,
+    get_session_store_config,
+    get_startup_config,
+    get_vector_store_config,
+)
+from rag.answer_cache import SemanticAnswerCache, context_fingerprint, history_fingerprint
+from rag.embedders import embedding_model_id
+from rag.embedding_cache import EmbeddingCache
+from rag.ingest import ingest_paths
+from rag.jobs import IndexingJobQueue
+from rag.vector_store import EMBEDDING_MODEL_NAME, VectorStore
+from agents.history import HistoryCompactor
+from agents.intent_router import EmbeddingIntentRouter
+from agents.llm_gateway import LLMError, LLMGateway
 from agents.supervisor_agent import SupervisorAgent
 from agents.bfsi_agent import BFSIAgent
 from agents.general_agent import GeneralAgent
 from agents.unwanted_agent import UnwantedAgent
+from metrics import BATCH_ITEMS, observe_turn, render_latest
+from session_store import create_session_store
+from startup import ServiceLoader
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 class AgenticRAGService:
     """
     Main orchestrator class:
-    - Keeps in-memory session chat history
+    - Keeps session chat history in a bounded session store
     - Uses supervisor to find intent
     - Routes to correct agent (loan/general/unwanted)
+
+    progress(phase) is called as initialization moves through its phases
+    (see startup.ServiceLoader).
     """
-    def __init__(self):
-        print("[SERVICE] Initializing AgenticRAGService...")
+    def __init__(self, progress: Optional[Callable[[str], None]] = None):
+        logger.info("[SERVICE] Initializing AgenticRAGService...")
+        progress = progress or (lambda phase: None)
         self.cfg = get_hf_config()
-        self.client = get_hf_client(self.cfg)
+        # Pooled, deadline-bound LLM client shared by all agents
+        self.llm = LLMGateway(self.cfg, get_llm_gateway_config())
         # reading docs and setting up vector store
-        self.vector_store = VectorStore()
-        self.vector_store.add_pdf("data/sample_loan3.pdf", category="loan")
+        progress("vector_store")
+        vs_cfg = get_vector_store_config()
+        embedding_cache = None
+        if vs_cfg.embed_cache_size > 0:
+            embedding_cache = EmbeddingCache(
+                embedding_model_id(EMBEDDING_MODEL_NAME, vs_cfg.embed_engine),
+                max_entries=vs_cfg.embed_cache_size,
+                disk_path=vs_cfg.embed_cache_path,
+            )
+        self.vector_store = VectorStore(
+            persist_dir=vs_cfg.persist_dir,
+            collection_name=vs_cfg.collection_name,
+            backend=vs_cfg.backend,
+            vector_dtype=vs_cfg.vector_dtype,
+            embedding_cache=embedding_cache,
+            executor_workers=vs_cfg.executor_workers,
+            embed_batch_max=vs_cfg.embed_batch_max,
+            embed_batch_wait_ms=vs_cfg.embed_batch_wait_ms,
+            embed_engine=vs_cfg.embed_engine,
+            onnx_file=vs_cfg.onnx_file,
+            dedup_threshold=vs_cfg.dedup_threshold if vs_cfg.dedup_enabled else None,
+            refresh_seconds=vs_cfg.refresh_seconds,
+        )
+        progress("ingest")
+        ingest_paths(
+            self.vector_store,
+            vs_cfg.data_dir,
+            category="loan",
+            workers=vs_cfg.ingest_workers,
+        )
+        # Documents uploaded at runtime are indexed in the background
+        self.indexing_jobs = IndexingJobQueue(self.vector_store, vs_cfg.upload_dir)
     
         # Initialize agents
-        self.supervisor = SupervisorAgent(self.client, self.cfg)
-        self.bfsi_agent = BFSIAgent(self.client, self.cfg, self.vector_store)
-        self.general_agent = GeneralAgent(self.client, self.cfg, self.vector_store)
-        self.unwanted_agent = UnwantedAgent(self.client, self.cfg)
+        progress("agents")
+        router_cfg = get_router_config()
+        router = None
+        if router_cfg.mode == "local":
+            router = EmbeddingIntentRouter(
+                self.vector_store.embed,
+                executor=self.vector_store.executor,
+            ).fit()
+        self.supervisor = SupervisorAgent(
+            self.llm,
+            self.cfg,
+            router=router,
+            min_confidence=router_cfg.min_confidence,
+        )
+        retrieval_cfg = get_retrieval_config()
+        self.bfsi_agent = BFSIAgent(
+            self.llm, self.cfg, self.vector_store,
+            retrieval_mode=retrieval_cfg.bfsi_mode, k=retrieval_cfg.bfsi_k,
+            context_token_budget=retrieval_cfg.context_token_budget,
+        )
+        self.general_agent = GeneralAgent(
+            self.llm, self.cfg, self.vector_store,
+            retrieval_mode=retrieval_cfg.general_mode, k=retrieval_cfg.general_k,
+            context_token_budget=retrieval_cfg.context_token_budget,
+        )
+        # Overlap BFSI retrieval with the routing call (see _aprepare_turn)
+        self.speculative_retrieval = retrieval_cfg.speculative
+        self.unwanted_agent = UnwantedAgent(self.llm, self.cfg)
+        self.batch_cfg = get_batch_chat_config()
+
+        # Cross-session cache of generated answers
+        ac_cfg = get_answer_cache_config()
+        self.answer_cache = None
+        if ac_cfg.enabled:
+            self.answer_cache = SemanticAnswerCache(
+                threshold=ac_cfg.threshold,
+                ttl_seconds=ac_cfg.ttl_seconds,
+                max_entries=ac_cfg.max_entries,
+            )
+
+        # Chat history per session_id (bounded in-memory LRU or SQLite)
+        progress("sessions")
+        session_cfg = get_session_store_config()
+        self.sessions = create_session_store(
+            session_cfg.backend,
+            path=session_cfg.path,
+            max_turns=session_cfg.max_turns,
+            idle_ttl_seconds=session_cfg.idle_ttl_seconds,
+            max_sessions=session_cfg.max_sessions,
+            max_bytes=int(session_cfg.max_memory_mb * 1024 * 1024),
+        )
+        # Agents only read the most recent turns, plus a rolling summary
+        # of older ones maintained off the request path
+        self.history_window = session_cfg.history_window
+        history_cfg = get_history_config()
+        self.history = HistoryCompactor(
+            self.llm,
+            self.cfg,
+            self.sessions,
+            keep_recent=history_cfg.keep_recent,
+            summarize_every=history_cfg.summarize_every,
+            token_budget=history_cfg.token_budget,
+            enabled=history_cfg.summary_enabled,
+        )
 
-        # In-memory chat history per session_id
-        self.sessions = {}
+        logger.info("[SERVICE] AgenticRAGService initialized successfully.")
 
-        print("[SERVICE] AgenticRAGService initialized successfully.")
+    def warmup(self):
+        """
+        Load the embedding model and exercise every retrieval path once,
+        so the first user request does not pay for it.
+        """
+        self.vector_store.warmup()
+        if self.supervisor.router is not None:
+            self.supervisor.router.classify("warmup")
 
     def get_history(self, session_id: str) -> List[Dict]:
-        if session_id not in self.sessions:
-            self.sessions[session_id] = []
-        return self.sessions[session_id]
+        """
+        The history the agents get to see: rolling summary plus recent
+        turns, within the history token budget.
+        """
+        turns = self.sessions.load(session_id, limit=self.history_window)
+        return self.history.view(session_id, turns)
+
+    async def aget_history(self, session_id: str) -> List[Dict]:
+        """
+        get_history() off the event loop; the session store may do disk I/O.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.get_history, session_id)
+
+    async def _aappend(self, session_id: str, *turns: Dict) -> List[Dict]:
+        """
+        sessions.append() of each turn, in order and off the event loop;
+        returns the stored turns.
+        """
+        def append() -> List[Dict]:
+            return [self.sessions.append(session_id, turn) for turn in turns]
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, append)
 
     def handle_user_message(self, session_id: str, user_message: str) -> Dict:
-        print(f" New message for session_id={session_id}: {user_message}")
-        history = self.get_history(session_id)
+        """
+        Blocking wrapper around ahandle_user_message() for scripts.
+        Must not be called from inside a running event loop.
+        """
+        async def run():
+            try:
+                return await self.ahandle_user_message(session_id, user_message)
+            finally:
+                # the LLM session is bound to this loop, which ends here
+                await self.llm.arelease()
+
+        return asyncio.run(run())
+
+    async def ahandle_user_message(self, session_id: str, user_message: str) -> Dict:
+        turn = await self._aprepare_turn(session_id, user_message)
+
+        answer, cached = turn["cached_answer"], True
+        if answer is None:
+            answer, turn["timings"]["llm_ms"] = await self._atimed(
+                turn["agent"].aanswer(user_message, turn["history"], turn["context"])
+            )
+            cached = False
+
+        return await self._afinish_turn(turn, answer, cached)
+
+    async def astream_user_message(self, session_id: str,
+                                   user_message: str) -> AsyncIterator[Dict]:
+        """
+        Streaming variant of ahandle_user_message().
+
+        Yields {"event": "route"} with the routing decision first, then one
+        {"event": "token"} per answer fragment, and finally {"event": "done"}
+        carrying the same payload ahandle_user_message() returns. The message
+        and the full answer are appended to the session history before
+        "done"; nothing is stored if generation fails.
+        """
+        turn = await self._aprepare_turn(session_id, user_message)
+        yield {
+            "event": "route",
+            "data": {
+                "session_id": session_id,
+                "intent": turn["intent"],
+                "agent": turn["agent_used"],
+                "routing": turn["routing"],
+            },
+        }
+
+        if turn["cached_answer"] is not None:
+            yield {"event": "token", "data": turn["cached_answer"]}
+            yield {"event": "done", "data": await self._afinish_turn(
+                turn, turn["cached_answer"], True
+            )}
+            return
+
+        parts: List[str] = []
+        llm_started = time.perf_counter()
+        async for token in turn["agent"].astream_answer(
+            user_message, turn["history"], turn["context"]
+        ):
+            if not parts:
+                turn["timings"]["first_token_ms"] = (
+                    (time.perf_counter() - turn["started"]) * 1000
+                )
+            parts.append(token)
+            yield {"event": "token", "data": token}
+        turn["timings"]["llm_ms"] = (time.perf_counter() - llm_started) * 1000
+
+        yield {"event": "done", "data": await self._afinish_turn(turn, "".join(parts), False)}
+
+    async def abatch_user_messages(self, items: List[Dict],
+                                   concurrency: int) -> AsyncIterator[Dict]:
+        """
+        Answer many {"session_id", "message", "id"?} items, yielding one
+        result per item in completion order.
+
+        - Queries are embedded embed_window at a time, one call per
+          window and one window ahead of the turns; routing, retrieval
+          and the answer cache lookup then hit the embedding cache.
+        - Turns of one session run in input order, one after another, so
+          later turns see the earlier answers; at most concurrency turns
+          are in flight overall.
+        - A failed item yields "error" (the LLMError kind, or "internal")
+          and "message" instead of an answer; the batch goes on.
+
+        Each result is the ahandle_user_message() payload plus "index"
+        (position in items) and "id"; timings gain batch_wait_ms, the
+        time the turn waited for a free slot.
+        """
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+        results: asyncio.Queue = asyncio.Queue()
+        # The embedding cache carries the vectors from the window call to
+        # the turns; without it every turn embeds on its own (still
+        # micro-batched across turns by the embedding batcher)
+        window = (
+            max(self.batch_cfg.embed_window, 1)
+            if self.vector_store.embedding_cache is not None else 0
+        )
+        windows = -(-len(items) // window) if window else 0
+        embedded = [asyncio.Event() for _ in range(windows)]
+        opened = [asyncio.Event() for _ in range(windows)]
 
-        # Append user message to history
+        async def prefetch():
+            for w in range(windows):
+                if w:
+                    # one window ahead, so the cache does not evict
+                    # vectors before their turns run
+                    await opened[w - 1].wait()
+                batch = items[w * window:(w + 1) * window]
+                try:
+                    await self.vector_store.aembed(
+                        list(dict.fromkeys(item["message"] for item in batch))
+                    )
+                except Exception as exc:
+                    logger.warning(f"[BATCH] Embedding window {w} failed: {exc}")
+                embedded[w].set()
+
+        async def run_item(index: int):
+            item = items[index]
+            if window:
+                await embedded[index // window].wait()
+            queued = time.perf_counter()
+            async with semaphore:
+                if window:
+                    opened[index // window].set()
+                slot = time.perf_counter()
+                wait_ms = (slot - queued) * 1000
+                try:
+                    result = await self.ahandle_user_message(item["session_id"], item["message"])
+                    result["timings"]["batch_wait_ms"] = wait_ms
+                    outcome = "ok"
+                except Exception as exc:
+                    outcome = exc.kind if isinstance(exc, LLMError) else "internal"
+                    logger.error(f"[BATCH] Item {index} failed ({outcome}): {exc}")
+                    result = {
+                        "session_id": item["session_id"],
+                        "error": outcome,
+                        "message": str(exc),
+                        "timings": {
+                            "batch_wait_ms": wait_ms,
+                            "total_ms": (time.perf_counter() - slot) * 1000,
+                        },
+                    }
+            BATCH_ITEMS.labels(outcome=outcome).inc()
+            await results.put(dict(result, index=index, id=item.get("id")))
+
+        async def run_session(indexes: List[int]):
+            for index in indexes:
+                await run_item(index)
+
+        by_session: Dict[str, List[int]] = {}
+        for index, item in enumerate(items):
+            by_session.setdefault(item["session_id"], []).append(index)
+        tasks = [asyncio.create_task(run_session(indexes)) for indexes in by_session.values()]
+        if windows:
+            tasks.append(asyncio.create_task(prefetch()))
+        logger.info(
+            f"[BATCH] {len(items)} item(s) across {len(by_session)} session(s), "
+            f"concurrency {concurrency}"
+        )
+        try:
+            for _ in range(len(items)):
+                yield await results.get()
+        finally:
+            # Client gone or batch done: stop whatever is still queued
+            for task in tasks:
+                task.cancel()
+        logger.info(f"[BATCH] {len(items)} item(s) done in {time.perf_counter() - started:.1f}s")
+
+    async def _aprepare_turn(self, session_id: str, user_message: str) -> Dict:
+        """
+        Everything that happens before generation: history, routing,
+        retrieval and the semantic answer cache lookup.
+        """
+        logger.debug("[SERVICE] New message for session_id=%s: %s", session_id, user_message)
+        history = await self.aget_history(session_id)
+
+        # The user message is only stored together with its answer
+        # (_afinish_turn): a turn whose generation fails leaves no
+        # unanswered message in the session
         history.append({"role": "user", "content": user_message, "agent": None})
-        print(f"[SERVICE] Current history length: {len(history)}")
-        intent = self.supervisor.decide_agent(user_message, history)
-        intent = intent.strip().lower()
-        print(f"[SERVICE] Initial intent from supervisor: {intent}")
+        logger.debug("[SERVICE] Loaded %d recent turn(s) for the session.", len(history))
+
+        started = time.perf_counter()
+        timings: Dict = {"speculative_retrieval": None}
+
+        # Speculatively retrieve for the BFSI agent while the supervisor
+        # is still deciding; the result is reused if the chosen agent
+        # retrieves the same way, and discarded otherwise
+        speculation = None
+        if self.speculative_retrieval:
+            speculation = asyncio.create_task(
+                self._atimed(self.bfsi_agent.aretrieve(user_message))
+            )
+            # never leave a discarded task's exception unretrieved
+            speculation.add_done_callback(lambda t: t.cancelled() or t.exception())
 
         # Route using supervisor
-        intent = self.supervisor.decide_agent(user_message, history)
-        print(f"[SERVICE] Supervisor decided intent: {intent}")
+        try:
+            routing = await self.supervisor.aroute(user_message, history)
+        except BaseException:
+            if speculation is not None:
+                speculation.cancel()
+            raise
+        intent = routing["intent"]
+        timings["route_ms"] = (time.perf_counter() - started) * 1000
+        logger.debug(
+            "[SERVICE] Supervisor decided intent: %s (method=%s, %.1f ms)",
+            intent, routing["method"], routing["latency_ms"],
+        )
 
         # Call appropriate agent
-        if intent == "bfsi":
-            answer = self.bfsi_agent.handle(user_message, history)
-            agent_used = "bfsi_agent"
-        elif intent == "general":
-            answer = self.general_agent.handle(user_message, history)
-            agent_used = "general_agent"
+        agent, agent_used = self._select_agent(intent)
+        reuse = (
+            speculation is not None
+            and agent.retrieval_key is not None
+            and agent.retrieval_key == self.bfsi_agent.retrieval_key
+        )
+        wait_started = time.perf_counter()
+        if reuse:
+            context, timings["retrieval_ms"] = await speculation
+            timings["speculative_retrieval"] = "used"
         else:
-            answer = self.unwanted_agent.handle(user_message, history)
-            agent_used = "unwanted_agent"
-        print(f"[SERVICE] Agent {agent_used} provided answer.")
+            if speculation is not None:
+                speculation.cancel()
+                timings["speculative_retrieval"] = "discarded"
+            context, timings["retrieval_ms"] = await self._atimed(
+                agent.aretrieve(user_message)
+            )
+        # Time spent waiting for retrieval after routing finished; with a
+        # used speculation this is the part not hidden behind routing
+        timings["retrieval_wait_ms"] = (time.perf_counter() - wait_started) * 1000
+        # embed / vector query / context build breakdown from the agent
+        timings.update(context.get("stage_ms", {}))
 
-
-        # Append assistant response to history
-        history.append({"role": "assistant", "content": answer, "agent": agent_used})
-        print(f"[SERVICE] Appended assistant response from {agent_used}. History length: {len(history)}")
-        print(f"history: {history}")
-        return {
+        turn = {
             "session_id": session_id,
+            "user_message": user_message,
+            "history": history,
+            "routing": routing,
             "intent": intent,
+            "agent": agent,
+            "agent_used": agent_used,
+            "context": context,
+            "cache_key": None,
+            "cached_answer": None,
+            "started": started,
+            "timings": timings,
+        }
+
+        if self.answer_cache is not None:
+            # RAG agents already embedded the query, so this is usually an
+            # embedding cache hit
+            query_vector = (await self.vector_store.aembed([user_message]))[0]
+            # history ends with the message being answered; what came
+            # before it is part of the key, so follow-ups never match
+            # answers given in another conversation
+            turn["cache_key"] = (
+                query_vector,
+                context_fingerprint(context["text"]),
+                self.vector_store.index_version,
+                history_fingerprint(history[:-1]),
+            )
+            turn["cached_answer"] = self.answer_cache.lookup(
+                agent_used, *turn["cache_key"]
+            )
+
+        return turn
+
+    @staticmethod
+    async def _atimed(awaitable):
+        """
+        Await and return (result, elapsed_ms).
+        """
+        start = time.perf_counter()
+        result = await awaitable
+        return result, (time.perf_counter() - start) * 1000
+
+    async def _afinish_turn(self, turn: Dict, answer: str, cached: bool) -> Dict:
+        """
+        Record the answer in the answer cache, and the user message and
+        the answer in the session history.
+        """
+        agent_used = turn["agent_used"]
+        logger.debug("[SERVICE] Agent %s provided answer (cached=%s).", agent_used, cached)
+
+        if turn["cache_key"] is not None and not cached:
+            query_vector, context_key, index_version, history_key = turn["cache_key"]
+            self.answer_cache.store(
+                agent_used, query_vector, answer, context_key, index_version, history_key
+            )
+
+        _, stored = await self._aappend(
+            turn["session_id"],
+            turn["history"][-1],
+            {"role": "assistant", "content": answer, "agent": agent_used},
+        )
+        logger.debug(
+            "[SERVICE] Appended assistant response from %s (seq=%d).", agent_used, stored["seq"]
+        )
+        self.history.schedule(turn["session_id"])
+
+        timings = dict(
+            turn["timings"],
+            total_ms=(time.perf_counter() - turn["started"]) * 1000,
+        )
+        observe_turn(agent_used, timings, cached)
+        return {
+            "session_id": turn["session_id"],
+            "intent": turn["intent"],
             "agent": agent_used,
             "answer": answer,
+            "cached": cached,
+            "routing": turn["routing"],
+            "retrieval": {
+                key: value
+                for key, value in turn["context"].items()
+                if key not in ("text", "stage_ms")
+            },
+            "timings": timings,
+        }
+
+    def _select_agent(self, intent: str):
+        if intent == "bfsi":
+            return self.bfsi_agent, "bfsi_agent"
+        if intent == "general":
+            return self.general_agent, "general_agent"
+        return self.unwanted_agent, "unwanted_agent"
+
+    def get_stats(self) -> Dict:
+        cache = self.vector_store.embedding_cache
+        return {
+            "embedding_cache": cache.stats() if cache is not None else None,
+            "embedding_batcher": self.vector_store.batcher.stats(),
+            "dedup": self.vector_store.dedup_stats(),
+            "answer_cache": (
+                self.answer_cache.stats() if self.answer_cache is not None else None
+            ),
+            "indexing_jobs": self.indexing_jobs.stats(),
+            "sessions": self.sessions.stats(),
+            "history": self.history.stats(),
+            "llm": self.llm.stats(),
         }
 
 # FastAPI setup
 # 
-app = FastAPI(title="Agentic RAG BFSI POC")
+# Nothing heavy happens at import time: the service is built when the app
+# starts, in the background unless STARTUP_MODE=eager
+startup_cfg = get_startup_config()
+loader = ServiceLoader(AgenticRAGService, warmup=startup_cfg.warmup)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if startup_cfg.mode == "eager":
+        await run_in_threadpool(loader.load)
+    else:
+        loader.start()
+    yield
+    if loader.service is not None:
+        await loader.service.llm.aclose()
+
+
+app = FastAPI(title="Agentic RAG BFSI POC", lifespan=lifespan)
+
+
+def get_service() -> AgenticRAGService:
+    """
+    The service, or a fast 503 while it is still starting (or failed to).
+    """
+    service = loader.service
+    if service is None:
+        raise HTTPException(
+            status_code=503,
+            detail=loader.status(),
+            headers={"Retry-After": "5"},
+        )
+    return service
+
+
+@app.exception_handler(LLMError)
+async def llm_error_handler(request: Request, exc: LLMError):
+    """
+    LLM failures map to 502 (rejected), 503 (unavailable) or 504 (timeout).
+    """
+    logger.error(f"[API] {request.url.path} failed, LLM {exc.kind}: {exc}")
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": exc.kind, "detail": str(exc)},
+    )
 
-service = AgenticRAGService()
 
 class ChatRequest(BaseModel):
     session_id: str
@@ -93,9 +598,13 @@ class ChatResponse(BaseModel):
     intent: str
     agent: str
     answer: str
+    cached: bool = False
+    routing: Optional[Dict] = None
+    retrieval: Optional[Dict] = None
+    timings: Optional[Dict] = None
 
 @app.post("/chat", response_model=ChatResponse)
-def chat(request: ChatRequest):
+async def chat(request: ChatRequest):
     """
     Simple single endpoint for the POC.
 
@@ -105,10 +614,158 @@ def chat(request: ChatRequest):
       "message": "I want to know about home loan eligibility"
     }
     """
-    print("[API] /chat endpoint called.")
-    result = service.handle_user_message(
+    logger.debug("[API] /chat endpoint called.")
+    service = get_service()
+    result = await service.ahandle_user_message(
         session_id=request.session_id,
         user_message=request.message,
     )
-    print("[API] /chat endpoint completed successfully.")
+    logger.debug("[API] /chat endpoint completed successfully.")
     return ChatResponse(**result)
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Server-Sent Events version of /chat.
+
+    Emits a "route" event with the routing decision, "token" events with
+    answer fragments as they are generated, and a final "done" event with
+    the same payload /chat returns.
+    """
+    logger.debug("[API] /chat/stream endpoint called.")
+    service = get_service()
+
+    async def events():
+        try:
+            async for event in service.astream_user_message(
+                session_id=request.session_id,
+                user_message=request.message,
+            ):
+                data = json.dumps(event["data"])
+                yield f"event: {event['event']}\ndata: {data}\n\n"
+        except Exception as exc:
+            logger.error(f"[API] /chat/stream failed: {exc}")
+            kind = exc.kind if isinstance(exc, LLMError) else "internal"
+            error = json.dumps({"error": kind, "message": str(exc)})
+            yield f"event: error\ndata: {error}\n\n"
+        logger.debug("[API] /chat/stream endpoint completed.")
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+class BatchChatItem(BaseModel):
+    session_id: str
+    message: str
+    # Echoed back as given, so callers can use their own numeric keys
+    id: Optional[Union[int, str]] = None
+
+class BatchChatRequest(BaseModel):
+    items: List[BatchChatItem]
+    concurrency: Optional[int] = None
+
+@app.post("/chat/batch")
+async def chat_batch(request: BatchChatRequest):
+    """
+    Answer a list of {"session_id", "message", "id"?} items.
+
+    Streams one JSON line per item in completion order: the /chat payload
+    plus "index" and "id", or "error" and "message" for a failed item.
+    Turns of the same session run in order; concurrency (default
+    BATCH_CONCURRENCY, capped at BATCH_MAX_CONCURRENCY) bounds the turns
+    in flight.
+    """
+    service = get_service()
+    cfg = service.batch_cfg
+    if len(request.items) > cfg.max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {cfg.max_items} items per batch",
+        )
+    concurrency = min(request.concurrency or cfg.concurrency, cfg.max_concurrency)
+    items = [item.model_dump() for item in request.items]
+    logger.debug("[API] /chat/batch called with %d item(s).", len(items))
+
+    async def lines():
+        async for result in service.abatch_user_messages(items, concurrency):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.post("/documents", status_code=202)
+async def upload_document(file: UploadFile = File(...), category: str = Form("loan")):
+    """
+    Upload a PDF for indexing.
+
+    Returns a job id immediately; extraction, chunking and embedding run
+    in the background and the new chunks become searchable together
+    when the job finishes. Poll GET /documents/jobs/{job_id} for status.
+    """
+    service = get_service()
+    filename = os.path.basename(file.filename or "")
+    if not filename.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Only PDF uploads are supported")
+
+    jobs = service.indexing_jobs
+    job_id = jobs.new_job_id()
+
+    def save():
+        with open(jobs.staging_path(job_id), "wb") as out:
+            shutil.copyfileobj(file.file, out)
+
+    await run_in_threadpool(save)
+    logger.info(f"[API] /documents received {filename} -> job {job_id}")
+    return jobs.submit(job_id, filename, category)
+
+
+@app.get("/documents/jobs/{job_id}")
+async def document_job_status(job_id: str):
+    """
+    Status of a background indexing job: queued, running, done or failed.
+    """
+    job = get_service().indexing_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return job
+
+
+@app.get("/stats")
+def stats():
+    """
+    Cache hit/miss counters and other runtime statistics.
+    """
+    return get_service().get_stats()
+
+
+@app.get("/metrics")
+def metrics():
+    """
+    Prometheus metrics: per-stage latency histograms, LLM errors, retries,
+    hedges, circuit state and fallbacks.
+    """
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/health")
+def health():
+    """
+    Liveness: answers as soon as the process serves HTTP, with startup
+    progress. 503 only if initialization failed.
+    """
+    status = loader.status()
+    if loader.failed:
+        return JSONResponse(status_code=503, content=status)
+    return status
+
+
+@app.get("/ready")
+def ready():
+    """
+    Readiness: 200 once the service is built and warmed up, 503 before.
+    """
+    status = loader.status()
+    if not loader.ready:
+        return JSONResponse(status_code=503, content=status)
+    return status
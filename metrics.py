@@ -0,0 +1,111 @@
+# metrics.py
+"""
+Prometheus metrics for the request pipeline, served on GET /metrics.
+
+With several worker processes, set PROMETHEUS_MULTIPROC_DIR to an empty
+directory before the server starts: every worker then writes its samples
+there and any worker's /metrics reports the sum over all of them.
+"""
+import os
+from typing import Dict
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Latency buckets in seconds: sub-millisecond cache hits up to slow LLM calls
+_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+# Stage name -> key in the per-turn timings dict (milliseconds)
+STAGE_TIMINGS = {
+    "route": "route_ms",
+    "embed": "embed_ms",
+    "vector_query": "vector_query_ms",
+    "context_build": "context_build_ms",
+    "llm": "llm_ms",
+    "total": "total_ms",
+}
+
+STAGE_LATENCY = Histogram(
+    "rag_stage_latency_seconds",
+    "Latency of each request stage",
+    ["stage", "agent"],
+    buckets=_BUCKETS,
+)
+REQUESTS = Counter(
+    "rag_requests_total",
+    "Chat turns handled",
+    ["agent", "cached"],
+)
+LLM_ERRORS = Counter(
+    "rag_llm_errors_total",
+    "Failed LLM calls by kind (timeout, unavailable, error)",
+    ["agent", "kind"],
+)
+LLM_FALLBACKS = Counter(
+    "rag_llm_fallbacks_total",
+    "Fallback paths taken: local routing deferred to the LLM "
+    "(router_low_confidence) or the local intent used because LLM "
+    "routing failed (router_llm_failed)",
+    ["kind"],
+)
+LLM_RETRIES = Counter(
+    "rag_llm_retries_total",
+    "LLM attempts retried after a transient error",
+)
+LLM_HEDGES = Counter(
+    "rag_llm_hedges_total",
+    "Hedged (duplicate) LLM requests sent for slow attempts",
+)
+LLM_CIRCUIT_OPEN = Gauge(
+    "rag_llm_circuit_open",
+    "1 while the LLM circuit breaker is open (in any live worker)",
+    multiprocess_mode="livemax",
+)
+EMBED_BATCH_SIZE = Histogram(
+    "rag_embed_batch_size",
+    "Texts per embedding-model call made by the micro-batcher",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+EMBED_QUEUE_WAIT = Histogram(
+    "rag_embed_queue_wait_seconds",
+    "Time an embedding request waited in the batcher queue",
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+BATCH_ITEMS = Counter(
+    "rag_batch_items_total",
+    "Items answered through /chat/batch, by outcome (ok or the error kind)",
+    ["outcome"],
+)
+
+
+def observe_turn(agent: str, timings: Dict, cached: bool):
+    """
+    Record the stage latencies of one finished turn.
+    """
+    for stage, key in STAGE_TIMINGS.items():
+        value = timings.get(key)
+        if value is not None:
+            STAGE_LATENCY.labels(stage=stage, agent=agent).observe(value / 1000.0)
+    REQUESTS.labels(agent=agent, cached=str(cached).lower()).inc()
+
+
+def render_latest():
+    """
+    (body, content type) for the /metrics endpoint, aggregated over all
+    workers when PROMETHEUS_MULTIPROC_DIR is set.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,173 @@
+# rag/answer_cache.py
+import hashlib
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def context_fingerprint(context_text: str) -> str:
+    """
+    Stable key for the retrieved context an answer was generated from.
+    """
+    return hashlib.sha256(context_text.encode("utf-8")).hexdigest()
+
+
+def history_fingerprint(history: List[Dict]) -> str:
+    """
+    Stable key for the conversation an answer was generated in: the
+    rolling summary and earlier turns given to the prompt. Empty when
+    there are none, so only answers to opening questions are shared
+    between sessions; a follow-up ("explain that more simply") depends
+    on, and may quote, its own conversation.
+    """
+    if not history:
+        return ""
+    text = "\n".join(f"{t.get('role')}: {t.get('content') or ''}" for t in history)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SemanticAnswerCache:
+    """
+    Cross-session cache of generated answers.
+
+    Entries are scoped per namespace (the agent that produced them) and
+    matched by cosine similarity of the (normalized) query embeddings.
+    An entry is only reused when the retrieved context and the earlier
+    conversation are identical, it is younger than ttl_seconds and the
+    vector index has not changed.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        ttl_seconds: float = 3600.0,
+        max_entries: int = 1000,
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._ids = itertools.count()
+        self._index_version: Optional[int] = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def lookup(
+        self,
+        namespace: str,
+        vector: List[float],
+        context_key: str,
+        index_version: int,
+        history_key: str = "",
+    ) -> Optional[str]:
+        """
+        Return a cached answer for a similar query, or None.
+        """
+        query = np.asarray(vector, dtype=np.float32)
+        now = time.monotonic()
+
+        with self._lock:
+            self._check_version(index_version)
+            self._expire(now)
+
+            candidates = [
+                (entry_id, entry)
+                for entry_id, entry in self._entries.items()
+                if entry["namespace"] == namespace
+                and entry["context_key"] == context_key
+                and entry["history_key"] == history_key
+            ]
+            if not candidates:
+                self.misses += 1
+                return None
+
+            matrix = np.stack([entry["vector"] for _, entry in candidates])
+            scores = matrix @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            entry_id, entry = candidates[best]
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            logger.debug(
+                "[ANSWER-CACHE] Hit for namespace=%s (similarity=%.3f)",
+                namespace, float(scores[best]),
+            )
+            return entry["answer"]
+
+    def store(
+        self,
+        namespace: str,
+        vector: List[float],
+        answer: str,
+        context_key: str,
+        index_version: int,
+        history_key: str = "",
+    ):
+        with self._lock:
+            self._check_version(index_version)
+            self._entries[next(self._ids)] = {
+                "namespace": namespace,
+                "vector": np.asarray(vector, dtype=np.float32),
+                "answer": answer,
+                "context_key": context_key,
+                "history_key": history_key,
+                "created": time.monotonic(),
+            }
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """
+        Drop every cached answer.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _check_version(self, index_version: int):
+        # Any change to the vector index makes stored answers suspect
+        if self._index_version != index_version:
+            if self._entries:
+                logger.info("[ANSWER-CACHE] Vector index changed; invalidating cache.")
+                self._entries.clear()
+                self.invalidations += 1
+            self._index_version = index_version
+
+    def _expire(self, now: float):
+        # Entries are kept in insertion/use order, but a hit refreshes the
+        # position and not the age, so scan instead of stopping early.
+        expired = [
+            entry_id
+            for entry_id, entry in self._entries.items()
+            if now - entry["created"] > self.ttl_seconds
+        ]
+        for entry_id in expired:
+            del self._entries[entry_id]
@@ -0,0 +1,839 @@
+# rag/backends.py
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, single process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Metadata flag of chunks stored by an ingest that has not been published
+# yet (see VectorStore.publish); query() never returns them
+STAGED_KEY = "staged"
+
+
+class IndexChanges(NamedTuple):
+    """
+    Writes of other processes picked up by VectorBackend.refresh().
+    With reloaded set the index was reopened from scratch and the lists
+    are empty: everything derived from it must be rebuilt.
+    """
+    added: List[Tuple[str, str, Dict]]
+    updated: List[Tuple[str, Dict]]
+    removed: List[str]
+    reloaded: bool = False
+
+    @classmethod
+    def none(cls) -> "IndexChanges":
+        return cls([], [], [], False)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.updated or self.removed or self.reloaded)
+
+
+class InterProcessLock:
+    """
+    Exclusive flock on a file, held on behalf of the whole process: the
+    first acquire() takes the file lock and the last release() drops it,
+    whichever threads make the calls. Threads of one process are not
+    excluded from each other; callers keep their own locks for that.
+    Without fcntl (Windows) it only counts.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mutex = threading.Lock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    def acquire(self):
+        with self._mutex:
+            if self._depth == 0 and fcntl is not None:
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                except BaseException:
+                    os.close(fd)
+                    raise
+                self._fd = fd
+            self._depth += 1
+
+    def release(self):
+        with self._mutex:
+            self._depth -= 1
+            if self._depth == 0 and self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+                os.close(self._fd)
+                self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class VectorBackend:
+    """
+    Storage/retrieval interface behind VectorStore.
+
+    Embeddings are L2-normalized, so every backend reports "score" as
+    cosine similarity (higher is better).
+    """
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def add(self, ids: List[str], texts: List[str], metadatas: List[Dict],
+            embeddings: List[List[float]]):
+        raise NotImplementedError
+
+    def existing_ids(self, ids: List[str]) -> Set[str]:
+        raise NotImplementedError
+
+    def find(self, where: Dict, limit: Optional[int] = None) -> List[Tuple[str, Dict]]:
+        """
+        (id, metadata) of chunks whose metadata equals every key in where.
+        """
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]):
+        raise NotImplementedError
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict]):
+        """
+        Replace the metadata of stored chunks; unknown ids are skipped.
+        """
+        raise NotImplementedError
+
+    def update_and_delete(self, ids: List[str], metadatas: List[Dict],
+                          delete: List[str]):
+        """
+        update_metadata() and delete() as one write, where the backend
+        can publish them together.
+        """
+        if ids:
+            self.update_metadata(ids, metadatas)
+        if delete:
+            self.delete(delete)
+
+    def query(self, embedding: List[float], k: int) -> List[Dict]:
+        """
+        Top-k chunks as {"id", "text", "metadata", "score"}, best first.
+        Staged chunks (STAGED_KEY set) are left out.
+        """
+        raise NotImplementedError
+
+    def get(self, ids: List[str]) -> List[Dict]:
+        """
+        Stored chunks as {"id", "text", "metadata"}; unknown ids are skipped.
+        """
+        raise NotImplementedError
+
+    def iter_documents(self) -> Iterator[Tuple[str, str, Dict]]:
+        """
+        (id, text, metadata) of every stored chunk.
+        """
+        raise NotImplementedError
+
+    def refresh(self) -> IndexChanges:
+        """
+        Pick up writes other processes made to the same index.
+        """
+        return IndexChanges.none()
+
+    def writer(self):
+        """
+        Context manager that keeps writers in other processes out.
+        """
+        return contextlib.nullcontext()
+
+
+class ChromaBackend(VectorBackend):
+    """
+    Chroma collection, in-memory or persistent.
+    """
+
+    def __init__(self, persist_dir: Optional[str], collection_name: str):
+        import chromadb
+        from chromadb.config import Settings
+
+        settings = Settings(
+            anonymized_telemetry=False,
+            allow_reset=True
+        )
+        if persist_dir:
+            logger.info(f"[VECTOR] Opening persistent Chroma DB at {persist_dir}...")
+            self.client = chromadb.PersistentClient(
+                path=persist_dir,
+                settings=settings,
+            )
+        else:
+            logger.info("[VECTOR] Setting up in-memory Chroma DB...")
+            self.client = chromadb.Client(settings)
+
+        self.collection = self.client.get_or_create_collection(
+            name=collection_name
+        )
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def add(self, ids, texts, metadatas, embeddings):
+        self.collection.add(
+            ids=ids,
+            documents=texts,
+            metadatas=metadatas,
+            embeddings=embeddings,
+        )
+
+    def existing_ids(self, ids: List[str]) -> Set[str]:
+        if not ids:
+            return set()
+        return set(self.collection.get(ids=ids, include=[])["ids"])
+
+    def find(self, where: Dict, limit: Optional[int] = None) -> List[Tuple[str, Dict]]:
+        if len(where) > 1:
+            where = {"$and": [{key: value} for key, value in where.items()]}
+        found = self.collection.get(where=where, limit=limit, include=["metadatas"])
+        return list(zip(found["ids"], [m or {} for m in found["metadatas"]]))
+
+    def delete(self, ids: List[str]):
+        self.collection.delete(ids=ids)
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict]):
+        if not ids:
+            return
+        found = self.collection.get(ids=ids, include=["metadatas"])
+        old = dict(zip(found["ids"], [m or {} for m in found["metadatas"]]))
+        pairs = [
+            # Chroma merges metadata on update; None removes a key
+            (chunk_id, dict({key: None for key in old[chunk_id]}, **meta))
+            for chunk_id, meta in zip(ids, metadatas)
+            if chunk_id in old
+        ]
+        if pairs:
+            self.collection.update(
+                ids=[chunk_id for chunk_id, _ in pairs],
+                metadatas=[meta for _, meta in pairs],
+            )
+
+    def get(self, ids: List[str]) -> List[Dict]:
+        if not ids:
+            return []
+        found = self.collection.get(ids=ids, include=["documents", "metadatas"])
+        by_id = {
+            chunk_id: {"id": chunk_id, "text": text, "metadata": meta or {}}
+            for chunk_id, text, meta in zip(
+                found["ids"], found["documents"], found["metadatas"]
+            )
+        }
+        return [by_id[chunk_id] for chunk_id in ids if chunk_id in by_id]
+
+    def iter_documents(self, page_size: int = 1000) -> Iterator[Tuple[str, str, Dict]]:
+        offset = 0
+        while True:
+            page = self.collection.get(
+                limit=page_size, offset=offset, include=["documents", "metadatas"]
+            )
+            if not page["ids"]:
+                return
+            for chunk_id, text, meta in zip(
+                page["ids"], page["documents"], page["metadatas"]
+            ):
+                yield chunk_id, text, meta or {}
+            offset += len(page["ids"])
+
+    def query(self, embedding: List[float], k: int) -> List[Dict]:
+        results = self.collection.query(
+            query_embeddings=[embedding],
+            n_results=k,
+            # also matches chunks without the key
+            where={STAGED_KEY: {"$ne": True}},
+        )
+        hits = []
+        for chunk_id, text, meta, distance in zip(
+            results.get("ids", [[]])[0],
+            results.get("documents", [[]])[0],
+            results.get("metadatas", [[]])[0],
+            results.get("distances", [[]])[0],
+        ):
+            # squared L2 between unit vectors = 2 - 2 * cosine
+            hits.append({
+                "id": chunk_id,
+                "text": text,
+                "metadata": meta or {},
+                "score": 1.0 - distance / 2.0,
+            })
+        return hits
+
+
+def quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric per-row int8 quantization: row ~= codes * scale.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales = np.maximum(scales, 1e-12).astype(np.float32)
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+class _Mapped(NamedTuple):
+    matrix: np.ndarray
+    # int8 indexes only: per-row dequantization scales and the float16
+    # copy of every row used to rescore the candidates
+    scales: Optional[np.ndarray] = None
+    rescore: Optional[np.ndarray] = None
+
+
+class _State(NamedTuple):
+    """
+    What readers of a NumpyFlatBackend use, replaced in one assignment:
+    a reader takes one reference and never pairs the row numbers of one
+    generation with the lists of another. Writes within a generation
+    only append rows or change a row's metadata, so they may extend the
+    lists and maps of the current state in place.
+    """
+    mapped: Optional[_Mapped]
+    count: int
+    ids: List[str]
+    texts: List[str]
+    metadatas: List[Dict]
+    deleted: frozenset
+    row_of: Dict[str, int]
+    rows_by_meta: Dict[Tuple[str, object], Set[int]]
+    # Rows query() skips because they are staged
+    staged: frozenset
+
+
+class NumpyFlatBackend(VectorBackend):
+    """
+    Flat index: one memory-mapped matrix of normalized embeddings plus a
+    JSON-lines sidecar with the chunk ids, texts and metadata.
+
+    Layout of the index directory:
+        manifest.json          dim, dtype, row count, file names, deleted rows
+        vectors-<gen>.bin      raw row-major float32/float16/int8 matrix
+        chunks-<gen>.jsonl     one {"id", "text", "metadata"} line per row, and
+                               a {"row", "metadata"} line per metadata update
+        scales-<gen>.bin       int8 only: float32 scale per row
+        rescore-<gen>.bin      int8 only: float16 copy of the matrix
+
+    float32 and float16 search is exact. int8 scans the quantized matrix
+    (a quarter of the float32 size) and rescores the best
+    max(RESCORE_FACTOR * k, RESCORE_MIN) candidates against the float16
+    copy, which is only paged in for those rows.
+
+    Adds append to the current files and then atomically replace the
+    manifest; deletes are tombstones until more than a quarter of the
+    rows are dead, at which point a new generation is written. Because
+    the matrix is only ever read through np.memmap, every process that
+    opens the same directory shares one copy through the page cache.
+
+    Several processes may open one directory (multi-worker serving).
+    Writes are serialized by an flock on writer.lock, and a writer first
+    catches up with whatever the others published, so it never appends
+    past rows it has not seen. refresh() applies the others' writes
+    incrementally: appended rows and metadata updates are read from the
+    chunks file past the known size, tombstones from the manifest, and
+    only a new generation is reopened from scratch.
+    """
+
+    MANIFEST = "manifest.json"
+    BLOCK_ROWS = 65536
+    DTYPES = ("float32", "float16", "int8")
+    RESCORE_FACTOR = 4
+    RESCORE_MIN = 32
+    # Metadata keys with an in-memory lookup table (used by ingestion and
+    # to hide staged rows)
+    INDEXED_KEYS = ("source", "doc_hash", STAGED_KEY)
+
+    def __init__(self, index_dir: Optional[str], dtype: str = "float32"):
+        if dtype not in self.DTYPES:
+            raise ValueError("[VECTOR] NumPy backend dtype must be float32, float16 or int8")
+        if not index_dir:
+            index_dir = tempfile.mkdtemp(prefix="flat_index_")
+            logger.info(f"[VECTOR] No persist dir set; flat index is temporary ({index_dir})")
+        os.makedirs(index_dir, exist_ok=True)
+
+        self.index_dir = index_dir
+        self.dtype = np.dtype(dtype)
+        self._write_lock = threading.Lock()
+        self._writer_lock = InterProcessLock(self._path("writer.lock"))
+        # (inode, mtime_ns, size) of the manifest this process last saw;
+        # every publish replaces the file, so the inode alone changes
+        self._manifest_stat: Optional[Tuple[int, int, int]] = None
+        # Other processes' writes not yet returned by refresh()
+        self._changes = IndexChanges.none()
+
+        self._state = self._new_state(None, 0, [], [], [], frozenset())
+        self._manifest: Dict = {}
+        self._load()
+
+    # ---------------------------------------------------------------- storage
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def _stat_manifest(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self._path(self.MANIFEST))
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _read_manifest(self) -> Optional[Dict]:
+        try:
+            with open(self._path(self.MANIFEST), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _load(self):
+        self._manifest_stat = self._stat_manifest()
+        manifest = self._read_manifest()
+        if manifest is None:
+            self._manifest = {
+                "generation": 0,
+                "dim": None,
+                "dtype": self.dtype.name,
+                "count": 0,
+                "vectors": "vectors-0.bin",
+                "chunks": "chunks-0.jsonl",
+                "chunks_bytes": 0,
+                "deleted": [],
+            }
+            self._manifest.update(self._sidecar_names(self.dtype.name, 0))
+            logger.info(f"[VECTOR] New flat index at {self.index_dir}")
+            return
+
+        if manifest["dtype"] != self.dtype.name:
+            logger.info(
+                f"[VECTOR] Index stored as {manifest['dtype']}; "
+                f"ignoring requested dtype {self.dtype.name}."
+            )
+            self.dtype = np.dtype(manifest["dtype"])
+        self._manifest = manifest
+
+        ids, texts, metadatas = [], [], []
+        with open(self._path(manifest["chunks"]), "rb") as f:
+            # bytes past chunks_bytes were never published
+            for line in f.read(manifest["chunks_bytes"]).splitlines():
+                record = json.loads(line)
+                if "row" in record:
+                    metadatas[record["row"]] = record["metadata"]
+                    continue
+                ids.append(record["id"])
+                texts.append(record["text"])
+                metadatas.append(record["metadata"])
+
+        self._state = self._new_state(self._map(manifest), manifest["count"], ids, texts,
+                                      metadatas, frozenset(manifest["deleted"]))
+        logger.info(f"[VECTOR] Opened flat index at {self.index_dir} ({self.count()} chunk(s))")
+
+    def _catch_up(self):
+        """
+        Apply what other processes published since this process last
+        looked (call with _write_lock held).
+        """
+        stat = self._stat_manifest()
+        if stat is None or stat == self._manifest_stat:
+            return
+        manifest = self._read_manifest()
+        current = self._manifest
+        if manifest["generation"] != current["generation"]:
+            for attempt in range(3):
+                try:
+                    self._load()
+                    break
+                except FileNotFoundError:
+                    # compacted again while we were reading; retry
+                    if attempt == 2:
+                        raise
+            self._changes = IndexChanges([], [], [], True)
+            logger.info(f"[VECTOR] Reopened flat index generation {self._manifest['generation']}")
+            return
+
+        state = self._state
+        ids, metadatas = state.ids, state.metadatas
+        added, updated = [], []
+        with open(self._path(manifest["chunks"]), "rb") as f:
+            f.seek(current["chunks_bytes"])
+            data = f.read(manifest["chunks_bytes"] - current["chunks_bytes"])
+        for line in data.splitlines():
+            record = json.loads(line)
+            if "row" in record:
+                row = record["row"]
+                self._unindex_row(state, row)
+                metadatas[row] = record["metadata"]
+                self._index_row(state, row)
+                updated.append((ids[row], record["metadata"]))
+                continue
+            row = len(ids)
+            ids.append(record["id"])
+            state.texts.append(record["text"])
+            metadatas.append(record["metadata"])
+            self._index_row(state, row)
+            added.append((record["id"], record["text"], record["metadata"]))
+
+        new_deleted = frozenset(manifest["deleted"])
+        removed = []
+        for row in sorted(new_deleted - state.deleted):
+            self._unindex_row(state, row)
+            removed.append(ids[row])
+        self._manifest = manifest
+        self._manifest_stat = stat
+        self.dtype = np.dtype(manifest["dtype"])
+        self._state = self._next_state(state, self._map(manifest), manifest["count"], new_deleted)
+
+        if not self._changes.reloaded:
+            self._changes = IndexChanges(
+                self._changes.added + added,
+                self._changes.updated + updated,
+                self._changes.removed + removed,
+            )
+
+    @staticmethod
+    def _sidecar_names(dtype: str, generation: int) -> Dict:
+        if dtype != "int8":
+            return {}
+        return {"scales": f"scales-{generation}.bin", "rescore": f"rescore-{generation}.bin"}
+
+    @staticmethod
+    def _vector_files(manifest: Dict) -> List[Tuple[str, np.dtype, int]]:
+        """
+        (file name, dtype, columns) of every per-row vector file.
+        """
+        files = [(manifest["vectors"], np.dtype(manifest["dtype"]), manifest["dim"])]
+        if manifest["dtype"] == "int8":
+            files.append((manifest["scales"], np.dtype(np.float32), 1))
+            files.append((manifest["rescore"], np.dtype(np.float16), manifest["dim"]))
+        return files
+
+    def _encode_rows(self, matrix: np.ndarray) -> List[np.ndarray]:
+        """
+        What to store for float32 rows, in _vector_files order.
+        """
+        if self.dtype == np.int8:
+            codes, scales = quantize_int8(matrix)
+            return [codes, scales.reshape(-1, 1), matrix.astype(np.float16)]
+        return [matrix.astype(self.dtype)]
+
+    def _map(self, manifest: Dict) -> Optional[_Mapped]:
+        if not manifest["count"]:
+            return None
+        return _Mapped(*(
+            np.memmap(self._path(name), dtype=dtype, mode="r",
+                      shape=(manifest["count"], columns))
+            for name, dtype, columns in self._vector_files(manifest)
+        ))
+
+    def _new_state(self, mapped: Optional[_Mapped], count: int, ids: List[str],
+                   texts: List[str], metadatas: List[Dict], deleted: frozenset) -> _State:
+        """
+        State of a freshly loaded or compacted generation, with new row maps.
+        """
+        state = _State(mapped, count, ids, texts, metadatas, deleted, {}, {}, frozenset())
+        for row in range(len(ids)):
+            if row not in deleted:
+                self._index_row(state, row)
+        return self._next_state(state, mapped, count, deleted)
+
+    @staticmethod
+    def _next_state(state: _State, mapped: Optional[_Mapped], count: int,
+                    deleted: frozenset) -> _State:
+        """
+        The same generation after a write (rows indexed in place already).
+        """
+        staged = frozenset(state.rows_by_meta.get((STAGED_KEY, True), ()))
+        return state._replace(mapped=mapped, count=count, deleted=deleted, staged=staged)
+
+    def _index_row(self, state: _State, row: int):
+        meta = state.metadatas[row]
+        state.row_of[state.ids[row]] = row
+        for key in self.INDEXED_KEYS:
+            if key in meta:
+                state.rows_by_meta.setdefault((key, meta[key]), set()).add(row)
+
+    def _unindex_row(self, state: _State, row: int):
+        meta = state.metadatas[row]
+        state.row_of.pop(state.ids[row], None)
+        for key in self.INDEXED_KEYS:
+            rows = state.rows_by_meta.get((key, meta.get(key)))
+            if rows is not None:
+                rows.discard(row)
+                if not rows:
+                    del state.rows_by_meta[(key, meta.get(key))]
+
+    def _publish(self, manifest: Dict):
+        tmp = self._path(self.MANIFEST + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path(self.MANIFEST))
+        self._manifest = manifest
+        self._manifest_stat = self._stat_manifest()
+
+    # ------------------------------------------------------------- interface
+
+    def count(self) -> int:
+        return len(self._state.row_of)
+
+    def refresh(self) -> IndexChanges:
+        with self._write_lock:
+            self._catch_up()
+            changes, self._changes = self._changes, IndexChanges.none()
+        return changes
+
+    def writer(self):
+        return self._writer_lock
+
+    def add(self, ids, texts, metadatas, embeddings):
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        rows = self._encode_rows(matrix)
+        with self._writer_lock, self._write_lock:
+            self._catch_up()
+            manifest = dict(self._manifest)
+            if manifest["dim"] is None:
+                manifest["dim"] = int(matrix.shape[1])
+            elif matrix.shape[1] != manifest["dim"]:
+                raise ValueError(
+                    f"[VECTOR] Embedding dim {matrix.shape[1]} != index dim {manifest['dim']}"
+                )
+
+            # Truncate to the published size first so rows from an
+            # interrupted write are never exposed
+            for (name, dtype, columns), data in zip(self._vector_files(manifest), rows):
+                with open(self._path(name), "ab") as f:
+                    f.truncate(manifest["count"] * columns * dtype.itemsize)
+                    f.write(np.ascontiguousarray(data).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+            with open(self._path(manifest["chunks"]), "ab") as f:
+                f.truncate(manifest["chunks_bytes"])
+                f.write(self._encode_records(ids, texts, metadatas))
+                f.flush()
+                os.fsync(f.fileno())
+                manifest["chunks_bytes"] = f.tell()
+
+            start = manifest["count"]
+            manifest["count"] = start + len(ids)
+            self._publish(manifest)
+
+            state = self._state
+            state.ids.extend(ids)
+            state.texts.extend(texts)
+            state.metadatas.extend(metadatas)
+            for row in range(start, manifest["count"]):
+                self._index_row(state, row)
+            self._state = self._next_state(state, self._map(manifest), manifest["count"],
+                                           state.deleted)
+
+    def existing_ids(self, ids: List[str]) -> Set[str]:
+        row_of = self._state.row_of
+        return {chunk_id for chunk_id in ids if chunk_id in row_of}
+
+    def find(self, where: Dict, limit: Optional[int] = None) -> List[Tuple[str, Dict]]:
+        state = self._state
+        count, ids, metadatas, deleted = state.count, state.ids, state.metadatas, state.deleted
+        rows = range(count)
+        for key, value in where.items():
+            if key in self.INDEXED_KEYS:
+                rows = sorted(state.rows_by_meta.get((key, value), ()))
+                break
+        found = []
+        for row in rows:
+            if row >= count or row in deleted:
+                continue
+            meta = metadatas[row]
+            if all(meta.get(key) == value for key, value in where.items()):
+                found.append((ids[row], meta))
+                if limit is not None and len(found) >= limit:
+                    break
+        return found
+
+    def delete(self, ids: List[str]):
+        self.update_and_delete([], [], ids)
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict]):
+        self.update_and_delete(ids, metadatas, [])
+
+    def update_and_delete(self, ids: List[str], metadatas: List[Dict],
+                          delete: List[str]):
+        # One manifest publish for both, so other processes pick up the
+        # updates and the tombstones in the same refresh()
+        with self._writer_lock, self._write_lock:
+            self._catch_up()
+            state = self._state
+            row_of = state.row_of
+            updates = [
+                (row_of[chunk_id], meta)
+                for chunk_id, meta in zip(ids, metadatas)
+                if chunk_id in row_of
+            ]
+            rows = [row_of[chunk_id] for chunk_id in delete if chunk_id in row_of]
+            if not updates and not rows:
+                return
+            manifest = dict(self._manifest)
+            if updates:
+                with open(self._path(manifest["chunks"]), "ab") as f:
+                    f.truncate(manifest["chunks_bytes"])
+                    f.write(b"".join(
+                        (json.dumps({"row": row, "metadata": meta}) + "\n").encode("utf-8")
+                        for row, meta in updates
+                    ))
+                    f.flush()
+                    os.fsync(f.fileno())
+                    manifest["chunks_bytes"] = f.tell()
+                for row, meta in updates:
+                    self._unindex_row(state, row)
+                    state.metadatas[row] = meta
+                    self._index_row(state, row)
+            for row in rows:
+                self._unindex_row(state, row)
+
+            deleted = state.deleted | frozenset(rows)
+            if len(deleted) * 4 > manifest["count"]:
+                self._compact(manifest, deleted)
+                return
+            manifest["deleted"] = sorted(deleted)
+            self._publish(manifest)
+            self._state = self._next_state(state, state.mapped, state.count, deleted)
+
+    def get(self, ids: List[str]) -> List[Dict]:
+        state = self._state
+        hits = []
+        for chunk_id in ids:
+            row = state.row_of.get(chunk_id)
+            if row is not None:
+                hits.append({"id": chunk_id, "text": state.texts[row],
+                             "metadata": state.metadatas[row]})
+        return hits
+
+    def iter_documents(self) -> Iterator[Tuple[str, str, Dict]]:
+        state = self._state
+        count, ids, texts, metadatas, deleted = (
+            state.count, state.ids, state.texts, state.metadatas, state.deleted
+        )
+        for row in range(count):
+            if row not in deleted:
+                yield ids[row], texts[row], metadatas[row]
+
+    def query(self, embedding: List[float], k: int) -> List[Dict]:
+        mapped, count, ids, texts, metadatas, deleted, _, _, staged = self._state
+        if mapped is None or k <= 0:
+            return []
+
+        query = np.asarray(embedding, dtype=np.float32)
+        scores = np.empty(count, dtype=np.float32)
+        # Blockwise so float16/int8 rows are upcast a block at a time
+        for start in range(0, count, self.BLOCK_ROWS):
+            block = mapped.matrix[start:start + self.BLOCK_ROWS]
+            block_scores = block.astype(np.float32, copy=False) @ query
+            if mapped.scales is not None:
+                block_scores *= mapped.scales[start:start + len(block), 0]
+            scores[start:start + len(block)] = block_scores
+        hidden = deleted | {row for row in staged if row < count} if staged else deleted
+        if hidden:
+            scores[list(hidden)] = -np.inf
+
+        alive = count - len(hidden)
+        k = min(k, alive)
+        if k <= 0:
+            return []
+        if mapped.rescore is not None:
+            # Exact scores for the best approximate candidates
+            n = min(max(k * self.RESCORE_FACTOR, self.RESCORE_MIN), alive)
+            candidates = np.sort(np.argpartition(-scores, n - 1)[:n])
+            scores[candidates] = mapped.rescore[candidates].astype(np.float32) @ query
+            top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        else:
+            top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {
+                "id": ids[row],
+                "text": texts[row],
+                "metadata": metadatas[row],
+                "score": float(scores[row]),
+            }
+            for row in top
+        ]
+
+    # ------------------------------------------------------------ maintenance
+
+    @staticmethod
+    def _encode_records(ids: List[str], texts: List[str], metadatas: List[Dict]) -> bytes:
+        return b"".join(
+            (json.dumps({"id": chunk_id, "text": text, "metadata": meta}) + "\n").encode("utf-8")
+            for chunk_id, text, meta in zip(ids, texts, metadatas)
+        )
+
+    def _compact(self, manifest: Dict, deleted: frozenset):
+        mapped, count, ids, texts, metadatas = self._state[:5]
+        keep = [row for row in range(count) if row not in deleted]
+        generation = manifest["generation"] + 1
+        new_manifest = {
+            "generation": generation,
+            "dim": manifest["dim"],
+            "dtype": manifest["dtype"],
+            "count": len(keep),
+            "vectors": f"vectors-{generation}.bin",
+            "chunks": f"chunks-{generation}.jsonl",
+            "chunks_bytes": 0,
+            "deleted": [],
+        }
+        new_manifest.update(self._sidecar_names(manifest["dtype"], generation))
+        logger.info(f"[VECTOR] Compacting flat index ({count} -> {len(keep)} rows)")
+
+        for (name, _, _), source in zip(self._vector_files(new_manifest), mapped):
+            with open(self._path(name), "wb") as f:
+                for start in range(0, len(keep), self.BLOCK_ROWS):
+                    rows = keep[start:start + self.BLOCK_ROWS]
+                    f.write(np.ascontiguousarray(source[rows]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        new_ids = [ids[row] for row in keep]
+        new_texts = [texts[row] for row in keep]
+        new_metas = [metadatas[row] for row in keep]
+        with open(self._path(new_manifest["chunks"]), "wb") as f:
+            f.write(self._encode_records(new_ids, new_texts, new_metas))
+            f.flush()
+            os.fsync(f.fileno())
+            new_manifest["chunks_bytes"] = f.tell()
+
+        old_files = [name for name, _, _ in self._vector_files(manifest)] + [manifest["chunks"]]
+        state = self._new_state(self._map(new_manifest), len(keep),
+                                new_ids, new_texts, new_metas, frozenset())
+        self._publish(new_manifest)
+        self._state = state
+        for name in old_files:
+            try:
+                os.remove(self._path(name))
+            except OSError:
+                pass
+
+
+def create_backend(kind: str, persist_dir: Optional[str], collection_name: str,
+                   dtype: str = "float32") -> VectorBackend:
+    """
+    Build the configured backend ("chroma" or "numpy").
+    """
+    if kind == "chroma":
+        return ChromaBackend(persist_dir, collection_name)
+    if kind == "numpy":
+        index_dir = os.path.join(persist_dir, collection_name) if persist_dir else None
+        return NumpyFlatBackend(index_dir, dtype=dtype)
+    raise ValueError(f"[VECTOR] Unknown vector backend: {kind!r}")
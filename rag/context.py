@@ -0,0 +1,143 @@
+# rag/context.py
+import re
+from typing import Dict, List
+
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+
+# Upper bound on the overlap searched when stitching adjacent chunks;
+# chunk_text() overlaps by 20% of max_words
+_MAX_OVERLAP_WORDS = 200
+
+# Smallest leftover budget worth filling with a truncated sentence
+_MIN_PARTIAL_TOKENS = 16
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap LLM token estimate (~4 characters per token for English).
+    """
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Longest word prefix of text within max_tokens, marked with an ellipsis.
+    """
+    words, out, used = text.split(), [], 0
+    for word in words:
+        cost = estimate_tokens(word + " ")
+        if used + cost > max_tokens - 1:
+            break
+        out.append(word)
+        used += cost
+    return " ".join(out) + " ..."
+
+
+def _merge_words(left: List[str], right: List[str]) -> List[str]:
+    """
+    Append right to left, dropping the longest suffix/prefix overlap.
+    """
+    limit = min(len(left), len(right), _MAX_OVERLAP_WORDS)
+    for size in range(limit, 0, -1):
+        if left[-size:] == right[:size]:
+            return left + right[size:]
+    return left + right
+
+
+def _build_spans(hits: List[Dict]) -> List[Dict]:
+    """
+    Merge hits from the same document with consecutive chunk indexes
+    into spans. Each span keeps the best (lowest) rank of its chunks.
+    """
+    seen = set()
+    groups: Dict[tuple, List[tuple]] = {}
+    loose: List[Dict] = []
+    for rank, hit in enumerate(hits):
+        if hit["id"] in seen:
+            continue
+        seen.add(hit["id"])
+        meta = hit.get("metadata") or {}
+        index = meta.get("chunk_index")
+        if index is None:
+            loose.append({"rank": rank, "words": hit["text"].split(), "chunks": 1})
+            continue
+        key = (meta.get("source"), meta.get("doc_hash"))
+        groups.setdefault(key, []).append((index, rank, hit["text"]))
+
+    spans = loose
+    for members in groups.values():
+        members.sort()
+        current = None
+        for index, rank, text in members:
+            words = text.split()
+            if current is not None and index == current["last_index"] + 1:
+                current["words"] = _merge_words(current["words"], words)
+                current["rank"] = min(current["rank"], rank)
+                current["chunks"] += 1
+                current["last_index"] = index
+                continue
+            current = {"rank": rank, "words": words, "chunks": 1, "last_index": index}
+            spans.append(current)
+
+    spans.sort(key=lambda span: span["rank"])
+    return spans
+
+
+def pack_context(hits: List[Dict], token_budget: int = 1500) -> Dict:
+    """
+    Assemble retrieved hits (best first) into prompt context:
+    - merge adjacent/overlapping chunks of one document into a span
+    - drop sentences that were already included
+    - add spans in relevance order until token_budget is reached,
+      cutting the last span to fit (at a sentence boundary when possible)
+
+    Returns {"text", "tokens", "raw_tokens", "tokens_saved", "chunks", "spans"}.
+    """
+    raw_tokens = estimate_tokens("\n\n".join(hit["text"] for hit in hits))
+
+    seen_sentences = set()
+    parts: List[str] = []
+    used = 0
+    for span in _build_spans(hits):
+        sentences = []
+        for sentence in _SENTENCE_SPLIT_RE.split(" ".join(span["words"])):
+            key = " ".join(sentence.lower().split())
+            if not key or key in seen_sentences:
+                continue
+            seen_sentences.add(key)
+            sentences.append(sentence)
+
+        kept, complete = [], True
+        for sentence in sentences:
+            cost = estimate_tokens(sentence) + 1
+            if used + cost > token_budget:
+                # Long unpunctuated PDF text can form one huge "sentence";
+                # use what still fits rather than dropping it entirely
+                remaining = token_budget - used
+                if remaining >= _MIN_PARTIAL_TOKENS:
+                    partial = truncate_to_tokens(sentence, remaining - 1)
+                    kept.append(partial)
+                    used += estimate_tokens(partial) + 1
+                complete = False
+                break
+            kept.append(sentence)
+            used += cost
+        if kept:
+            parts.append(" ".join(kept))
+            used += 1  # separator
+        if not complete or used >= token_budget:
+            break
+
+    text = "\n\n".join(parts)
+    tokens = estimate_tokens(text)
+    return {
+        "text": text,
+        "tokens": tokens,
+        "raw_tokens": raw_tokens,
+        "tokens_saved": max(raw_tokens - tokens, 0),
+        "chunks": len(hits),
+        "spans": len(parts),
+    }
+
+
+EMPTY_CONTEXT = pack_context([])
@@ -0,0 +1,275 @@
+# rag/dedup.py
+import json
+import re
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Metadata key of a representative chunk: JSON list of the metadata of
+# every chunk folded into it, each with its estimated "similarity".
+# Stored as a string because Chroma only accepts scalar metadata.
+DUPLICATES_KEY = "duplicates"
+
+_WORD_RE = re.compile(r"\w+")
+# Rates, amounts, tenures, clause numbers: "8.5", "1,000", "12.3"
+_FIGURE_RE = re.compile(r"\b\d+(?:[.,]\d+)*\b")
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def shingle_hashes(text: str, size: int = 5) -> np.ndarray:
+    """
+    32-bit hashes of the distinct word size-grams of text (the whole text
+    when it is shorter). crc32 rather than hash() so signatures are the
+    same in every process.
+    """
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        grams = {" ".join(words)} if words else set()
+    else:
+        grams = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter(
+        (zlib.crc32(gram.encode("utf-8")) for gram in grams),
+        dtype=np.uint64,
+        count=len(grams),
+    )
+
+
+def figures_key(text: str) -> int:
+    """
+    Hash of the figures in text. Two fee tables that differ only in their
+    rates are near-identical as shingle sets but must both be kept.
+    """
+    return zlib.crc32(" ".join(sorted(_FIGURE_RE.findall(text))).encode("utf-8"))
+
+
+def lsh_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    (bands, rows) with bands * rows == num_perm whose candidate threshold
+    (1 / bands) ** (1 / rows) is the highest one not above threshold, so
+    LSH misses few true matches and the exact check drops the rest.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1.0 / bands) ** (1.0 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+class MinHasher:
+    """
+    MinHash signatures over word shingles with the universal hash family
+    (a * x + b) mod p, vectorized over all permutations at once.
+    """
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 5, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        # a, b and x stay below 2**32, so a * x + b cannot overflow uint64
+        self.a = rng.randint(1, int(_MAX_HASH), size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, int(_MAX_HASH), size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingle_hashes(text, self.shingle_size)
+        if not len(hashes):
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        permuted = (np.outer(hashes, self.a) + self.b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """
+    LSH index of representative chunks for near-duplicate lookups.
+
+    Signatures are cut into bands; chunks sharing a band bucket are
+    candidates, and a candidate matches when the share of equal signature
+    positions (an estimate of the Jaccard similarity of the shingle sets)
+    reaches threshold and both chunks quote the same figures. Only
+    representatives are indexed, so a cluster never drifts away from the
+    chunk that is actually stored.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 64,
+                 shingle_size: int = 5):
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self.bands, self.rows = lsh_bands(num_perm, threshold)
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[int, bytes], Set[str]] = {}
+        # chunk id -> (signature, figures key, (source, doc_hash))
+        self._entries: Dict[str, Tuple[np.ndarray, int, Tuple]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._entries
+
+    def fingerprint(self, text: str) -> Tuple[np.ndarray, int]:
+        return self.hasher.signature(text), figures_key(text)
+
+    def _band_keys(self, signature: np.ndarray) -> Iterable[Tuple[int, bytes]]:
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, chunk_id: str, fingerprint: Tuple[np.ndarray, int],
+            source: Optional[str], doc_hash: Optional[str]):
+        signature, figures = fingerprint
+        with self._lock:
+            if chunk_id not in self._entries:
+                for key in self._band_keys(signature):
+                    self._buckets.setdefault(key, set()).add(chunk_id)
+            self._entries[chunk_id] = (signature, figures, (source, doc_hash))
+
+    def owner(self, chunk_id: str) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        """
+        (source, doc_hash) the representative is stored for, None if unknown.
+        """
+        entry = self._entries.get(chunk_id)
+        return entry[2] if entry is not None else None
+
+    def set_owner(self, chunk_id: str, source: Optional[str], doc_hash: Optional[str]):
+        with self._lock:
+            entry = self._entries.get(chunk_id)
+            if entry is not None:
+                self._entries[chunk_id] = (entry[0], entry[1], (source, doc_hash))
+
+    def remove(self, ids: Iterable[str]):
+        with self._lock:
+            for chunk_id in ids:
+                entry = self._entries.pop(chunk_id, None)
+                if entry is None:
+                    continue
+                for key in self._band_keys(entry[0]):
+                    bucket = self._buckets.get(key)
+                    if bucket is not None:
+                        bucket.discard(chunk_id)
+                        if not bucket:
+                            del self._buckets[key]
+
+    def match(self, fingerprint: Tuple[np.ndarray, int], source: Optional[str],
+              doc_hash: Optional[str]) -> Optional[Tuple[str, float]]:
+        """
+        Best (representative id, similarity) at or above threshold, or None.
+        Representatives of another version of the same source never match:
+        an edited document must replace its old text, not fold into it.
+        """
+        signature, figures = fingerprint
+        with self._lock:
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates.update(self._buckets.get(key, ()))
+            best = None
+            for chunk_id in candidates:
+                other, other_figures, (other_source, other_hash) = self._entries[chunk_id]
+                if other_figures != figures:
+                    continue
+                if other_source == source and other_hash != doc_hash:
+                    continue
+                similarity = float(np.mean(other == signature))
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (chunk_id, similarity)
+            return best
+
+
+class BackReferences:
+    """
+    Which representatives hold back-references to which documents, so
+    lookups by source or document hash never parse every chunk's metadata.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refs: Dict[str, List[Tuple[str, str]]] = {}
+        self._by_source: Dict[str, Set[str]] = {}
+        self._by_doc: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._refs)
+
+    def set(self, chunk_id: str, refs: List[Dict]):
+        """
+        Replace the back-references held by chunk_id.
+        """
+        with self._lock:
+            self._discard(chunk_id)
+            self._index(chunk_id, [(ref.get("source"), ref.get("doc_hash")) for ref in refs])
+
+    def add(self, chunk_id: str, refs: List[Dict]):
+        with self._lock:
+            keys = self._refs.get(chunk_id, []) + [
+                (ref.get("source"), ref.get("doc_hash")) for ref in refs
+            ]
+            self._discard(chunk_id)
+            self._index(chunk_id, keys)
+
+    def _index(self, chunk_id: str, keys: List[Tuple[str, str]]):
+        if not keys:
+            return
+        self._refs[chunk_id] = keys
+        for source, doc_hash in keys:
+            self._by_source.setdefault(source, set()).add(chunk_id)
+            self._by_doc.setdefault(doc_hash, set()).add(chunk_id)
+
+    def discard(self, ids: Iterable[str]):
+        with self._lock:
+            for chunk_id in ids:
+                self._discard(chunk_id)
+
+    def _discard(self, chunk_id: str):
+        for source, doc_hash in self._refs.pop(chunk_id, ()):
+            for table, key in ((self._by_source, source), (self._by_doc, doc_hash)):
+                holders = table.get(key)
+                if holders is not None:
+                    holders.discard(chunk_id)
+                    if not holders:
+                        del table[key]
+
+    def holders_of_source(self, source: str) -> Set[str]:
+        with self._lock:
+            return set(self._by_source.get(source, ()))
+
+    def holders_of_document(self, doc_hash: str) -> Set[str]:
+        with self._lock:
+            return set(self._by_doc.get(doc_hash, ()))
+
+    def has_document(self, doc_hash: str, source: Optional[str] = None) -> bool:
+        with self._lock:
+            holders = self._by_doc.get(doc_hash, ())
+            if source is None:
+                return bool(holders)
+            return any((source, doc_hash) in self._refs[holder] for holder in holders)
+
+
+def read_refs(meta: Dict) -> List[Dict]:
+    raw = meta.get(DUPLICATES_KEY)
+    return json.loads(raw) if raw else []
+
+
+def with_refs(meta: Dict, refs: List[Dict]) -> Dict:
+    return dict(meta, **{DUPLICATES_KEY: json.dumps(refs)})
+
+
+def make_ref(meta: Dict, similarity: float) -> Dict:
+    """
+    Back-reference for a chunk folded into a representative.
+    """
+    ref = {key: value for key, value in meta.items() if key != DUPLICATES_KEY}
+    ref["similarity"] = round(similarity, 3)
+    return ref
+
+
+def promote(refs: List[Dict]) -> Dict:
+    """
+    Metadata that hands a representative over to its first remaining
+    back-reference, when the chunk it was stored for goes away.
+    """
+    owner = {key: value for key, value in refs[0].items() if key != "similarity"}
+    return with_refs(owner, refs[1:])
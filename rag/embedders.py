@@ -0,0 +1,137 @@
+# rag/embedders.py
+import logging
+import os
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Runtimes the embedding model can be loaded in. All of them return the
+# same contract as SentenceTransformer.encode: an (n, dim) float32 array.
+#   torch       full-precision PyTorch model (reference)
+#   torch-int8  PyTorch with dynamically int8-quantized Linear layers
+#   onnx        ONNX Runtime, float32 export of the model
+#   onnx-int8   ONNX Runtime, int8-quantized export
+EMBEDDING_ENGINES = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+# ONNX exports published in the sentence-transformers model repositories
+ONNX_FILES = {
+    "onnx": "onnx/model.onnx",
+    "onnx-int8": "onnx/model_quint8_avx2.onnx",
+}
+
+
+def embedding_model_id(model_name: str, engine: str) -> str:
+    """
+    Identity of the vectors an engine produces, for cache keys. The
+    reference engine keeps the bare model name so existing caches stay valid.
+    """
+    return model_name if engine == "torch" else f"{model_name}@{engine}"
+
+
+def load_embedding_model(model_name: str, engine: str = "torch",
+                         onnx_file: Optional[str] = None):
+    """
+    Load model_name in the given engine (see EMBEDDING_ENGINES).
+    onnx_file overrides the ONNX export to use: a path in the model
+    repository or a local file.
+    """
+    if engine not in EMBEDDING_ENGINES:
+        raise ValueError(
+            f"[VECTOR] Unknown embedding engine {engine!r}; "
+            f"expected one of {EMBEDDING_ENGINES}"
+        )
+    logger.info(f"[VECTOR] Loading embedding model {model_name} ({engine})...")
+
+    if engine.startswith("onnx"):
+        return OnnxSentenceEncoder(model_name, onnx_file or ONNX_FILES[engine])
+
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    if engine == "torch-int8":
+        import torch
+
+        model = torch.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    return model
+
+
+class OnnxSentenceEncoder:
+    """
+    Sentence embeddings with ONNX Runtime: tokenizer, transformer export,
+    then the same mean pooling and normalization as the
+    sentence-transformers pipeline of the MiniLM models.
+
+    Needs the optional onnxruntime package.
+    """
+
+    def __init__(self, model_name: str, onnx_file: str, max_seq_length: int = 256,
+                 threads: Optional[int] = None):
+        try:
+            import onnxruntime as ort
+        except ImportError as exc:
+            raise RuntimeError(
+                "[VECTOR] The onnx embedding engines need onnxruntime "
+                "(pip install onnxruntime)"
+            ) from exc
+        from huggingface_hub import hf_hub_download
+        from transformers import AutoTokenizer
+
+        repo = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        path = onnx_file if os.path.exists(onnx_file) else hf_hub_download(repo, onnx_file)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(repo)
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            path, options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.max_seq_length = max_seq_length
+        logger.info(f"[VECTOR] ONNX session ready ({os.path.basename(path)}).")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return int(self.session.get_outputs()[0].shape[-1])
+
+    def encode(self, texts: List[str], batch_size: int = 32,
+               show_progress_bar: bool = False,
+               normalize_embeddings: bool = True) -> np.ndarray:
+        if isinstance(texts, str):
+            return self.encode([texts], batch_size, show_progress_bar, normalize_embeddings)[0]
+
+        # Similar lengths in one batch means less padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        pooled = []
+        for start in range(0, len(order), batch_size):
+            batch = [texts[i] for i in order[start:start + batch_size]]
+            encoded = self.tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np",
+            )
+            mask = encoded["attention_mask"].astype(np.int64)
+            feeds = {"input_ids": encoded["input_ids"].astype(np.int64), "attention_mask": mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.asarray(
+                    encoded.get("token_type_ids", np.zeros_like(mask)), dtype=np.int64
+                )
+            hidden = self.session.run(None, feeds)[0]
+
+            weights = mask[..., None].astype(np.float32)
+            summed = (hidden * weights).sum(axis=1)
+            pooled.append(summed / np.clip(weights.sum(axis=1), 1e-9, None))
+
+        if not pooled:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        vectors = np.empty((len(texts), pooled[0].shape[1]), dtype=np.float32)
+        vectors[order] = np.concatenate(pooled)
+        if normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.clip(norms, 1e-12, None)
+        return vectors
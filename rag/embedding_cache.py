@@ -0,0 +1,149 @@
+# rag/embedding_cache.py
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalization used for cache keys.
+
+    all-MiniLM-L6-v2 is an uncased model, so case and whitespace
+    differences never change the embedding.
+    """
+    return " ".join(text.split()).lower()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache:
+    - bounded in-memory LRU (always on)
+    - optional on-disk SQLite tier shared across restarts and worker
+      processes
+
+    Keys are derived from the model name and the normalized text.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_entries: int = 10000,
+        disk_path: Optional[str] = None,
+    ):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._disk: Optional[sqlite3.Connection] = None
+        if disk_path:
+            os.makedirs(os.path.dirname(disk_path) or ".", exist_ok=True)
+            # WAL and a busy timeout: worker processes share the file
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False, timeout=30)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._disk.commit()
+            logger.info(f"[EMBED-CACHE] Disk tier enabled at {disk_path}")
+
+    def key(self, text: str) -> str:
+        raw = f"{self.model_name}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up each text; returns None for entries that are not cached.
+        """
+        keys = [self.key(t) for t in texts]
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+                    self.hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+
+            if missing and self._disk is not None:
+                found = self._disk_get(list(missing))
+                for key, vector in found.items():
+                    self._remember(key, vector)
+                    for i in missing.pop(key):
+                        results[i] = vector
+                        self.disk_hits += 1
+
+            self.misses += sum(len(idx) for idx in missing.values())
+
+        return results
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]):
+        """
+        Store freshly computed embeddings in both tiers.
+        """
+        keys = [self.key(t) for t in texts]
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+            if self._disk is not None:
+                self._disk.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [
+                        (key, np.asarray(v, dtype=np.float32).tobytes())
+                        for key, v in zip(keys, vectors)
+                    ],
+                )
+                self._disk.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "model": self.model_name,
+                "entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "disk_enabled": self._disk is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (
+                    (self.hits + self.disk_hits) / lookups if lookups else 0.0
+                ),
+            }
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        # stay well below SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._disk.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                batch,
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
@@ -0,0 +1,240 @@
+# rag/ingest.py
+"""
+Bulk ingestion of whole document directories.
+
+    python -m rag.ingest data/ --category loan
+    python -m rag.ingest "policies/**/*.pdf" --workers 8 --batch-size 128
+
+PDF extraction and chunking run across a process pool, near-duplicate
+chunks are folded before embedding (when the store has dedup enabled),
+embedding runs in fixed-size batches, and index writes for one batch are
+pipelined behind the embedding of the next.
+"""
+import argparse
+import glob
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import Dict, List, Optional, Set, Tuple
+
+from rag.vector_store import VectorStore, file_sha256, iter_pdf_docs
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_pdf_paths(target: str) -> List[str]:
+    """
+    Expand a directory (all *.pdf inside, recursively) or a glob pattern.
+    """
+    if os.path.isdir(target):
+        pattern = os.path.join(target, "**", "*.pdf")
+    else:
+        pattern = target
+    return sorted(
+        path for path in glob.glob(pattern, recursive=True)
+        if os.path.isfile(path)
+    )
+
+
+def _extract_and_chunk(pdf_path: str, doc_hash: str,
+                       category: str) -> Tuple[str, List[Dict]]:
+    """
+    Process-pool worker: PDF -> chunk records. Must stay top-level so it
+    can be pickled under the spawn start method. Pages are read one at a
+    time, but the chunks of the whole document are returned (and pickled
+    to the parent) together, so memory grows with document length;
+    ingest_paths bounds how many documents are held at once.
+    """
+    return pdf_path, list(iter_pdf_docs(pdf_path, doc_hash, category, verbose=False))
+
+
+def ingest_paths(
+    vector_store: VectorStore,
+    target: str,
+    category: str = "pdf_bfsi",
+    workers: Optional[int] = None,
+    batch_size: int = 64,
+) -> Dict:
+    """
+    Ingest every PDF matched by target (directory or glob).
+
+    Documents whose content hash is already indexed are skipped. Returns
+    ingestion statistics including docs/sec, chunks/sec and the share of
+    chunks folded into near-duplicates (dedup_ratio).
+    """
+    start = time.perf_counter()
+    paths = resolve_pdf_paths(target)
+    logger.info(f"[INGEST] Found {len(paths)} PDF(s) for {target!r}")
+
+    # Hold the index writer lock for the whole run: another worker ingesting
+    # the same files waits, then finds them indexed instead of embedding
+    # them a second time
+    with vector_store.writer():
+        vector_store.sync(force=True)
+        pending = []
+        # Byte-identical to a document indexed (or about to be) from
+        # another path: recorded as copies instead of being embedded again
+        copies = []
+        for path in paths:
+            doc_hash = file_sha256(path)
+            if vector_store.has_document(doc_hash, source=path):
+                continue
+            if vector_store.has_document(doc_hash) or any(
+                doc_hash == other for _, other in pending
+            ):
+                copies.append((path, doc_hash))
+            else:
+                pending.append((path, doc_hash))
+        skipped = len(paths) - len(pending) - len(copies)
+        logger.info(
+            f"[INGEST] {len(pending)} new/changed, {len(copies)} cop(ies) of indexed "
+            f"documents, {skipped} unchanged."
+        )
+
+        docs_done = 0
+        chunks_done = 0
+        chunks_stored = 0
+        empty = 0
+        buffer: List[Dict] = []
+        last_write: Optional[Future] = None
+
+        if pending:
+            max_in_flight = 2 * (workers or os.cpu_count() or 1)
+            try:
+                # One writer thread keeps index writes ordered and lets the
+                # next batch embed while the previous one is being stored
+                with ProcessPoolExecutor(max_workers=workers) as pool, \
+                        ThreadPoolExecutor(max_workers=1) as writer:
+
+                    def flush(batch: List[Dict]):
+                        nonlocal last_write, chunks_stored
+                        batch = vector_store.deduplicate(batch)
+                        if not batch:
+                            return
+                        chunks_stored += len(batch)
+                        embeddings = vector_store.embed([d["text"] for d in batch])
+                        if last_write is not None:
+                            last_write.result()
+                        last_write = writer.submit(
+                            vector_store.add_documents, batch, embeddings, staged=True
+                        )
+
+                    # A bounded number of documents in flight: extraction
+                    # outruns embedding, and every finished future holds its
+                    # document's chunks until it is consumed
+                    todo = iter(pending)
+                    in_flight: Set[Future] = set()
+
+                    def refill():
+                        for path, doc_hash in itertools.islice(
+                            todo, max_in_flight - len(in_flight)
+                        ):
+                            in_flight.add(
+                                pool.submit(_extract_and_chunk, path, doc_hash, category)
+                            )
+
+                    refill()
+                    while in_flight:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        in_flight -= done
+                        refill()
+                        for future in done:
+                            path, docs = future.result()
+                            docs_done += 1
+                            if not docs:
+                                empty += 1
+                                logger.info(f"[INGEST] No extractable text in {path}, skipping.")
+                                continue
+
+                            buffer.extend(docs)
+                            chunks_done += len(docs)
+                            while len(buffer) >= batch_size:
+                                flush(buffer[:batch_size])
+                                buffer = buffer[batch_size:]
+
+                    if buffer:
+                        flush(buffer)
+                    if last_write is not None:
+                        last_write.result()
+            except BaseException:
+                for path, doc_hash in pending:
+                    vector_store.discard_staged(path, doc_hash)
+                raise
+
+        # New chunks were stored staged (unsearchable); each document now
+        # becomes searchable and its older versions are dropped in one
+        # write, so no document is ever missing or half-indexed
+        for path, doc_hash in pending:
+            vector_store.publish(path, doc_hash)
+
+        for path, doc_hash in copies:
+            vector_store.add_copy(path, doc_hash)
+            vector_store.remove_source(path, keep_hash=doc_hash)
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "target": target,
+        "found": len(paths),
+        "skipped_unchanged": skipped,
+        "copies": len(copies),
+        "ingested_docs": docs_done - empty,
+        "empty_docs": empty,
+        "chunks": chunks_done,
+        "chunks_stored": chunks_stored,
+        "dedup_ratio": (
+            round((chunks_done - chunks_stored) / chunks_done, 4) if chunks_done else 0.0
+        ),
+        "seconds": round(elapsed, 3),
+        "docs_per_sec": round(docs_done / elapsed, 2) if elapsed else 0.0,
+        "chunks_per_sec": round(chunks_done / elapsed, 2) if elapsed else 0.0,
+    }
+    logger.info(f"[INGEST] Done: {stats}")
+    return stats
+
+
+def main():
+    from config import configure_logging, get_vector_store_config
+
+    parser = argparse.ArgumentParser(description="Bulk-ingest PDFs into the vector index.")
+    parser.add_argument("target", help="directory or glob pattern of PDFs")
+    parser.add_argument("--category", default="pdf_bfsi")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="extraction processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=64,
+                        help="chunks per embedding batch")
+    args = parser.parse_args()
+    configure_logging()
+
+    vs_cfg = get_vector_store_config()
+    if not vs_cfg.persist_dir:
+        logger.info("[INGEST] VECTOR_PERSIST_DIR is not set; the index will not be kept.")
+    vector_store = VectorStore(
+        persist_dir=vs_cfg.persist_dir,
+        collection_name=vs_cfg.collection_name,
+        backend=vs_cfg.backend,
+        vector_dtype=vs_cfg.vector_dtype,
+        embed_batch_max=vs_cfg.embed_batch_max,
+        embed_batch_wait_ms=vs_cfg.embed_batch_wait_ms,
+        embed_engine=vs_cfg.embed_engine,
+        onnx_file=vs_cfg.onnx_file,
+        dedup_threshold=vs_cfg.dedup_threshold if vs_cfg.dedup_enabled else None,
+    )
+    ingest_paths(
+        vector_store,
+        args.target,
+        category=args.category,
+        workers=args.workers,
+        batch_size=args.batch_size,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# rag/jobs.py
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from rag.vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+
+class IndexingJobQueue:
+    """
+    Background indexing of uploaded documents.
+
+    Jobs are processed one at a time by a daemon worker thread so that
+    extraction and embedding never run on the request path. Each upload
+    is staged under upload_dir/.incoming and moved to its final name
+    when the worker picks it up, so a re-upload of the same file name
+    becomes a new version of that source.
+
+    Job records are also written to upload_dir/.jobs, so with several
+    server workers any of them can report on a job another one accepted.
+    """
+
+    def __init__(self, vector_store: VectorStore, upload_dir: str,
+                 max_jobs: int = 1000):
+        self.vector_store = vector_store
+        self.upload_dir = upload_dir
+        self.incoming_dir = os.path.join(upload_dir, ".incoming")
+        os.makedirs(self.incoming_dir, exist_ok=True)
+        self.jobs_dir = os.path.join(upload_dir, ".jobs")
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[str]" = queue.Queue()
+
+        self._worker = threading.Thread(
+            target=self._run, name="indexing-worker", daemon=True
+        )
+        self._worker.start()
+        logger.info(f"[JOBS] Indexing worker started (upload dir: {upload_dir})")
+
+    def staging_path(self, job_id: str) -> str:
+        return os.path.join(self.incoming_dir, f"{job_id}.pdf")
+
+    def _record_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _persist(self, job: Dict):
+        path = self._record_path(job["job_id"])
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(job, f)
+            os.replace(tmp, path)
+        except OSError as exc:
+            logger.warning(f"[JOBS] Could not persist job {job['job_id']}: {exc}")
+
+    def new_job_id(self) -> str:
+        return uuid.uuid4().hex
+
+    def submit(self, job_id: str, filename: str, category: str) -> Dict:
+        """
+        Queue an upload already written to staging_path(job_id).
+        """
+        job = {
+            "job_id": job_id,
+            "filename": filename,
+            "category": category,
+            "status": "queued",
+            "chunks_added": None,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._persist(job)
+            # Keep only the most recent job records
+            while len(self._jobs) > self.max_jobs:
+                old_id, _ = self._jobs.popitem(last=False)
+                try:
+                    os.remove(self._record_path(old_id))
+                except OSError:
+                    pass
+        self._queue.put(job_id)
+        logger.info(f"[JOBS] Queued job {job_id} for {filename}")
+        return dict(job)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        # Accepted by another worker process?
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self._record_path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"queued": self._queue.qsize(), "by_status": counts}
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+                self._persist(job)
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                job = dict(job) if job is not None else None
+            if job is None:
+                continue
+
+            self._update(job_id, status="running", started_at=time.time())
+            try:
+                target = os.path.join(self.upload_dir, job["filename"])
+                os.replace(self.staging_path(job_id), target)
+                # add_pdf stages the new chunks batch by batch, then
+                # publishes them and drops an older upload of the same
+                # file in one write
+                added = self.vector_store.add_pdf(target, category=job["category"])
+                self._update(
+                    job_id,
+                    status="done",
+                    chunks_added=added,
+                    finished_at=time.time(),
+                )
+                logger.info(f"[JOBS] Job {job_id} done ({added} chunk(s) added)")
+            except Exception as exc:
+                logger.error(f"[JOBS] Job {job_id} failed: {exc}")
+                self._update(
+                    job_id,
+                    status="failed",
+                    error=str(exc),
+                    finished_at=time.time(),
+                )
@@ -0,0 +1,137 @@
+# rag/lexical.py
+import heapq
+import math
+import re
+import threading
+from array import array
+from typing import Dict, Iterable, List, Tuple
+
+# Keeps BFSI terms intact: "emi", "kyc", "4.5", "80c", "clause-12.3"
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it me my of "
+    "on or the this to was what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k0: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuse several ranked id lists: score(id) = sum(1 / (k0 + rank)).
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k0 + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """
+    In-process inverted index with Okapi BM25 scoring.
+
+    Each term maps to two parallel typed arrays (document slots and term
+    frequencies), which keeps posting lists compact. Removed documents
+    are only tombstoned; the owner calls rebuild() from its document
+    store once needs_rebuild is set. Until then document frequencies
+    still count the dead slots, a small and temporary skew in IDF.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._ids: List[str] = []
+        self._slot_of: Dict[str, int] = {}
+        self._doc_len = array("I")
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._dead = set()
+        self._total_len = 0
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._slot_of
+
+    def add(self, ids: List[str], texts: List[str]):
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                if doc_id in self._slot_of:
+                    continue
+                self._add_one(doc_id, text)
+
+    def _add_one(self, doc_id: str, text: str):
+        slot = len(self._ids)
+        tokens = tokenize(text)
+        self._ids.append(doc_id)
+        self._slot_of[doc_id] = slot
+        self._doc_len.append(len(tokens))
+        self._total_len += len(tokens)
+
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, tf in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = (array("I"), array("H"))
+                self._postings[term] = postings
+            postings[0].append(slot)
+            postings[1].append(min(tf, 65535))
+
+    def remove(self, ids: List[str]):
+        with self._lock:
+            for doc_id in ids:
+                slot = self._slot_of.pop(doc_id, None)
+                if slot is None:
+                    continue
+                self._dead.add(slot)
+                self._total_len -= self._doc_len[slot]
+
+    @property
+    def needs_rebuild(self) -> bool:
+        return len(self._dead) * 4 > len(self._ids)
+
+    def rebuild(self, docs: Iterable[Tuple[str, str]]):
+        """
+        Replace the whole index with the given (id, text) pairs.
+        """
+        with self._lock:
+            self._reset()
+            for doc_id, text in docs:
+                if doc_id not in self._slot_of:
+                    self._add_one(doc_id, text)
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """
+        Top-k (id, bm25_score) for the query, best first.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._slot_of)
+            if not n_docs or not terms:
+                return []
+            avgdl = self._total_len / n_docs
+            scores: Dict[int, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                slots, tfs = postings
+                df = len(slots)
+                idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+                for slot, tf in zip(slots, tfs):
+                    if slot in self._dead:
+                        continue
+                    norm = self.k1 * (1.0 - self.b + self.b * self._doc_len[slot] / avgdl)
+                    scores[slot] = scores.get(slot, 0.0) + idf * tf * (self.k1 + 1.0) / (tf + norm)
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(self._ids[slot], score) for slot, score in best]
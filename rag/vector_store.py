@@ -1,127 +1,572 @@
 # rag/vector_store.py
-from typing import List, Dict
+import asyncio
+import hashlib
+import itertools
+import logging
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
 import PyPDF2  # for PDF extraction
 
+from metrics import EMBED_BATCH_SIZE, EMBED_QUEUE_WAIT
+from rag.backends import STAGED_KEY, VectorBackend, create_backend
+from rag.dedup import (
+    DUPLICATES_KEY,
+    BackReferences,
+    NearDuplicateIndex,
+    make_ref,
+    promote,
+    read_refs,
+    with_refs,
+)
+from rag.embedders import load_embedding_model
+from rag.embedding_cache import EmbeddingCache
+from rag.lexical import BM25Index, reciprocal_rank_fusion
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_MODES = ("dense", "lexical", "hybrid")
+
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+_SENTENCE_END = ".!?"
+
 # ------------------------------------------------------------------
-# SentenceTransformer (lazy-loaded to avoid Windows spawn issues)
+# Embedding model (lazy-loaded to avoid Windows spawn issues; the
+# runtime imports pull in torch / onnxruntime, so they are deferred too)
 # ------------------------------------------------------------------
-_embedding_model = None
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+# One loaded model per (engine, onnx_file), see rag.embedders
+_embedding_models: Dict[tuple, object] = {}
+_embedding_models_lock = threading.Lock()
 
 
-def _get_embedding_model() -> SentenceTransformer:
+def _get_embedding_model(engine: str = "torch", onnx_file: Optional[str] = None):
     """
     INTERNAL helper to load embedding model once.
     Safe to import and call optionally from other files.
     """
-    global _embedding_model
-    if _embedding_model is None:
-        print("[VECTOR] Loading SentenceTransformer model...")
-        _embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-        print("[VECTOR] SentenceTransformer model loaded.")
-    return _embedding_model
+    key = (engine, onnx_file)
+    with _embedding_models_lock:
+        if key not in _embedding_models:
+            started = time.perf_counter()
+            _embedding_models[key] = load_embedding_model(
+                EMBEDDING_MODEL_NAME, engine, onnx_file
+            )
+            logger.info(
+                f"[VECTOR] Embedding model loaded ({engine}) in "
+                f"{time.perf_counter() - started:.1f}s."
+            )
+        return _embedding_models[key]
 
 
-def extract_text_from_pdf(pdf_path: str) -> str:
+def file_sha256(path: str) -> str:
     """
-    Extract text from a PDF using PyPDF2.
+    Content hash of a file on disk, used as the document key in the index.
     """
-    print(f"[PDF] Extracting text from: {pdf_path}")
-    text_chunks = []
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_chunk_id(doc_hash: str, idx: int, text: str) -> str:
+    """
+    Content-derived chunk id: stable across restarts, unique across documents.
+    """
+    key = f"{doc_hash}:{idx}:{text}".encode("utf-8")
+    return hashlib.sha256(key).hexdigest()[:32]
+
+
+def iter_pdf_pages(pdf_path: str, verbose: bool = True) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) for each page of a PDF, 1-based, one page
+    at a time. Unreadable pages are skipped; an unreadable file yields
+    nothing. verbose=False skips the per-page log lines.
+    """
+    logger.info(f"[PDF] Extracting text from: {pdf_path}")
 
     try:
         with open(pdf_path, "rb") as f:
             reader = PyPDF2.PdfReader(f)
-            print(f"[PDF] Number of pages: {len(reader.pages)}")
+            n_pages = len(reader.pages)
+            logger.debug("[PDF] Number of pages: %d", n_pages)
 
-            for i, page in enumerate(reader.pages):
+            for i in range(n_pages):
                 try:
-                    page_text = page.extract_text() or ""
-                    print(
-                        f"[PDF] Extracted page {i + 1}/{len(reader.pages)} "
-                        f"(len={len(page_text)})"
-                    )
-                    text_chunks.append(page_text)
+                    page_text = reader.pages[i].extract_text() or ""
                 except Exception as e:
-                    print(f"[PDF][ERROR] Failed to read page {i + 1}: {e}")
+                    logger.warning(f"[PDF] Failed to read page {i + 1}: {e}")
+                    continue
+                if verbose:
+                    logger.debug(
+                        "[PDF] Extracted page %d/%d (len=%d)", i + 1, n_pages, len(page_text)
+                    )
+                yield i + 1, page_text
+                # PyPDF2 caches every object it has parsed; dropping the
+                # cache keeps memory flat on long documents (shared objects
+                # such as fonts are simply parsed again)
+                cache = getattr(reader, "resolved_objects", None)
+                if isinstance(cache, dict):
+                    cache.clear()
 
     except Exception as e:
-        print(f"[PDF][ERROR] Could not open PDF {pdf_path}: {e}")
-        return ""
+        logger.error(f"[PDF] Could not open PDF {pdf_path}: {e}")
 
-    full_text = "\n".join(text_chunks)
-    print(f"[PDF] Total extracted text length: {len(full_text)}")
+
+def extract_text_from_pdf(pdf_path: str, verbose: bool = True) -> str:
+    """
+    Whole text of a PDF as one string (pages joined by newlines).
+    Ingestion streams pages with iter_pdf_pages() instead.
+    """
+    full_text = "\n".join(text for _, text in iter_pdf_pages(pdf_path, verbose))
+    logger.debug("[PDF] Total extracted text length: %d", len(full_text))
     return full_text
 
 
-def chunk_text(text: str, max_words: int = 200) -> List[str]:
+def _split_words(words: List[str], first_page: int, last_page: int,
+                 max_words: int) -> Iterator[Tuple[List[str], int, int]]:
+    for start in range(0, len(words), max_words):
+        yield words[start:start + max_words], first_page, last_page
+
+
+def iter_sentences(pages: Iterable[Tuple[int, str]],
+                   max_words: int = 200) -> Iterator[Tuple[List[str], int, int]]:
     """
-    Split text into chunks by word count with overlap.
+    Yield (words, first_page, last_page) per sentence of a page stream.
+
+    A sentence cut by a page break is joined with its continuation on the
+    next page. Sentences longer than max_words are split into
+    max_words-long pieces, so text without punctuation is still bounded.
     """
-    print(
-        f"[CHUNK] Chunking text into word-based chunks "
-        f"(max {max_words} words each, with overlap)"
-    )
+    pending: List[str] = []
+    pending_page = 0
+    page_no = 0
+    for page_no, text in pages:
+        pieces = _SENTENCE_SPLIT_RE.split(text.strip()) if text.strip() else []
+        for i, piece in enumerate(pieces):
+            words = piece.split()
+            if not words:
+                continue
+            if pending:
+                words, first_page, pending = pending + words, pending_page, []
+            else:
+                first_page = page_no
 
-    words = text.split()
-    chunks: List[str] = []
+            if i < len(pieces) - 1 or piece[-1] in _SENTENCE_END:
+                yield from _split_words(words, first_page, page_no, max_words)
+                continue
+            # unfinished at the end of the page: wait for the next page,
+            # emitting whole max_words pieces so pending stays bounded
+            full = len(words) - len(words) % max_words
+            if full:
+                yield from _split_words(words[:full], first_page, page_no, max_words)
+                first_page = page_no
+            pending, pending_page = words[full:], first_page
+    if pending:
+        yield pending, pending_page, page_no
 
-    if not words:
-        print("[CHUNK] No words found in text.")
-        return chunks
 
+def iter_chunks(pages: Iterable[Tuple[int, str]],
+                max_words: int = 200) -> Iterator[Dict]:
+    """
+    Sentence-aware chunking of a page stream.
+
+    Chunks hold whole sentences up to max_words words, and each chunk
+    repeats the trailing sentences of the previous one (up to 20% of
+    max_words) as overlap, across page boundaries too. Yields
+    {"text", "page_start", "page_end"}. Only the current chunk is kept
+    in memory.
+    """
     overlap_words = max(max_words // 5, 1)  # 20% overlap
-    step = max_words - overlap_words
-
-    print(
-        f"[CHUNK] Using overlap of {overlap_words} words. "
-        f"Step size: {step} words."
-    )
-
-    start = 0
-    while start < len(words):
-        end = start + max_words
-        chunk = " ".join(words[start:end]).strip()
-        if chunk:
-            chunks.append(chunk)
-        if end >= len(words):
-            break
-        start += step
-
-    print(f"[CHUNK] Created {len(chunks)} word-based chunks with overlap.")
+    buffer: List[Tuple[List[str], int, int]] = []
+    size = 0
+    fresh = 0  # sentences in buffer that are not overlap
+
+    def emit() -> Dict:
+        return {
+            "text": " ".join(word for words, _, _ in buffer for word in words),
+            "page_start": buffer[0][1],
+            "page_end": buffer[-1][2],
+        }
+
+    for sentence in iter_sentences(pages, max_words):
+        n = len(sentence[0])
+        if size + n > max_words and fresh:
+            yield emit()
+            keep: List[Tuple[List[str], int, int]] = []
+            kept = 0
+            for item in reversed(buffer):
+                if kept + len(item[0]) > overlap_words:
+                    break
+                keep.insert(0, item)
+                kept += len(item[0])
+            buffer, size, fresh = keep, kept, 0
+        # Overlap alone must never push a new sentence out
+        while buffer and size + n > max_words:
+            size -= len(buffer.pop(0)[0])
+        buffer.append(sentence)
+        size += n
+        fresh += 1
+    if fresh:
+        yield emit()
+
+
+def chunk_text(text: str, max_words: int = 200) -> List[str]:
+    """
+    Split text into sentence-aware chunks with overlap (see iter_chunks).
+    """
+    chunks = [chunk["text"] for chunk in iter_chunks([(1, text)], max_words)]
+    logger.debug("[CHUNK] Created %d chunk(s) of up to %d words.", len(chunks), max_words)
     return chunks
 
 
+def iter_pdf_docs(pdf_path: str, doc_hash: str, category: str,
+                  max_words: int = 200, verbose: bool = True) -> Iterator[Dict]:
+    """
+    Stream add_documents() records for one PDF, page by page. Ids are
+    derived from the document hash, position and text, so they are stable
+    across runs and never collide with chunks of other documents.
+    """
+    chunks = iter_chunks(iter_pdf_pages(pdf_path, verbose), max_words=max_words)
+    for idx, chunk in enumerate(chunks):
+        yield {
+            "id": make_chunk_id(doc_hash, idx, chunk["text"]),
+            "text": chunk["text"],
+            "metadata": {
+                "category": category,
+                "source": pdf_path,
+                "doc_hash": doc_hash,
+                "chunk_index": idx,
+                "page_start": chunk["page_start"],
+                "page_end": chunk["page_end"],
+            },
+        }
+
+
+class EmbeddingBatcher:
+    """
+    Cross-request micro-batching for the embedding model.
+
+    Callers from any thread submit lists of texts; a single worker thread
+    owns the model, gathers requests that arrive within max_wait_ms (or
+    until max_batch texts are pending) and encodes them in one call.
+    A request larger than max_batch is encoded on its own.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], List[List[float]]],
+        max_batch: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        self.encode_fn = encode_fn
+        self.max_batch = max(max_batch, 1)
+        self.max_wait = max(max_wait_ms, 0.0) / 1000.0
+
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._lock = threading.Lock()
+        # Distributions go to Prometheus (EMBED_BATCH_SIZE, EMBED_QUEUE_WAIT);
+        # the totals here only back the means in stats()
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+        self.queue_wait_s = 0.0
+
+        self._worker = threading.Thread(
+            target=self._run, name="embedding-batcher", daemon=True
+        )
+        self._worker.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        future: Future = Future()
+        self._queue.put((list(texts), future, time.perf_counter()))
+        return future
+
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        """
+        Blocking encode through the batcher.
+        """
+        return self.submit(texts).result()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "requests": self.requests,
+                "batches": self.batches,
+                "pending": self._queue.qsize(),
+                "mean_batch_size": self.texts / self.batches if self.batches else 0.0,
+                "mean_queue_wait_ms": (
+                    self.queue_wait_s * 1000.0 / self.requests if self.requests else 0.0
+                ),
+            }
+
+    def _collect(self) -> List[tuple]:
+        pending = [self._queue.get()]
+        size = len(pending[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = (
+                    self._queue.get(timeout=timeout)
+                    if timeout > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            started = time.perf_counter()
+            texts = [text for item in pending for text in item[0]]
+            with self._lock:
+                self.batches += 1
+                self.requests += len(pending)
+                self.texts += len(texts)
+                EMBED_BATCH_SIZE.observe(len(texts))
+                for _, _, queued_at in pending:
+                    self.queue_wait_s += started - queued_at
+                    EMBED_QUEUE_WAIT.observe(started - queued_at)
+
+            try:
+                vectors = self.encode_fn(texts)
+            except Exception as exc:
+                for _, future, _ in pending:
+                    future.set_exception(exc)
+                continue
+
+            offset = 0
+            for item_texts, future, _ in pending:
+                future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+
 class VectorStore:
     """
-    Vector store using in-memory Chroma DB.
+    Vector store over a pluggable retrieval backend (see rag.backends).
+
+    backend="chroma" (default) uses Chroma DB, in-memory unless
+    persist_dir is given; backend="numpy" uses a memory-mapped flat
+    matrix under persist_dir. With a persistent index, unchanged
+    documents are not re-embedded on restart. embed_engine picks the
+    runtime of the embedding model (rag.embedders.EMBEDDING_ENGINES).
+    With dedup_threshold set, ingestion folds near-duplicate chunks into
+    one stored representative (see deduplicate()).
+
+    Several processes may share one persistent numpy index: ingestion
+    runs under the backend's cross-process writer lock, and searches
+    pick up the other processes' writes at most refresh_seconds late
+    (see sync()).
     """
 
-    def __init__(self):
-        print("[VECTOR] Setting up in-memory Chroma DB...")
-        self.client = chromadb.Client(
-            Settings(
-                anonymized_telemetry=False,
-                allow_reset=True
-            )
+    def __init__(
+        self,
+        persist_dir: Optional[str] = None,
+        collection_name: str = "bfsi_docs",
+        embedding_cache: Optional[EmbeddingCache] = None,
+        executor_workers: int = 4,
+        backend: str = "chroma",
+        vector_dtype: str = "float32",
+        embed_batch_max: int = 32,
+        embed_batch_wait_ms: float = 5.0,
+        embed_engine: str = "torch",
+        onnx_file: Optional[str] = None,
+        dedup_threshold: Optional[float] = None,
+        refresh_seconds: float = 1.0,
+    ):
+        self.embedding_cache = embedding_cache
+        # Runtime the model runs in (see rag.embedders.EMBEDDING_ENGINES)
+        self.embed_engine = embed_engine
+        self.onnx_file = onnx_file
+        # Every model call goes through one batching worker, so concurrent
+        # queries share encode calls instead of contending for the model
+        self.batcher = EmbeddingBatcher(
+            self._encode_batch,
+            max_batch=embed_batch_max,
+            max_wait_ms=embed_batch_wait_ms,
+        )
+        # Bounded pool for the async API so CPU-bound encode and index
+        # calls never run on the event loop
+        self.executor = ThreadPoolExecutor(
+            max_workers=executor_workers,
+            thread_name_prefix="vector",
+        )
+        # Bumped on every write so caches can tell when the index changed
+        self.index_version = 0
+        self.refresh_seconds = refresh_seconds
+        self._last_sync = time.monotonic()
+        self._sync_lock = threading.Lock()
+
+        self.backend: VectorBackend = create_backend(
+            backend, persist_dir, collection_name, dtype=vector_dtype
+        )
+        logger.info(
+            f"[VECTOR] Collection '{collection_name}' ready on {backend} backend "
+            f"({self.backend.count()} chunk(s) indexed)."
+        )
+
+        # Near-duplicate folding at ingest. The LSH index is only built
+        # (from the stored chunks) on the first ingest that needs it; the
+        # back-reference registry is always kept, because has_document()
+        # and remove_source() depend on it
+        self.dedup = (
+            NearDuplicateIndex(dedup_threshold) if dedup_threshold else None
+        )
+        self._dedup_built = False
+        self._dedup_lock = threading.RLock()
+        # representative id -> back-references not yet written to it
+        self._pending_refs: Dict[str, List[Dict]] = {}
+        self._dedup_seen = 0
+        self._dedup_dropped = 0
+        self.back_refs = BackReferences()
+
+        # BM25 index for lexical / hybrid retrieval, rebuilt from a
+        # persisted backend and then maintained on every write
+        self.lexical = BM25Index()
+        self._rebuild_lexical()
+
+    def _rebuild_lexical(self):
+        def documents():
+            for chunk_id, text, meta in self.backend.iter_documents():
+                if meta.get(STAGED_KEY):
+                    continue
+                if meta.get(DUPLICATES_KEY):
+                    self.back_refs.set(chunk_id, read_refs(meta))
+                yield chunk_id, text
+
+        self.lexical.rebuild(documents())
+        logger.info(f"[VECTOR] Lexical index ready ({len(self.lexical)} chunk(s)).")
+
+    def writer(self):
+        """
+        Context manager held around a whole ingest, so writers in other
+        processes (workers sharing the index) wait for it instead of
+        embedding the same documents.
+        """
+        return self.backend.writer()
+
+    def sync(self, force: bool = False):
+        """
+        Apply index writes made by other processes to the lexical,
+        near-duplicate and back-reference indexes. Checks at most every
+        refresh_seconds unless forced; a check that finds nothing new
+        costs one stat() of the manifest.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_sync < self.refresh_seconds:
+            return
+        with self._sync_lock:
+            self._last_sync = now
+            changes = self.backend.refresh()
+            if not changes:
+                return
+            with self._dedup_lock:
+                if changes.reloaded:
+                    self.back_refs = BackReferences()
+                    if self.dedup is not None:
+                        self.dedup = NearDuplicateIndex(self.dedup.threshold)
+                        self._dedup_built = False
+                    self._rebuild_lexical()
+                else:
+                    self._apply_changes(changes)
+            self.index_version += 1
+        logger.info(
+            f"[VECTOR] Synced with other writers: +{len(changes.added)} "
+            f"~{len(changes.updated)} -{len(changes.removed)} chunk(s)"
+            + (" (reloaded)" if changes.reloaded else "")
         )
 
-        self.collection = self.client.create_collection(name="bfsi_docs")
-        print("[VECTOR] Collection 'bfsi_docs' ready.")
+    def _apply_changes(self, changes):
+        # Staged chunks stay out of the lexical index and the back-reference
+        # registry until the other process publishes them
+        visible = [(chunk_id, text) for chunk_id, text, meta in changes.added
+                   if not meta.get(STAGED_KEY)]
+        if visible:
+            self.lexical.add([chunk_id for chunk_id, _ in visible],
+                             [text for _, text in visible])
+        for chunk_id, text, meta in changes.added:
+            if meta.get(DUPLICATES_KEY) and not meta.get(STAGED_KEY):
+                self.back_refs.set(chunk_id, read_refs(meta))
+            if self._dedup_built:
+                self.dedup.add(chunk_id, self.dedup.fingerprint(text),
+                               meta.get("source"), meta.get("doc_hash"))
+        published = []
+        for chunk_id, meta in changes.updated:
+            if self._dedup_built:
+                self.dedup.set_owner(chunk_id, meta.get("source"), meta.get("doc_hash"))
+            if meta.get(STAGED_KEY):
+                continue
+            self.back_refs.set(chunk_id, read_refs(meta))
+            if chunk_id not in self.lexical:
+                published.append(chunk_id)
+        if published:
+            chunks = self.backend.get(published)
+            self.lexical.add([chunk["id"] for chunk in chunks],
+                             [chunk["text"] for chunk in chunks])
+        if changes.removed:
+            self.back_refs.discard(changes.removed)
+            if self._dedup_built:
+                self.dedup.remove(changes.removed)
+            self.lexical.remove(changes.removed)
+            if self.lexical.needs_rebuild:
+                self._rebuild_lexical()
 
     def embed(self, texts: List[str]) -> List[List[float]]:
         """
-        Create embeddings for a list of texts using SentenceTransformer.
+        Create embeddings for a list of texts with the configured engine.
+
+        Goes through the embedding cache (when configured) so that only
+        texts that were never seen before reach the model.
         """
         if not texts:
             raise ValueError("[VECTOR] embed() received empty text list")
 
-        print(f"[VECTOR] Embedding {len(texts)} text(s)...")
+        if self.embedding_cache is None:
+            return self._encode(texts)
+
+        vectors = self.embedding_cache.get_many(texts)
+        pending: Dict[str, List[int]] = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                pending.setdefault(texts[i], []).append(i)
+
+        if pending:
+            fresh_texts = list(pending)
+            fresh = self._encode(fresh_texts)
+            self.embedding_cache.put_many(fresh_texts, fresh)
+            for text, vector in zip(fresh_texts, fresh):
+                for i in pending[text]:
+                    vectors[i] = vector
+        else:
+            logger.debug("[VECTOR] All %d embedding(s) served from cache.", len(texts))
+
+        return vectors
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        """
+        Encode texts through the cross-request batcher.
+        """
+        return self.batcher.encode(texts)
+
+    def _encode_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        Run the embedding model on a list of texts
+        (only called from the batcher's worker thread).
+        """
+        logger.debug("[VECTOR] Embedding %d text(s)...", len(texts))
 
-        model = _get_embedding_model()
+        model = _get_embedding_model(self.embed_engine, self.onnx_file)
         vectors = model.encode(
             texts,
             show_progress_bar=False,
@@ -134,81 +579,560 @@ class VectorStore:
                 f"({len(vectors)} != {len(texts)})"
             )
 
-        print("[VECTOR] Embeddings created successfully.")
+        logger.debug("[VECTOR] Embeddings created successfully.")
         return vectors.tolist()
 
-    def add_documents(self, docs: List[Dict]):
+    def warmup(self):
+        """
+        Pay the first-call costs before serving: load the model, run one
+        encode (bypassing the embedding cache) and one search per mode.
+        """
+        started = time.perf_counter()
+        self._encode(["warmup query about loan interest rates"])
+        for mode in RETRIEVAL_MODES:
+            self.search("warmup query about loan interest rates", k=1, mode=mode)
+        logger.info(f"[VECTOR] Warmup done in {(time.perf_counter() - started) * 1000:.0f} ms.")
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Async embed(), executed on the bounded vector executor.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.embed, texts)
+
+    def add_documents(self, docs: List[Dict],
+                      embeddings: Optional[List[List[float]]] = None,
+                      staged: bool = False):
         """
         docs format:
         { "id": str, "text": str, "metadata": dict }
+
+        Pass embeddings (aligned with docs) to store vectors that were
+        already computed, e.g. by the bulk ingestion pipeline. With
+        staged, the chunks are stored but stay out of search until their
+        document is published (see publish()).
         """
         if not docs:
-            print("[VECTOR] No documents to add.")
+            logger.debug("[VECTOR] No documents to add.")
             return
 
+        # Chunks already in a persistent index are reused, not re-embedded
+        existing = self.backend.existing_ids([d["id"] for d in docs])
+        if existing:
+            logger.debug("[VECTOR] Skipping %d already indexed doc(s).", len(existing))
+            keep = [i for i, d in enumerate(docs) if d["id"] not in existing]
+            docs = [docs[i] for i in keep]
+            if embeddings is not None:
+                embeddings = [embeddings[i] for i in keep]
+            if not docs:
+                return
+
         ids = [d["id"] for d in docs]
         texts = [d["text"] for d in docs]
         metadatas = [d.get("metadata", {}) for d in docs]
+        if staged:
+            metadatas = [dict(meta, **{STAGED_KEY: True}) for meta in metadatas]
+
+        if embeddings is None:
+            embeddings = self.embed(texts)
+
+        logger.debug("[VECTOR] Adding %d docs to the vector DB...", len(docs))
+        self.backend.add(ids, texts, metadatas, embeddings)
+        # Staged chunks are searchable, and registered as holding
+        # back-references, once publish() makes them visible
+        if not staged:
+            self.lexical.add(ids, texts)
+            for chunk_id, meta in zip(ids, metadatas):
+                if meta.get(DUPLICATES_KEY):
+                    self.back_refs.set(chunk_id, read_refs(meta))
+            self.index_version += 1
+        if self._dedup_built:
+            # Chunks stored without going through deduplicate()
+            with self._dedup_lock:
+                for doc in docs:
+                    if doc["id"] not in self.dedup:
+                        meta = doc.get("metadata", {})
+                        self.dedup.add(doc["id"], self.dedup.fingerprint(doc["text"]),
+                                       meta.get("source"), meta.get("doc_hash"))
+        if self._pending_refs and not staged:
+            self.apply_duplicate_refs()
+        logger.debug("[VECTOR] Documents added successfully.")
+
+    def _dedup_index(self) -> NearDuplicateIndex:
+        """
+        The LSH index, built from the stored chunks on first use
+        (call with _dedup_lock held).
+        """
+        if not self._dedup_built:
+            started = time.perf_counter()
+            for chunk_id, text, meta in self.backend.iter_documents():
+                self.dedup.add(chunk_id, self.dedup.fingerprint(text),
+                               meta.get("source"), meta.get("doc_hash"))
+            self._dedup_built = True
+            logger.info(
+                f"[DEDUP] Index of {len(self.dedup)} chunk(s) built in "
+                f"{(time.perf_counter() - started) * 1000:.0f} ms "
+                f"({self.dedup.bands} bands x {self.dedup.rows} rows)."
+            )
+        return self.dedup
 
-        embeddings = self.embed(texts)
+    def deduplicate(self, docs: List[Dict]) -> List[Dict]:
+        """
+        Fold chunks of docs that near-duplicate a stored chunk, or an
+        earlier chunk of docs, into that representative (rag.dedup:
+        MinHash over word 5-grams, LSH, same figures required). Call it
+        before embedding, so folded chunks are never embedded.
+
+        A folded chunk's metadata becomes a back-reference in the
+        representative's DUPLICATES_KEY list: set directly when the
+        representative is part of docs, otherwise queued and written by
+        the next add_documents(), apply_duplicate_refs() or, for staged
+        documents, publish(). Returns the chunks to store.
+        """
+        if self.dedup is None or not docs:
+            return docs
 
-        print(f"[VECTOR] Adding {len(docs)} docs to the vector DB...")
-        self.collection.add(
-            ids=ids,
-            documents=texts,
-            metadatas=metadatas,
-            embeddings=embeddings,
+        with self._dedup_lock:
+            index = self._dedup_index()
+            unique: List[Dict] = []
+            kept: Dict[str, Dict] = {}
+            for doc in docs:
+                meta = doc.get("metadata", {})
+                owner = index.owner(doc["id"])
+                if owner == (meta.get("source"), meta.get("doc_hash")):
+                    # Already stored (e.g. an interrupted run); add_documents skips it
+                    unique.append(doc)
+                    continue
+                if owner is not None:
+                    # Same content stored for another path: chunk ids are
+                    # derived from the content hash, so they collide
+                    found = (doc["id"], 1.0)
+                else:
+                    fingerprint = index.fingerprint(doc["text"])
+                    found = index.match(fingerprint, meta.get("source"), meta.get("doc_hash"))
+                if found is None:
+                    doc = dict(doc, metadata=dict(meta))
+                    index.add(doc["id"], fingerprint, meta.get("source"), meta.get("doc_hash"))
+                    kept[doc["id"]] = doc
+                    unique.append(doc)
+                    continue
+
+                rep_id, similarity = found
+                ref = make_ref(meta, similarity)
+                if rep_id in kept:
+                    rep_meta = kept[rep_id]["metadata"]
+                    kept[rep_id]["metadata"] = with_refs(rep_meta, read_refs(rep_meta) + [ref])
+                else:
+                    self._pending_refs.setdefault(rep_id, []).append(ref)
+
+            self._dedup_seen += len(docs)
+            self._dedup_dropped += len(docs) - len(unique)
+        if len(unique) < len(docs):
+            logger.debug("[DEDUP] Folded %d of %d chunk(s).", len(docs) - len(unique), len(docs))
+        return unique
+
+    def apply_duplicate_refs(self):
+        """
+        Write queued back-references onto their representatives once
+        those are stored.
+        """
+        with self._dedup_lock:
+            if not self._pending_refs:
+                return
+            stored = self.backend.existing_ids(list(self._pending_refs))
+            if not stored:
+                return
+            ids, metadatas = [], []
+            for chunk in self.backend.get(sorted(stored)):
+                refs = self._pending_refs.pop(chunk["id"])
+                ids.append(chunk["id"])
+                metadatas.append(
+                    with_refs(chunk["metadata"], read_refs(chunk["metadata"]) + refs)
+                )
+            self.backend.update_metadata(ids, metadatas)
+            for chunk_id, meta in zip(ids, metadatas):
+                if not meta.get(STAGED_KEY):
+                    self.back_refs.set(chunk_id, read_refs(meta))
+            self.index_version += 1
+
+    def dedup_stats(self) -> Dict:
+        with self._dedup_lock:
+            return {
+                "enabled": self.dedup is not None,
+                "threshold": self.dedup.threshold if self.dedup is not None else None,
+                "representatives": len(self.dedup) if self._dedup_built else None,
+                "chunks_with_duplicates": len(self.back_refs),
+                "chunks_seen": self._dedup_seen,
+                "duplicates_folded": self._dedup_dropped,
+                "dedup_ratio": (
+                    round(self._dedup_dropped / self._dedup_seen, 4)
+                    if self._dedup_seen else 0.0
+                ),
+            }
+
+    def search(self, query: str, k: int = 3, mode: str = "dense",
+               timings: Optional[Dict] = None) -> List[Dict]:
+        """
+        Retrieval returning hits with id, text, metadata and score.
+
+        mode:
+        - "dense": embedding similarity
+        - "lexical": BM25 over the inverted index
+        - "hybrid": both, fused by reciprocal rank (score is the RRF score)
+
+        When a timings dict is given, embed_ms and vector_query_ms are
+        added to it.
+        """
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"[VECTOR] Unknown retrieval mode: {mode!r}")
+        self.sync()
+        logger.debug("[VECTOR] %s search for query: %r", mode.capitalize(), query)
+
+        started = time.perf_counter()
+        embed_ms = 0.0
+        if mode != "lexical":
+            vector = self.embed([query])[0]
+            embed_ms = (time.perf_counter() - started) * 1000
+
+        if mode == "dense":
+            hits = self.backend.query(vector, k)
+        elif mode == "lexical":
+            hits = self._hits_for(self.lexical.search(query, k))
+        else:
+            # Look deeper than k on each side so fusion has room to work
+            depth = max(4 * k, 20)
+            dense = self.backend.query(vector, depth)
+            lexical = self.lexical.search(query, depth)
+            fused = reciprocal_rank_fusion(
+                [[hit["id"] for hit in dense], [doc_id for doc_id, _ in lexical]]
+            )[:k]
+            known = {hit["id"]: hit for hit in dense}
+            missing = [doc_id for doc_id, _ in fused if doc_id not in known]
+            for hit in self.backend.get(missing):
+                known[hit["id"]] = hit
+            hits = [
+                dict(known[doc_id], score=score)
+                for doc_id, score in fused
+                if doc_id in known
+            ]
+
+        if timings is not None:
+            timings["embed_ms"] = embed_ms
+            timings["vector_query_ms"] = (
+                (time.perf_counter() - started) * 1000 - embed_ms
+            )
+        logger.debug("[VECTOR] Found %d docs.", len(hits))
+        return hits
+
+    async def asearch(self, query: str, k: int = 3, mode: str = "dense",
+                      timings: Optional[Dict] = None) -> List[Dict]:
+        """
+        Async search(), executed on the bounded vector executor.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, self.search, query, k, mode, timings
         )
-        print("[VECTOR] Documents added successfully.")
 
-    def similarity_search(self, query: str, k: int = 3) -> List[str]:
+    def _hits_for(self, scored_ids: List) -> List[Dict]:
+        scores = dict(scored_ids)
+        return [
+            dict(hit, score=scores[hit["id"]])
+            for hit in self.backend.get([doc_id for doc_id, _ in scored_ids])
+        ]
+
+    def similarity_search(self, query: str, k: int = 3, mode: str = "dense") -> List[str]:
         """
         Perform similarity search against the vector DB.
         """
-        print(f"[VECTOR] Similarity search for query: {query!r}")
+        return [hit["text"] for hit in self.search(query, k, mode)]
 
-        query_embedding = self.embed([query])[0]
+    async def asimilarity_search(self, query: str, k: int = 3,
+                                 mode: str = "dense") -> List[str]:
+        """
+        Async similarity_search(), executed on the bounded vector executor.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, self.similarity_search, query, k, mode
+        )
 
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=k,
+    def has_document(self, doc_hash: str, source: Optional[str] = None) -> bool:
+        """
+        True if a document with this content hash is already indexed
+        (from the given source path, when one is given), as stored chunks
+        or as back-references only. Staged chunks do not count.
+        """
+        where = {"doc_hash": doc_hash}
+        if source is not None:
+            where["source"] = source
+        return (
+            any(not meta.get(STAGED_KEY) for _, meta in self.backend.find(where))
+            or self.back_refs.has_document(doc_hash, source)
         )
 
-        docs = results.get("documents", [[]])[0]
-        print(f"[VECTOR] Found {len(docs)} docs.")
-        return docs
+    def add_copy(self, source: str, doc_hash: str) -> int:
+        """
+        Record source as one more path of a document already indexed from
+        another path (byte-identical content), without extracting or
+        embedding it again: every chunk of the indexed copy gets a
+        back-reference to source, so the content stays indexed, handed
+        over to source, when the other path is removed or replaced.
 
-    def add_pdf(self, pdf_path: str, category: str = "pdf_bfsi"):
+        Returns the number of chunks that now reference source.
         """
-        Ingest a single PDF:
-        - extract text
-        - chunk
-        - embed
-        - store in Chroma
-        """
-        print(f"[PDF] Adding PDF to vector DB: {pdf_path}")
-
-        full_text = extract_text_from_pdf(pdf_path)
-        if not full_text.strip():
-            print("[PDF] No extractable text, skipping.")
-            return None
-
-        chunks = chunk_text(full_text, max_words=200)
-
-        docs: List[Dict] = []
-        for idx, chunk in enumerate(chunks):
-            docs.append(
-                {
-                    "id": f"chunk_{idx}",
-                    "text": chunk,
-                    "metadata": {
-                        "category": category,
-                        "source": pdf_path,
-                        "chunk_index": idx,
-                    },
-                }
+        with self.writer():
+            self.sync(force=True)
+            with self._dedup_lock:
+                stored = [
+                    (chunk_id, meta) for chunk_id, meta in self.backend.find({"doc_hash": doc_hash})
+                    if not meta.get(STAGED_KEY)
+                ]
+                holders = self.backend.get(sorted(self.back_refs.holders_of_document(doc_hash)))
+                sources = [meta.get("source") for _, meta in stored] + [
+                    ref.get("source")
+                    for chunk in holders
+                    for ref in read_refs(chunk["metadata"])
+                    if ref.get("doc_hash") == doc_hash
+                ]
+                original = next((other for other in sources if other != source), None)
+                if original is None:
+                    return 0
+
+                updates: Dict[str, Dict] = {}
+                for chunk_id, meta in stored:
+                    if meta.get("source") == original:
+                        refs = read_refs(meta) + [make_ref(dict(meta, source=source), 1.0)]
+                        updates[chunk_id] = with_refs(meta, refs)
+                for chunk in holders:
+                    meta = updates.get(chunk["id"], chunk["metadata"])
+                    refs = read_refs(meta)
+                    copies = [
+                        dict(ref, source=source) for ref in refs
+                        if ref.get("source") == original and ref.get("doc_hash") == doc_hash
+                    ]
+                    if copies:
+                        updates[chunk["id"]] = with_refs(meta, refs + copies)
+                if not updates:
+                    return 0
+
+                self.backend.update_metadata(list(updates), list(updates.values()))
+                for chunk_id, meta in updates.items():
+                    self.back_refs.set(chunk_id, read_refs(meta))
+                self.index_version += 1
+        logger.info(
+            f"[VECTOR] {source} is a copy of {original}; referenced from "
+            f"{len(updates)} chunk(s)"
+        )
+        return len(updates)
+
+    def remove_source(self, source: str, keep_hash: Optional[str] = None) -> int:
+        """
+        Delete every chunk that was ingested from the given source path,
+        except chunks of the document version identified by keep_hash.
+
+        Back-references to the removed version are dropped as well. A
+        removed chunk that still represents chunks of other documents is
+        kept and handed over to the first of them instead.
+        """
+        with self.writer():
+            self.sync(force=True)
+            with self._dedup_lock:
+                updates: Dict[str, Dict] = {}
+                ids = self._plan_removal(source, keep_hash, updates)
+                self._write(updates, ids)
+        return len(ids)
+
+    def _plan_removal(self, source: str, keep_hash: Optional[str],
+                      updates: Dict[str, Dict]) -> List[str]:
+        """
+        Ids to delete for remove_source(); metadata changes go into
+        updates, whose entries are taken as the current metadata of their
+        chunks (call with _dedup_lock held).
+        """
+        def removed(meta: Dict) -> bool:
+            return meta.get("source") == source and (
+                keep_hash is None or meta.get("doc_hash") != keep_hash
             )
 
-        print(f"[PDF] Inserting {len(docs)} chunk(s) into vector DB...")
-        self.add_documents(docs)
-        print(f"[PDF] Done adding PDF: {pdf_path}")
+        ids, seen = [], set()
+        for chunk_id, meta in self.backend.find({"source": source}):
+            meta = updates.get(chunk_id, meta)
+            seen.add(chunk_id)
+            if not removed(meta):
+                continue
+            refs = [ref for ref in read_refs(meta) if not removed(ref)]
+            if refs:
+                updates[chunk_id] = promote(refs)
+            else:
+                updates.pop(chunk_id, None)
+                ids.append(chunk_id)
+        holders = self.back_refs.holders_of_source(source) - seen
+        for chunk in self.backend.get(sorted(holders)):
+            meta = updates.get(chunk["id"], chunk["metadata"])
+            refs = read_refs(meta)
+            kept = [ref for ref in refs if not removed(ref)]
+            if len(kept) != len(refs):
+                updates[chunk["id"]] = with_refs(meta, kept)
+        return ids
+
+    def _write(self, updates: Dict[str, Dict], ids: List[str]):
+        """
+        Store metadata updates and delete ids in one backend write, then
+        bring the in-memory indexes up to date (call with _dedup_lock held).
+        """
+        if not updates and not ids:
+            return
+        if updates:
+            logger.debug("[VECTOR] Updating metadata of %d chunk(s)", len(updates))
+        if ids:
+            logger.info(f"[VECTOR] Removing {len(ids)} stale chunk(s)")
+        self.backend.update_and_delete(list(updates), list(updates.values()), ids)
+        for chunk_id, meta in updates.items():
+            self.back_refs.set(chunk_id, read_refs(meta))
+            if self.dedup is not None:
+                self.dedup.set_owner(chunk_id, meta.get("source"), meta.get("doc_hash"))
+        if ids:
+            self.back_refs.discard(ids)
+            if self.dedup is not None:
+                self.dedup.remove(ids)
+            self.lexical.remove(ids)
+            if self.lexical.needs_rebuild:
+                self._rebuild_lexical()
+        self.index_version += 1
+
+    def publish(self, source: str, doc_hash: str) -> int:
+        """
+        Make the staged chunks of one document version searchable (see
+        add_documents(staged=True)) and drop older versions of source, in
+        one backend write: searches see either the old version or the
+        whole new one. Back-references queued for this version by
+        deduplicate() are written with it.
+
+        Returns the number of chunks published.
+        """
+        with self.writer():
+            with self._dedup_lock:
+                updates: Dict[str, Dict] = {}
+                for chunk_id, meta in self.backend.find({"source": source, "doc_hash": doc_hash}):
+                    if meta.get(STAGED_KEY):
+                        updates[chunk_id] = {
+                            key: value for key, value in meta.items() if key != STAGED_KEY
+                        }
+                staged = list(updates)
+
+                queued = {}
+                for rep_id, refs in list(self._pending_refs.items()):
+                    mine = [ref for ref in refs
+                            if (ref.get("source"), ref.get("doc_hash")) == (source, doc_hash)]
+                    if mine:
+                        queued[rep_id] = mine
+                for chunk in self.backend.get(sorted(queued)):
+                    refs = queued[chunk["id"]]
+                    rest = [ref for ref in self._pending_refs[chunk["id"]] if ref not in refs]
+                    if rest:
+                        self._pending_refs[chunk["id"]] = rest
+                    else:
+                        del self._pending_refs[chunk["id"]]
+                    meta = updates.get(chunk["id"], chunk["metadata"])
+                    updates[chunk["id"]] = with_refs(meta, read_refs(meta) + refs)
+
+                ids = self._plan_removal(source, doc_hash, updates)
+                self._write(updates, ids)
+                if staged:
+                    chunks = self.backend.get(staged)
+                    self.lexical.add([chunk["id"] for chunk in chunks],
+                                     [chunk["text"] for chunk in chunks])
+        return len(staged)
+
+    def discard_staged(self, source: str, doc_hash: str):
+        """
+        Drop what an ingest of this document version staged without
+        publishing it, e.g. after a failure.
+        """
+        with self.writer():
+            with self._dedup_lock:
+                for rep_id, refs in list(self._pending_refs.items()):
+                    rest = [ref for ref in refs
+                            if (ref.get("source"), ref.get("doc_hash")) != (source, doc_hash)]
+                    if rest:
+                        self._pending_refs[rep_id] = rest
+                    else:
+                        del self._pending_refs[rep_id]
+                ids = [
+                    chunk_id
+                    for chunk_id, meta in self.backend.find({"source": source, "doc_hash": doc_hash})
+                    if meta.get(STAGED_KEY)
+                ]
+                if ids:
+                    logger.info(f"[VECTOR] Discarding {len(ids)} staged chunk(s) of {source}")
+                    self.backend.delete(ids)
+                    if self.dedup is not None:
+                        self.dedup.remove(ids)
+
+    def add_pdf(self, pdf_path: str, category: str = "pdf_bfsi",
+                batch_size: int = 64) -> int:
+        """
+        Ingest a single PDF:
+        - hash the file and skip it if this exact content is indexed from
+          this path; content indexed from another path is only recorded
+          as a copy (add_copy)
+        - stream pages into the chunker
+        - fold near-duplicate chunks (when dedup is enabled), then embed
+          and store the rest batch_size at a time, staged
+        - publish the new version and drop older versions of the file in
+          one write (publish())
+
+        Memory stays bounded by one page and one batch, whatever the
+        length of the document. Until the publish, searches only see the
+        old version; after it, only the whole new one. A failed ingest
+        discards what it staged.
+
+        Returns the number of chunks stored.
+        """
+        logger.info(f"[PDF] Adding PDF to vector DB: {pdf_path}")
+
+        # One writer at a time across the processes sharing the index
+        with self.writer():
+            self.sync(force=True)
+            return self._add_pdf(pdf_path, category, batch_size)
+
+    def _add_pdf(self, pdf_path: str, category: str, batch_size: int) -> int:
+        doc_hash = file_sha256(pdf_path)
+        if self.has_document(doc_hash, source=pdf_path):
+            logger.info(f"[PDF] Unchanged, already indexed (hash={doc_hash[:12]}).")
+            return 0
+        if self.has_document(doc_hash):
+            # Same content already indexed under another path
+            self.add_copy(pdf_path, doc_hash)
+            self.remove_source(pdf_path, keep_hash=doc_hash)
+            return 0
+
+        docs = iter_pdf_docs(pdf_path, doc_hash, category)
+        seen = 0
+        added = 0
+        try:
+            while True:
+                batch = list(itertools.islice(docs, batch_size))
+                if not batch:
+                    break
+                seen += len(batch)
+                batch = self.deduplicate(batch)
+                if batch:
+                    self.add_documents(batch, self.embed([d["text"] for d in batch]),
+                                       staged=True)
+                    added += len(batch)
+                logger.debug("[PDF] Staged %d of %d chunk(s) so far...", added, seen)
+        except BaseException:
+            self.discard_staged(pdf_path, doc_hash)
+            raise
+
+        if not seen:
+            logger.info("[PDF] No extractable text, skipping.")
+            return 0
+        self.publish(pdf_path, doc_hash)
+        logger.info(
+            f"[PDF] Done adding PDF: {pdf_path} ({added} chunk(s) stored, "
+            f"{seen - added} near-duplicate(s) folded)"
+        )
+        return added
@@ -0,0 +1,357 @@
+# session_store.py
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rough per-turn bookkeeping cost (dict, deque slot, strings) on top of
+# the message text, used for the in-memory byte budget
+_TURN_OVERHEAD_BYTES = 200
+
+
+def _turn_bytes(turn: Dict) -> int:
+    return _TURN_OVERHEAD_BYTES + len(turn.get("content") or "")
+
+
+class SessionStore:
+    """
+    Chat history storage, one ordered list of turns per session.
+
+    Turns are dicts with "role", "content" and "agent"; append() assigns
+    each turn a per-session, increasing "seq". Only the most recent
+    max_turns turns of a session are kept, and sessions not used for
+    idle_ttl_seconds are dropped.
+    """
+
+    def __init__(self, max_turns: int = 50, idle_ttl_seconds: float = 86400.0):
+        self.max_turns = max_turns
+        self.idle_ttl_seconds = idle_ttl_seconds
+
+    def load(self, session_id: str, limit: Optional[int] = None) -> List[Dict]:
+        """
+        The last `limit` turns of a session (all kept turns when None),
+        oldest first. Unknown sessions have an empty history.
+        """
+        raise NotImplementedError
+
+    def append(self, session_id: str, turn: Dict) -> Dict:
+        """
+        Store a turn and return it with its "seq" set.
+        """
+        raise NotImplementedError
+
+    def get_summary(self, session_id: str) -> Optional[Dict]:
+        """
+        Rolling summary of the older turns of a session:
+        {"summary": str, "upto_seq": int} (covers turns with seq <= upto_seq),
+        or None when nothing has been summarized yet.
+        """
+        raise NotImplementedError
+
+    def set_summary(self, session_id: str, summary: str, upto_seq: int):
+        """
+        Replace the rolling summary; ignored for unknown sessions.
+        """
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        raise NotImplementedError
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Process-local store: sessions are kept in LRU order and evicted when
+    idle for too long, or when the store exceeds max_sessions or
+    max_bytes (approximate size of the stored turns).
+    """
+
+    def __init__(
+        self,
+        max_turns: int = 50,
+        idle_ttl_seconds: float = 86400.0,
+        max_sessions: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+    ):
+        super().__init__(max_turns, idle_ttl_seconds)
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+
+        self._sessions: "OrderedDict[str, Dict]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evicted = 0
+        self.expired = 0
+
+    def load(self, session_id: str, limit: Optional[int] = None) -> List[Dict]:
+        with self._lock:
+            self._expire(time.monotonic())
+            session = self._sessions.get(session_id)
+            if session is None:
+                return []
+            turns = list(session["turns"])
+        if limit is not None:
+            turns = turns[-limit:] if limit > 0 else []
+        return [dict(turn) for turn in turns]
+
+    def append(self, session_id: str, turn: Dict) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = {
+                    "turns": deque(),
+                    "next_seq": 0,
+                    "last_seen": now,
+                    "bytes": 0,
+                    "summary": None,
+                }
+                self._sessions[session_id] = session
+
+            stored = dict(turn, seq=session["next_seq"])
+            session["next_seq"] += 1
+            session["turns"].append(stored)
+            self._account(session, _turn_bytes(stored))
+            while len(session["turns"]) > self.max_turns:
+                self._account(session, -_turn_bytes(session["turns"].popleft()))
+
+            session["last_seen"] = now
+            self._sessions.move_to_end(session_id)
+            self._evict(keep=session_id)
+        return dict(stored)
+
+    def get_summary(self, session_id: str) -> Optional[Dict]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session["summary"] is None:
+                return None
+            return dict(session["summary"])
+
+    def set_summary(self, session_id: str, summary: str, upto_seq: int):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            old = session["summary"]
+            if old is not None:
+                self._account(session, -len(old["summary"]))
+            session["summary"] = {"summary": summary, "upto_seq": upto_seq}
+            self._account(session, len(summary))
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._drop(session_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_turns": self.max_turns,
+                "evicted": self.evicted,
+                "expired": self.expired,
+            }
+
+    def _account(self, session: Dict, delta: int):
+        session["bytes"] += delta
+        self._bytes += delta
+
+    def _drop(self, session_id: str):
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._bytes -= session["bytes"]
+
+    def _expire(self, now: float):
+        # LRU order is also last-use order, so idle sessions sit at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session["last_seen"] <= self.idle_ttl_seconds:
+                break
+            self._drop(session_id)
+            self.expired += 1
+
+    def _evict(self, keep: str):
+        while (
+            len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes
+        ) and len(self._sessions) > 1:
+            session_id = next(iter(self._sessions))
+            if session_id == keep:
+                break
+            self._drop(session_id)
+            self.evicted += 1
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Durable store in a SQLite file: sessions survive restarts and can be
+    shared by several worker processes on one host.
+    """
+
+    # Idle sessions are purged at most this often (seconds)
+    PURGE_INTERVAL = 60.0
+
+    def __init__(
+        self,
+        path: str,
+        max_turns: int = 50,
+        idle_ttl_seconds: float = 86400.0,
+    ):
+        super().__init__(max_turns, idle_ttl_seconds)
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, last_seen REAL NOT NULL, "
+            "next_seq INTEGER NOT NULL, summary TEXT, summary_upto INTEGER)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(sessions)")}
+        if "summary" not in columns:
+            # databases created before rolling summaries existed
+            self._db.execute("ALTER TABLE sessions ADD COLUMN summary TEXT")
+            self._db.execute("ALTER TABLE sessions ADD COLUMN summary_upto INTEGER")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS turns ("
+            "session_id TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, "
+            "content TEXT NOT NULL, agent TEXT, PRIMARY KEY (session_id, seq))"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)"
+        )
+        self._db.commit()
+        self._last_purge = 0.0
+        self.expired = 0
+        logger.info(f"[SESSIONS] SQLite session store at {path}")
+
+    def load(self, session_id: str, limit: Optional[int] = None) -> List[Dict]:
+        limit = self.max_turns if limit is None else min(limit, self.max_turns)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, role, content, agent FROM turns WHERE session_id = ? "
+                "ORDER BY seq DESC LIMIT ?",
+                (session_id, max(limit, 0)),
+            ).fetchall()
+        return [
+            {"seq": seq, "role": role, "content": content, "agent": agent}
+            for seq, role, content, agent in reversed(rows)
+        ]
+
+    def append(self, session_id: str, turn: Dict) -> Dict:
+        now = time.time()
+        with self._lock, self._db:
+            # Take the write lock before reading next_seq, so two worker
+            # processes appending to one session cannot pick the same seq
+            self._db.execute("BEGIN IMMEDIATE")
+            row = self._db.execute(
+                "SELECT next_seq FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            seq = row[0] if row is not None else 0
+            if row is None:
+                self._db.execute(
+                    "INSERT INTO sessions (session_id, last_seen, next_seq) "
+                    "VALUES (?, ?, ?)",
+                    (session_id, now, seq + 1),
+                )
+            else:
+                self._db.execute(
+                    "UPDATE sessions SET last_seen = ?, next_seq = ? "
+                    "WHERE session_id = ?",
+                    (now, seq + 1, session_id),
+                )
+            self._db.execute(
+                "INSERT INTO turns (session_id, seq, role, content, agent) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (session_id, seq, turn.get("role", "user"),
+                 turn.get("content") or "", turn.get("agent")),
+            )
+            self._db.execute(
+                "DELETE FROM turns WHERE session_id = ? AND seq <= ?",
+                (session_id, seq - self.max_turns),
+            )
+            if now - self._last_purge > self.PURGE_INTERVAL:
+                self._purge(now)
+        return dict(turn, seq=seq)
+
+    def get_summary(self, session_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT summary, summary_upto FROM sessions WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return {"summary": row[0], "upto_seq": row[1]}
+
+    def set_summary(self, session_id: str, summary: str, upto_seq: int):
+        with self._lock, self._db:
+            # Never replace a summary with one covering fewer turns, which
+            # another worker may have written in the meantime
+            self._db.execute(
+                "UPDATE sessions SET summary = ?, summary_upto = ? WHERE session_id = ? "
+                "AND (summary_upto IS NULL OR summary_upto < ?)",
+                (summary, upto_seq, session_id, upto_seq),
+            )
+
+    def delete(self, session_id: str):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            sessions = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            turns = self._db.execute("SELECT COUNT(*) FROM turns").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "sessions": sessions,
+            "turns": turns,
+            "max_turns": self.max_turns,
+            "expired": self.expired,
+        }
+
+    def _purge(self, now: float):
+        cutoff = now - self.idle_ttl_seconds
+        self._db.execute(
+            "DELETE FROM turns WHERE session_id IN "
+            "(SELECT session_id FROM sessions WHERE last_seen < ?)",
+            (cutoff,),
+        )
+        self.expired += self._db.execute(
+            "DELETE FROM sessions WHERE last_seen < ?", (cutoff,)
+        ).rowcount
+        self._last_purge = now
+
+
+def create_session_store(
+    kind: str,
+    path: Optional[str] = None,
+    max_turns: int = 50,
+    idle_ttl_seconds: float = 86400.0,
+    max_sessions: int = 10000,
+    max_bytes: int = 64 * 1024 * 1024,
+) -> SessionStore:
+    """
+    Build the session store selected by SESSION_STORE ("memory" or "sqlite").
+    """
+    if kind == "sqlite":
+        if not path:
+            raise ValueError("[SESSIONS] The sqlite session store needs a path")
+        return SQLiteSessionStore(path, max_turns, idle_ttl_seconds)
+    if kind == "memory":
+        return InMemorySessionStore(max_turns, idle_ttl_seconds, max_sessions, max_bytes)
+    raise ValueError(f"[SESSIONS] Unknown session store: {kind!r}")
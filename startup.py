@@ -0,0 +1,110 @@
+# startup.py
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceLoader:
+    """
+    Builds the service off the request path and tracks its progress.
+
+    factory(progress) constructs the service and calls progress(phase)
+    whenever it moves on to another initialization phase; with warmup
+    enabled the service's warmup() runs afterwards. The service is only
+    published (and ready) once all of that has finished. status() is what
+    the /health and /ready endpoints report.
+    """
+
+    def __init__(self, factory: Callable[[Callable[[str], None]], object],
+                 warmup: bool = True):
+        self.factory = factory
+        self.warmup = warmup
+        self.service = None
+        self.phase = "pending"
+        self.error: Optional[str] = None
+        # Seconds spent in each finished phase, in order
+        self.phases: Dict[str, float] = {}
+        self._created = time.monotonic()
+        self._started: Optional[float] = None
+        self._phase_started: Optional[float] = None
+        self._ready_seconds: Optional[float] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.service is not None
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None
+
+    def start(self):
+        """
+        Build the service on a background thread; returns immediately.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="service-init", daemon=True
+            )
+        self._thread.start()
+
+    def load(self):
+        """
+        Build the service on the calling thread. Raises if that fails.
+        """
+        self._started = time.monotonic()
+        try:
+            self._progress("init")
+            service = self.factory(self._progress)
+            if self.warmup:
+                self._progress("warmup")
+                service.warmup()
+            self._progress("ready")
+        except Exception as exc:
+            self._progress("failed")
+            self.error = f"{type(exc).__name__}: {exc}"
+            raise
+        self._ready_seconds = time.monotonic() - self._started
+        self.service = service
+        logger.info(
+            f"[STARTUP] Service ready in {self._ready_seconds:.1f}s "
+            f"({', '.join(f'{k}={v:.1f}s' for k, v in self.phases.items())})"
+        )
+        return service
+
+    def status(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "status": "failed" if self.failed else ("ready" if self.ready else "starting"),
+            "phase": self.phase,
+            "phases_s": dict(self.phases),
+            "phase_elapsed_s": (
+                now - self._phase_started
+                if self._phase_started is not None and not self.ready and not self.failed
+                else None
+            ),
+            "ready_after_s": self._ready_seconds,
+            "uptime_s": now - self._created,
+            "error": self.error,
+        }
+
+    def _run(self):
+        try:
+            self.load()
+        except Exception as exc:
+            logger.exception(f"[STARTUP] Service initialization failed: {exc}")
+
+    def _progress(self, phase: str):
+        now = time.monotonic()
+        with self._lock:
+            if self._phase_started is not None and self.phase not in ("pending", "ready"):
+                self.phases[self.phase] = now - self._phase_started
+            self.phase = phase
+            self._phase_started = now
+        logger.info(f"[STARTUP] Phase: {phase}")
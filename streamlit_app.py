@@ -1,3 +1,4 @@
+import json
 import streamlit as st
 import requests
 import uuid
@@ -6,6 +7,7 @@ import uuid
 # CONFIG
 # =============================
 API_URL = "http://127.0.0.1:8000/chat"
+STREAM_URL = "http://127.0.0.1:8000/chat/stream"
 
 st.set_page_config(
     page_title="Agentic RAG – BFSI POC",
@@ -36,6 +38,26 @@ st.sidebar.markdown("""
 - 🚫 **Unwanted Agent**
 """)
 
+# =============================
+# HELPERS
+# =============================
+def iter_sse(response):
+    """
+    Parse a Server-Sent Events response into (event, data) pairs.
+    """
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+
 # =============================
 # MAIN UI
 # =============================
@@ -74,33 +96,49 @@ if user_input:
     }
 
     try:
-        with st.spinner("Routing via Supervisor Agent..."):
-            response = requests.post(API_URL, json=payload, timeout=60)
-
-        if response.status_code != 200:
-            st.error(f"API Error: {response.text}")
-        else:
-            data = response.json()
-
-            # Save history
-            st.session_state.chat_history.append({
-                "role": "user",
-                "content": user_input,
-            })
-
-            st.session_state.chat_history.append({
-                "role": "assistant",
-                "content": data["answer"],
-                "intent": data["intent"],
-                "agent": data["agent"],
-            })
-
-            # Render assistant message
-            with st.chat_message("assistant"):
-                st.markdown(data["answer"])
-                st.caption(
-                    f"🧭 Intent: **{data['intent']}** | 🤖 Agent: **{data['agent']}**"
-                )
+        with st.chat_message("assistant"):
+            answer_box = st.empty()
+            caption_box = st.empty()
+            answer_box.markdown("_Routing via Supervisor Agent..._")
+
+            with requests.post(
+                STREAM_URL, json=payload, stream=True, timeout=(5, 120)
+            ) as response:
+                if response.status_code != 200:
+                    answer_box.empty()
+                    st.error(f"API Error: {response.text}")
+                else:
+                    answer, data = "", None
+                    for event, event_data in iter_sse(response):
+                        if event == "route":
+                            caption_box.caption(
+                                f"🧭 Intent: **{event_data['intent']}** | "
+                                f"🤖 Agent: **{event_data['agent']}**"
+                            )
+                            answer_box.markdown("_Generating answer..._")
+                        elif event == "token":
+                            answer += event_data
+                            answer_box.markdown(answer + "▌")
+                        elif event == "done":
+                            data = event_data
+                        elif event == "error":
+                            st.error(f"API Error: {event_data}")
+
+                    if data is not None:
+                        answer_box.markdown(data["answer"])
+
+                        # Save history
+                        st.session_state.chat_history.append({
+                            "role": "user",
+                            "content": user_input,
+                        })
+
+                        st.session_state.chat_history.append({
+                            "role": "assistant",
+                            "content": data["answer"],
+                            "intent": data["intent"],
+                            "agent": data["agent"],
+                        })
 
     except Exception as e:
         st.error(f"Failed to connect to backend: {e}")
@@ -0,0 +1,57 @@
+import zlib
+
+import numpy as np
+import pytest
+
+import rag.vector_store as vector_store_module
+from rag.vector_store import VectorStore
+
+DIM = 64
+
+
+def unit_vectors(n, dim=16, seed=0):
+    """
+    n random L2-normalized float32 rows.
+    """
+    rng = np.random.RandomState(seed)
+    matrix = rng.randn(n, dim).astype(np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+class HashingModel:
+    """
+    Stand-in for the sentence-transformers model: a normalized bag of
+    hashed words, so texts sharing words are close.
+    """
+
+    def encode(self, texts, show_progress_bar=False, normalize_embeddings=True, **kwargs):
+        matrix = np.zeros((len(texts), DIM), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                matrix[row, zlib.crc32(word.encode("utf-8")) % DIM] += 1.0
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1.0, norms)
+
+
+@pytest.fixture
+def make_store(monkeypatch, tmp_path):
+    """
+    Factory of numpy-backed VectorStores on one persist dir, using
+    HashingModel instead of the real embedding model.
+    """
+    monkeypatch.setattr(
+        vector_store_module, "_get_embedding_model", lambda *args, **kwargs: HashingModel()
+    )
+    stores = []
+
+    def make(**kwargs):
+        kwargs.setdefault("persist_dir", str(tmp_path / "index"))
+        kwargs.setdefault("backend", "numpy")
+        kwargs.setdefault("embed_batch_wait_ms", 0)
+        store = VectorStore(**kwargs)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        store.executor.shutdown(wait=False)
@@ -0,0 +1,83 @@
+import time
+
+import numpy as np
+
+from rag.answer_cache import SemanticAnswerCache, context_fingerprint, history_fingerprint
+
+CONTEXT = context_fingerprint("Home loan rates start at 8.5%.")
+
+
+def vector(*values):
+    v = np.asarray(values + (0.0,) * (4 - len(values)), dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+def test_similar_queries_hit_and_dissimilar_ones_miss():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.store("bfsi_agent", vector(1, 0.1), "8.5%", CONTEXT, 1)
+
+    assert cache.lookup("bfsi_agent", vector(1, 0.15), CONTEXT, 1) == "8.5%"
+    assert cache.lookup("bfsi_agent", vector(1, 1), CONTEXT, 1) is None
+    assert cache.lookup("general_agent", vector(1, 0.1), CONTEXT, 1) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_another_context_or_conversation_never_matches():
+    cache = SemanticAnswerCache()
+    earlier = history_fingerprint([{"role": "user", "content": "I want a car loan"}])
+    cache.store("bfsi_agent", vector(1), "opening answer", CONTEXT, 1)
+    cache.store("bfsi_agent", vector(1), "follow-up answer", CONTEXT, 1, history_key=earlier)
+
+    assert cache.lookup("bfsi_agent", vector(1), CONTEXT, 1) == "opening answer"
+    assert cache.lookup("bfsi_agent", vector(1), CONTEXT, 1, history_key=earlier) == (
+        "follow-up answer"
+    )
+    other = history_fingerprint([{"role": "user", "content": "I want a gold loan"}])
+    assert cache.lookup("bfsi_agent", vector(1), CONTEXT, 1, history_key=other) is None
+    assert cache.lookup("bfsi_agent", vector(1), context_fingerprint("other"), 1) is None
+    assert history_fingerprint([]) == ""
+
+
+def test_index_change_drops_every_entry():
+    cache = SemanticAnswerCache()
+    cache.store("bfsi_agent", vector(1), "answer", CONTEXT, 1)
+
+    assert cache.lookup("bfsi_agent", vector(1), CONTEXT, 2) is None
+    assert cache.lookup("bfsi_agent", vector(1), CONTEXT, 1) is None
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_entries_expire_after_the_ttl():
+    cache = SemanticAnswerCache(ttl_seconds=0.05)
+    cache.store("bfsi_agent", vector(1), "answer", CONTEXT, 1)
+    assert cache.lookup("bfsi_agent", vector(1), CONTEXT, 1) == "answer"
+
+    time.sleep(0.06)
+
+    assert cache.lookup("bfsi_agent", vector(1), CONTEXT, 1) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticAnswerCache(max_entries=2)
+    cache.store("bfsi_agent", vector(1), "first", CONTEXT, 1)
+    cache.store("bfsi_agent", vector(0, 1), "second", CONTEXT, 1)
+    # a hit makes "first" the most recently used
+    assert cache.lookup("bfsi_agent", vector(1), CONTEXT, 1) == "first"
+
+    cache.store("bfsi_agent", vector(0, 0, 1), "third", CONTEXT, 1)
+
+    assert cache.lookup("bfsi_agent", vector(0, 1), CONTEXT, 1) is None
+    assert cache.lookup("bfsi_agent", vector(1), CONTEXT, 1) == "first"
+    assert cache.stats()["entries"] == 2
+
+
+def test_invalidate_clears_the_cache():
+    cache = SemanticAnswerCache()
+    cache.store("bfsi_agent", vector(1), "answer", CONTEXT, 1)
+
+    cache.invalidate()
+
+    assert cache.lookup("bfsi_agent", vector(1), CONTEXT, 1) is None
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from agents.llm_gateway import LLMUnavailableError
+from config import BatchChatConfig
+
+
+class StubVectorStore:
+    def __init__(self, log, cached=True):
+        self.log = log
+        self.embedding_cache = object() if cached else None
+
+    async def aembed(self, texts):
+        self.log.append(("embed", list(texts)))
+        await asyncio.sleep(0)
+        return [[0.0] for _ in texts]
+
+
+class StubService(main.AgenticRAGService):
+    """
+    The real batching code over a turn handler that records what runs
+    when; messages starting with "fail" raise.
+    """
+
+    def __init__(self, embed_window=256, cached=True, seed=0):
+        self.log = []
+        self.batch_cfg = BatchChatConfig(embed_window=embed_window)
+        self.vector_store = StubVectorStore(self.log, cached)
+        self.random = random.Random(seed)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def ahandle_user_message(self, session_id, user_message):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.log.append(("start", session_id, user_message))
+        try:
+            await asyncio.sleep(self.random.uniform(0, 0.005))
+            if user_message.startswith("fail-llm"):
+                raise LLMUnavailableError("LLM down")
+            if user_message.startswith("fail"):
+                raise RuntimeError("boom")
+            return {"session_id": session_id, "answer": f"re: {user_message}", "timings": {}}
+        finally:
+            self.log.append(("end", session_id, user_message))
+            self.in_flight -= 1
+
+
+def run_batch(service, items, concurrency=4):
+    async def collect():
+        return [result async for result in service.abatch_user_messages(items, concurrency)]
+
+    return asyncio.run(collect())
+
+
+def test_turns_of_a_session_run_in_input_order():
+    service = StubService()
+    items = [
+        {"session_id": f"s{i % 3}", "message": f"m{i}", "id": i} for i in range(30)
+    ]
+
+    results = run_batch(service, items, concurrency=4)
+
+    assert sorted(result["index"] for result in results) == list(range(30))
+    assert all(result["answer"] == f"re: m{result['index']}" for result in results)
+    assert service.max_in_flight <= 3  # three sessions, one turn each at a time
+    for session in ("s0", "s1", "s2"):
+        events = [(entry[0], entry[2]) for entry in service.log
+                  if entry[0] != "embed" and entry[1] == session]
+        expected = [item["message"] for item in items if item["session_id"] == session]
+        # start, end, start, end... in input order: never two turns at once
+        assert events == [(kind, m) for m in expected for kind in ("start", "end")]
+
+
+def test_concurrency_bounds_the_turns_in_flight():
+    service = StubService()
+    items = [{"session_id": f"s{i}", "message": f"m{i}"} for i in range(20)]
+
+    run_batch(service, items, concurrency=3)
+
+    assert service.max_in_flight == 3
+
+
+def test_windows_are_embedded_one_ahead_of_the_turns():
+    service = StubService(embed_window=4)
+    items = [{"session_id": f"s{i}", "message": f"m{i % 6}"} for i in range(10)]
+
+    run_batch(service, items, concurrency=2)
+
+    embeds = [i for i, entry in enumerate(service.log) if entry[0] == "embed"]
+    # duplicates are embedded once per window
+    assert [service.log[i][1] for i in embeds] == [
+        ["m0", "m1", "m2", "m3"], ["m4", "m5", "m0", "m1"], ["m2", "m3"],
+    ]
+    # window w + 1 is only embedded once a turn of window w got a slot
+    starts = [(i, int(entry[1][1:])) for i, entry in enumerate(service.log)
+              if entry[0] == "start"]
+    for w, position in enumerate(embeds[1:]):
+        assert any(i < position and index // 4 == w for i, index in starts)
+
+
+def test_without_an_embedding_cache_no_window_is_prefetched():
+    service = StubService(cached=False)
+
+    results = run_batch(service, [{"session_id": "s", "message": "m"}])
+
+    assert results[0]["answer"] == "re: m"
+    assert not [entry for entry in service.log if entry[0] == "embed"]
+
+
+def test_failed_items_do_not_stop_the_batch():
+    service = StubService()
+    items = [
+        {"session_id": "s", "message": "m0"},
+        {"session_id": "s", "message": "fail-llm"},
+        {"session_id": "t", "message": "fail"},
+        {"session_id": "s", "message": "m3"},
+    ]
+
+    results = {result["index"]: result for result in run_batch(service, items)}
+
+    assert results[0]["answer"] == "re: m0"
+    assert (results[1]["error"], results[1]["message"]) == ("unavailable", "LLM down")
+    assert results[2]["error"] == "internal"
+    assert results[3]["answer"] == "re: m3"
+    assert "batch_wait_ms" in results[1]["timings"]
+
+
+@pytest.mark.parametrize("item_id", [7, "q7", None])
+def test_batch_endpoint_echoes_item_ids(monkeypatch, item_id):
+    monkeypatch.setattr(main.loader, "service", StubService())
+    client = TestClient(main.app)
+
+    response = client.post("/chat/batch", json={
+        "items": [{"session_id": "s", "message": "m", "id": item_id}],
+    })
+
+    assert response.status_code == 200
+    line = json.loads(response.text.splitlines()[0])
+    assert line["id"] == item_id
+    assert type(line["id"]) is type(item_id)
@@ -0,0 +1,57 @@
+from rag.vector_store import chunk_text, iter_chunks, iter_sentences
+
+
+def sentence(n, word="w"):
+    return " ".join(f"{word}{i}" for i in range(n)) + "."
+
+
+def test_sentence_cut_by_a_page_break_is_joined():
+    pages = [(1, "First one. Second starts here"), (2, "and ends here. Third.")]
+
+    sentences = [(" ".join(words), first, last) for words, first, last in iter_sentences(pages)]
+
+    assert sentences == [
+        ("First one.", 1, 1),
+        ("Second starts here and ends here.", 1, 2),
+        ("Third.", 2, 2),
+    ]
+
+
+def test_long_sentences_are_split_at_max_words():
+    pages = [(1, " ".join(f"w{i}" for i in range(25)))]
+
+    pieces = [words for words, _, _ in iter_sentences(pages, max_words=10)]
+
+    assert [len(words) for words in pieces] == [10, 10, 5]
+    assert sum(pieces, []) == [f"w{i}" for i in range(25)]
+
+
+def test_chunks_stay_within_max_words():
+    pages = [(page, " ".join(sentence(7, f"p{page}s{i}_") for i in range(5)))
+             for page in range(1, 4)]
+
+    chunks = list(iter_chunks(pages, max_words=20))
+
+    assert len(chunks) > 1
+    assert all(len(chunk["text"].split()) <= 20 for chunk in chunks)
+
+
+def test_chunks_overlap_across_pages():
+    pages = [(1, sentence(8, "a") + " " + sentence(3, "b")), (2, sentence(12, "c"))]
+
+    chunks = list(iter_chunks(pages, max_words=20))
+
+    assert [(chunk["page_start"], chunk["page_end"]) for chunk in chunks] == [(1, 1), (1, 2)]
+    # the last sentence of page 1 is repeated at the start of the next chunk
+    assert chunks[0]["text"].endswith(sentence(3, "b"))
+    assert chunks[1]["text"] == sentence(3, "b") + " " + sentence(12, "c")
+
+
+def test_every_sentence_ends_up_in_a_chunk():
+    text = " ".join(sentence(n, f"s{n}_") for n in range(1, 15))
+
+    chunks = chunk_text(text, max_words=30)
+
+    words = set(" ".join(chunks).split())
+    assert words == set(text.split())
+    assert chunk_text("") == []
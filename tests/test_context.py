@@ -0,0 +1,75 @@
+from rag.context import EMPTY_CONTEXT, estimate_tokens, pack_context, truncate_to_tokens
+
+
+def hit(chunk_id, text, index=None, source="a.pdf"):
+    metadata = {"source": source, "doc_hash": f"h-{source}"}
+    if index is not None:
+        metadata["chunk_index"] = index
+    return {"id": chunk_id, "text": text, "metadata": metadata}
+
+
+def test_adjacent_chunks_merge_into_one_span_without_the_overlap():
+    hits = [
+        hit("c1", "Rates are fixed. Fees are waived.", index=1),
+        hit("c0", "Loans need a form. Rates are fixed.", index=0),
+    ]
+
+    context = pack_context(hits)
+
+    assert context["text"] == "Loans need a form. Rates are fixed. Fees are waived."
+    assert (context["chunks"], context["spans"]) == (2, 1)
+
+
+def test_spans_keep_the_rank_of_their_best_chunk():
+    hits = [
+        hit("b0", "Gold loans are valued daily.", index=0, source="b.pdf"),
+        hit("a5", "Prepayment is free.", index=5),
+        hit("b1", "Jewellery stays at the branch.", index=1, source="b.pdf"),
+    ]
+
+    parts = pack_context(hits)["text"].split("\n\n")
+
+    assert parts == [
+        "Gold loans are valued daily. Jewellery stays at the branch.",
+        "Prepayment is free.",
+    ]
+
+
+def test_repeated_sentences_and_hits_are_dropped():
+    hits = [
+        hit("a0", "Rates are fixed. Fees apply.", index=0),
+        hit("b3", "rates  are FIXED. Tenure is five years.", index=3, source="b.pdf"),
+        hit("a0", "Rates are fixed. Fees apply.", index=0),
+    ]
+
+    context = pack_context(hits)
+
+    assert context["text"] == "Rates are fixed. Fees apply.\n\nTenure is five years."
+    assert context["tokens_saved"] == context["raw_tokens"] - context["tokens"] > 0
+
+
+def test_budget_cuts_at_a_sentence_boundary():
+    sentences = [f"Clause {i} sets out the terms of repayment in detail." for i in range(20)]
+    hits = [hit("a0", " ".join(sentences), index=0)]
+
+    context = pack_context(hits, token_budget=60)
+
+    assert context["tokens"] <= 60
+    assert context["text"].endswith(".")
+    assert context["text"].startswith(sentences[0])
+
+
+def test_one_huge_sentence_is_truncated_to_fit():
+    words = " ".join(f"word{i}" for i in range(500))
+
+    context = pack_context([hit("a0", words)], token_budget=50)
+
+    assert context["text"].endswith(" ...")
+    assert estimate_tokens(context["text"]) <= 50
+    assert truncate_to_tokens("a b c", 100) == "a b c ..."
+
+
+def test_empty_context():
+    assert EMPTY_CONTEXT == {
+        "text": "", "tokens": 0, "raw_tokens": 0, "tokens_saved": 0, "chunks": 0, "spans": 0,
+    }
@@ -0,0 +1,150 @@
+import numpy as np
+
+from rag.dedup import (
+    BackReferences,
+    MinHasher,
+    NearDuplicateIndex,
+    lsh_bands,
+    make_ref,
+    promote,
+    read_refs,
+)
+
+CLAUSE = (
+    "The borrower shall repay the loan in equated monthly instalments over the agreed "
+    "tenure and any prepayment made before the end of the lock in period attracts a "
+    "charge on the principal outstanding at the time of prepayment as per the schedule"
+)
+EDITED = CLAUSE.replace("the schedule", "the schedule of charges")
+OTHER = (
+    "Gold loans are sanctioned against jewellery pledged at the branch and are valued "
+    "by an approved appraiser on the day the loan application is submitted in person"
+)
+
+
+def chunk(chunk_id, text, source, doc_hash="h"):
+    return {
+        "id": chunk_id,
+        "text": text,
+        "metadata": {"source": source, "doc_hash": f"{doc_hash}-{source}"},
+    }
+
+
+def test_minhash_estimates_jaccard_similarity():
+    hasher = MinHasher(num_perm=128)
+
+    same = np.mean(hasher.signature(CLAUSE) == hasher.signature(CLAUSE.upper()))
+    close = np.mean(hasher.signature(CLAUSE) == hasher.signature(EDITED))
+    far = np.mean(hasher.signature(CLAUSE) == hasher.signature(OTHER))
+
+    assert same == 1.0
+    assert 0.7 < close < 1.0
+    assert far < 0.1
+
+
+def test_lsh_bands_cover_the_permutations_below_the_threshold():
+    for threshold in (0.5, 0.8, 0.9):
+        bands, rows = lsh_bands(64, threshold)
+        assert bands * rows == 64
+        assert (1.0 / bands) ** (1.0 / rows) <= threshold
+
+
+def test_match_requires_threshold_and_same_figures():
+    index = NearDuplicateIndex(threshold=0.8)
+    index.add("rep", index.fingerprint("At 8.5 percent " + CLAUSE), "a.pdf", "h-a")
+
+    found = index.match(index.fingerprint("At 8.5 percent " + EDITED), "b.pdf", "h-b")
+
+    assert found is not None and found[0] == "rep" and found[1] >= 0.8
+    # same words, another rate: both must be kept
+    assert index.match(index.fingerprint("At 9.5 percent " + CLAUSE), "b.pdf", "h-b") is None
+    assert index.match(index.fingerprint(OTHER), "b.pdf", "h-b") is None
+
+
+def test_new_version_of_a_source_never_folds_into_the_old_one():
+    index = NearDuplicateIndex(threshold=0.8)
+    index.add("rep", index.fingerprint(CLAUSE), "a.pdf", "v1")
+
+    assert index.match(index.fingerprint(CLAUSE), "a.pdf", "v2") is None
+    assert index.match(index.fingerprint(CLAUSE), "a.pdf", "v1")[0] == "rep"
+
+    index.set_owner("rep", "b.pdf", "v0")
+    assert index.match(index.fingerprint(CLAUSE), "a.pdf", "v2")[0] == "rep"
+
+    index.remove(["rep"])
+    assert "rep" not in index
+    assert index.match(index.fingerprint(CLAUSE), "a.pdf", "v1") is None
+
+
+def test_back_references_are_looked_up_by_source_and_document():
+    refs = BackReferences()
+    refs.set("r1", [{"source": "a.pdf", "doc_hash": "ha"}, {"source": "b.pdf", "doc_hash": "hb"}])
+    refs.set("r2", [{"source": "a.pdf", "doc_hash": "ha"}])
+
+    assert refs.holders_of_source("a.pdf") == {"r1", "r2"}
+    assert refs.holders_of_document("hb") == {"r1"}
+    assert refs.has_document("hb", source="b.pdf")
+    assert not refs.has_document("hb", source="a.pdf")
+
+    refs.set("r1", [{"source": "a.pdf", "doc_hash": "ha"}])
+    refs.discard(["r2"])
+
+    assert refs.holders_of_source("a.pdf") == {"r1"}
+    assert not refs.has_document("hb")
+    assert len(refs) == 1
+
+
+def test_promote_hands_the_chunk_to_the_first_back_reference():
+    first = make_ref({"source": "b.pdf", "doc_hash": "hb"}, 0.93)
+    second = make_ref({"source": "c.pdf", "doc_hash": "hc"}, 0.91)
+
+    meta = promote([first, second])
+
+    assert meta["source"] == "b.pdf" and "similarity" not in meta
+    assert read_refs(meta) == [second]
+
+
+def test_store_folds_near_duplicates_across_documents(make_store):
+    store = make_store(dedup_threshold=0.8)
+    store.add_documents([chunk("a0", CLAUSE, "a.pdf"), chunk("a1", OTHER, "a.pdf")])
+
+    batch = store.deduplicate([chunk("b0", EDITED, "b.pdf"), chunk("b1", EDITED, "b.pdf")])
+    # nothing left to store: the queued back-references are written here
+    store.apply_duplicate_refs()
+
+    assert batch == []
+    assert store.backend.count() == 2
+    stored = {c["id"]: c["metadata"] for c in store.backend.get(["a0"])}
+    assert [ref["source"] for ref in read_refs(stored["a0"])] == ["b.pdf", "b.pdf"]
+    assert store.has_document("h-b.pdf", source="b.pdf")
+    assert store.dedup_stats()["duplicates_folded"] == 2
+
+
+def test_removing_a_representative_promotes_its_duplicate(make_store):
+    store = make_store(dedup_threshold=0.8)
+    store.add_documents([chunk("a0", CLAUSE, "a.pdf")])
+    assert store.deduplicate([chunk("b0", EDITED, "b.pdf")]) == []
+    store.apply_duplicate_refs()
+
+    assert store.remove_source("a.pdf") == 0
+
+    meta = store.backend.get(["a0"])[0]["metadata"]
+    assert meta["source"] == "b.pdf" and read_refs(meta) == []
+    assert not store.has_document("h-a.pdf")
+    assert [hit["metadata"]["source"] for hit in store.search("borrower prepayment", k=1)] == [
+        "b.pdf"
+    ]
+
+    assert store.remove_source("b.pdf") == 1
+    assert store.backend.count() == 0
+
+
+def test_duplicates_within_one_batch_are_folded_before_storing(make_store):
+    store = make_store(dedup_threshold=0.8)
+
+    batch = store.deduplicate([chunk("a0", CLAUSE, "a.pdf"), chunk("b0", EDITED, "b.pdf")])
+
+    assert [doc["id"] for doc in batch] == ["a0"]
+    assert [ref["source"] for ref in read_refs(batch[0]["metadata"])] == ["b.pdf"]
+    store.add_documents(batch)
+    assert store.has_document("h-b.pdf", source="b.pdf")
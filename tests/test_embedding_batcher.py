@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+from prometheus_client import REGISTRY
+
+from rag.vector_store import EmbeddingBatcher
+
+
+class Recorder:
+    """
+    encode_fn stand-in: one [number] row per numeric text, and a log of
+    the texts of every call.
+    """
+
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        if self.error is not None:
+            raise self.error
+        return [[float(text)] for text in texts]
+
+
+def sample(name):
+    return REGISTRY.get_sample_value(name) or 0.0
+
+
+def histograms():
+    return {
+        name: sample(name)
+        for name in ("rag_embed_batch_size_count", "rag_embed_batch_size_sum",
+                     "rag_embed_queue_wait_seconds_count")
+    }
+
+
+def test_concurrent_callers_get_their_own_rows_in_order():
+    encode = Recorder()
+    batcher = EmbeddingBatcher(encode, max_batch=64, max_wait_ms=200)
+    before = histograms()
+    requests = [[str(100 * caller + i) for i in range(caller + 1)] for caller in range(8)]
+    results = [None] * len(requests)
+    start = threading.Barrier(len(requests))
+
+    def call(caller):
+        start.wait()
+        results[caller] = batcher.encode(requests[caller])
+
+    threads = [threading.Thread(target=call, args=(caller,)) for caller in range(len(requests))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == [[[float(text)] for text in texts] for texts in requests]
+    # gathered into fewer model calls than callers
+    assert len(encode.calls) < len(requests)
+    assert sorted(sum(encode.calls, [])) == sorted(sum(requests, []))
+
+    after = histograms()
+    assert after["rag_embed_batch_size_count"] - before["rag_embed_batch_size_count"] == len(
+        encode.calls
+    )
+    assert after["rag_embed_batch_size_sum"] - before["rag_embed_batch_size_sum"] == 36
+    assert after["rag_embed_queue_wait_seconds_count"] - before[
+        "rag_embed_queue_wait_seconds_count"
+    ] == len(requests)
+    stats = batcher.stats()
+    assert stats["requests"] == len(requests)
+    assert stats["mean_batch_size"] == pytest.approx(36 / len(encode.calls))
+
+
+def test_request_larger_than_max_batch_is_encoded_alone():
+    encode = Recorder()
+    batcher = EmbeddingBatcher(encode, max_batch=4, max_wait_ms=100)
+
+    big = batcher.submit([str(i) for i in range(10)])
+    small = batcher.submit(["99"])
+
+    assert big.result(5) == [[float(i)] for i in range(10)]
+    assert small.result(5) == [[99.0]]
+    assert encode.calls == [[str(i) for i in range(10)], ["99"]]
+
+
+def test_encode_error_reaches_every_waiting_caller():
+    error = RuntimeError("model crashed")
+    encode = Recorder(error=error)
+    batcher = EmbeddingBatcher(encode, max_batch=64, max_wait_ms=200)
+
+    futures = [batcher.submit([str(i)]) for i in range(3)]
+
+    assert [future.exception(5) for future in futures] == [error] * 3
+    assert len(encode.calls) == 1
+    # the worker keeps serving after a failure
+    encode.error = None
+    assert batcher.encode(["7"]) == [[7.0]]
@@ -0,0 +1,44 @@
+from agents.base_agent import SUMMARY_ROLE, format_history
+from agents.history import HistoryCompactor
+from session_store import InMemorySessionStore
+
+
+def make_compactor(**kwargs):
+    sessions = InMemorySessionStore()
+    return sessions, HistoryCompactor(None, None, sessions, **kwargs)
+
+
+def test_view_drops_summarized_turns_and_keeps_the_rest():
+    sessions, history = make_compactor(keep_recent=4, summarize_every=4)
+    for i in range(10):
+        sessions.append("s", {"role": "user", "content": f"turn {i}", "agent": None})
+    sessions.set_summary("s", "turns 0-3", 3)
+
+    view = history.view("s", sessions.load("s"))
+
+    assert view[0] == {"role": SUMMARY_ROLE, "content": "turns 0-3", "agent": None}
+    assert [turn["seq"] for turn in view[1:]] == [4, 5, 6, 7, 8, 9]
+
+
+def test_format_history_renders_every_turn_of_the_view():
+    sessions, history = make_compactor(keep_recent=4, summarize_every=4)
+    for i in range(10):
+        sessions.append("s", {"role": "user", "content": f"turn {i}", "agent": None})
+    # seven turns are waiting for the next summary, more than keep_recent
+    sessions.set_summary("s", "turns 0-2", 2)
+
+    text = format_history(history.view("s", sessions.load("s")))
+
+    lines = text.splitlines()
+    assert lines[0] == "summary of earlier conversation: turns 0-2"
+    assert lines[1:] == [f"user: turn {i}" for i in range(3, 10)]
+
+
+def test_format_history_max_turns_keeps_the_summary():
+    history = [{"role": SUMMARY_ROLE, "content": "earlier"}] + [
+        {"role": "user", "content": f"turn {i}"} for i in range(6)
+    ]
+
+    lines = format_history(history, max_turns=2).splitlines()
+
+    assert lines == ["summary of earlier conversation: earlier", "user: turn 4", "user: turn 5"]
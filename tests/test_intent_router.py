@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from agents.intent_router import EmbeddingIntentRouter
+from agents.llm_gateway import LLMUnavailableError
+from agents.supervisor_agent import SupervisorAgent
+from config import HuggingFaceConfig
+from conftest import HashingModel
+
+EXAMPLES = {
+    "bfsi": ["home loan interest rate", "loan emi tenure", "loan prepayment charges"],
+    "general": ["bank branch opening hours", "bank holiday list", "bank customer care"],
+    "unwanted": ["write a poem", "football match score", "movie recommendation"],
+}
+
+
+class StubLLM:
+    """
+    LLMGateway stand-in answering every routing call with reply (or
+    raising it when it is an exception).
+    """
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+
+    def _answer(self):
+        self.calls += 1
+        if isinstance(self.reply, Exception):
+            raise self.reply
+        return self.reply
+
+    def chat(self, messages):
+        return self._answer()
+
+    async def achat(self, messages):
+        return self._answer()
+
+
+def make_router(**kwargs):
+    return EmbeddingIntentRouter(HashingModel().encode, examples=EXAMPLES, **kwargs).fit()
+
+
+def make_supervisor(reply, min_confidence=0.6, router=True):
+    client = StubLLM(reply)
+    supervisor = SupervisorAgent(
+        client, HuggingFaceConfig(api_token="unused", chat_model="test-model"),
+        router=make_router() if router else None, min_confidence=min_confidence,
+    )
+    return client, supervisor
+
+
+def route(supervisor, message, use_async):
+    if use_async:
+        return asyncio.run(supervisor.aroute(message, []))
+    return supervisor.route(message, [])
+
+
+def test_messages_go_to_the_closest_centroid():
+    router = make_router()
+
+    assert router.classify("what is the loan interest rate")["intent"] == "bfsi"
+    assert router.classify("bank branch hours")["intent"] == "general"
+    result = router.classify("write a football poem")
+    assert result["intent"] == "unwanted"
+    assert set(result["scores"]) == set(EXAMPLES)
+    assert 0.0 < result["confidence"] <= 1.0
+
+
+def test_lower_temperature_means_higher_confidence():
+    message = "loan interest rate"
+
+    sharp = make_router(temperature=0.01).classify(message)
+    soft = make_router(temperature=1.0).classify(message)
+
+    assert sharp["intent"] == soft["intent"] == "bfsi"
+    assert sharp["confidence"] > soft["confidence"]
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_confident_local_decision_skips_the_llm(use_async):
+    client, supervisor = make_supervisor("general", min_confidence=0.5)
+
+    decision = route(supervisor, "home loan interest rate", use_async)
+
+    assert (decision["intent"], decision["method"]) == ("bfsi", "local")
+    assert client.calls == 0
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_low_confidence_falls_back_to_the_llm(use_async):
+    client, supervisor = make_supervisor("Intent: GENERAL", min_confidence=1.01)
+
+    decision = route(supervisor, "home loan interest rate", use_async)
+
+    assert (decision["intent"], decision["method"]) == ("general", "llm_fallback")
+    assert decision["confidence"] is not None
+    assert client.calls == 1
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_failed_llm_fallback_keeps_the_local_intent(use_async):
+    client, supervisor = make_supervisor(LLMUnavailableError("down"), min_confidence=1.01)
+
+    decision = route(supervisor, "home loan interest rate", use_async)
+
+    assert (decision["intent"], decision["method"]) == ("bfsi", "local_degraded")
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_without_a_router_the_llm_decides_and_its_errors_propagate(use_async):
+    _, supervisor = make_supervisor("unwanted", router=False)
+    assert route(supervisor, "anything", use_async)["method"] == "llm"
+
+    _, supervisor = make_supervisor(LLMUnavailableError("down"), router=False)
+    with pytest.raises(LLMUnavailableError):
+        route(supervisor, "anything", use_async)
@@ -0,0 +1,92 @@
+import pytest
+
+from rag.lexical import BM25Index, reciprocal_rank_fusion, tokenize
+from rag.vector_store import make_chunk_id
+
+DOCS = {
+    "emi": "The EMI is computed on the outstanding principal every month.",
+    "kyc": "KYC documents: PAN card and address proof are required.",
+    "prepay": "Prepayment of the home loan attracts a foreclosure fee of 2%.",
+    "rate": "The home loan interest rate is 8.5% for salaried applicants.",
+}
+
+
+def build_index():
+    index = BM25Index()
+    index.add(list(DOCS), list(DOCS.values()))
+    return index
+
+
+def test_tokenize_keeps_domain_terms_and_drops_stopwords():
+    assert tokenize("What is the EMI under clause-12.3 at 8.5%?") == ["emi", "under", "clause-12.3", "8.5"]
+
+
+def test_search_ranks_documents_containing_the_terms():
+    index = build_index()
+
+    assert index.search("kyc documents", 2)[0][0] == "kyc"
+    assert index.search("home loan interest rate", 1)[0][0] == "rate"
+    assert index.search("the of is", 3) == []
+    assert index.search("unrelated words", 3) == []
+
+
+def test_rare_terms_outweigh_common_ones():
+    index = build_index()
+    hits = dict(index.search("home foreclosure", 4))
+
+    # "home" appears in two documents, "foreclosure" in one
+    assert hits["prepay"] > hits["rate"]
+
+
+def test_adding_an_id_twice_keeps_the_first_text():
+    index = build_index()
+    index.add(["kyc"], ["completely different words"])
+
+    assert len(index) == 4
+    assert index.search("pan card", 1)[0][0] == "kyc"
+
+
+def test_removed_documents_are_never_returned():
+    index = build_index()
+    index.remove(["rate"])
+
+    assert len(index) == 3
+    assert all(doc_id != "rate" for doc_id, _ in index.search("interest rate home", 4))
+    assert not index.needs_rebuild
+    index.remove(["emi", "kyc"])
+    assert index.needs_rebuild
+
+
+def test_rebuild_replaces_the_index():
+    index = build_index()
+    index.remove(["emi", "kyc"])
+    index.rebuild([("emi", DOCS["emi"])])
+
+    assert len(index) == 1
+    assert not index.needs_rebuild
+    assert [doc_id for doc_id, _ in index.search("principal month", 3)] == ["emi"]
+
+
+def test_reciprocal_rank_fusion_scores():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]], k0=60)
+    scores = dict(fused)
+
+    assert scores["a"] == pytest.approx(1 / 61 + 1 / 62)
+    assert scores["c"] == pytest.approx(1 / 63 + 1 / 61)
+    assert scores["b"] == pytest.approx(1 / 62)
+    assert [doc_id for doc_id, _ in fused] == ["a", "c", "b"]
+
+
+def test_hybrid_search_fuses_dense_and_lexical_hits(make_store):
+    store = make_store()
+    docs = [
+        {"id": make_chunk_id("h", i, text), "text": text, "metadata": {"source": "s", "doc_hash": "h"}}
+        for i, text in enumerate(DOCS.values())
+    ]
+    store.add_documents(docs)
+
+    for mode in ("dense", "lexical", "hybrid"):
+        hits = store.search("KYC documents PAN card", k=2, mode=mode)
+        assert hits[0]["text"] == DOCS["kyc"], mode
+    with pytest.raises(ValueError):
+        store.search("x", mode="fuzzy")
@@ -0,0 +1,209 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+
+import agents.llm_gateway as llm_gateway
+from agents.llm_gateway import (
+    CircuitBreaker,
+    LLMError,
+    LLMGateway,
+    LLMTimeoutError,
+    LLMUnavailableError,
+)
+from config import HuggingFaceConfig, LLMGatewayConfig
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+class Upstream:
+    """
+    Chat completions server answering with the given statuses in turn
+    (200 once they run out); delay_s slows every answer down.
+    """
+
+    def __init__(self, statuses=(), delay_s=0.0):
+        self.statuses = list(statuses)
+        self.delay_s = delay_s
+        self.requests = []
+
+    async def handle(self, request):
+        self.requests.append(request.headers.get("Authorization"))
+        if self.delay_s:
+            await asyncio.sleep(self.delay_s)
+        status = self.statuses.pop(0) if self.statuses else 200
+        if status != 200:
+            return web.Response(status=status, text="upstream says no")
+        return web.json_response({"choices": [{"message": {"content": "answer"}}]})
+
+
+async def call(upstream, calls=1, pause_s=0.0, api_token="unused", **gateway_kwargs):
+    """
+    Run calls achat() calls, pause_s apart, against upstream; returns
+    (gateway, outcomes) where an outcome is the answer or the LLMError.
+    """
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", upstream.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    gateway_kwargs.setdefault("backoff_base_ms", 1)
+    gateway_kwargs.setdefault("backoff_max_ms", 5)
+    gateway = LLMGateway(
+        HuggingFaceConfig(api_token=api_token, chat_model="test-model",
+                          base_url=f"http://127.0.0.1:{port}"),
+        LLMGatewayConfig(**gateway_kwargs),
+    )
+    outcomes = []
+    try:
+        for i in range(calls):
+            if i:
+                await asyncio.sleep(pause_s)
+            try:
+                outcomes.append(await gateway.achat(MESSAGES))
+            except LLMError as exc:
+                outcomes.append(exc)
+    finally:
+        await gateway.aclose()
+        await runner.cleanup()
+    return gateway, outcomes
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_success()
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.opened == 1
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # the probe failed: open for another period
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.opened == 2
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_transient_errors_are_retried():
+    upstream = Upstream([503, 429])
+
+    gateway, outcomes = asyncio.run(call(upstream, max_retries=2))
+
+    assert outcomes == ["answer"]
+    assert len(upstream.requests) == 3
+    assert gateway.retries == 2
+    assert gateway.breaker.state == "closed"
+    # aclose() released the pooled session of the loop
+    assert not gateway._sessions
+
+
+def test_retries_give_up_as_unavailable():
+    upstream = Upstream([503] * 5)
+
+    gateway, outcomes = asyncio.run(call(upstream, max_retries=2))
+
+    assert isinstance(outcomes[0], LLMUnavailableError)
+    assert len(upstream.requests) == 3
+    assert gateway.failures == 1
+
+
+def test_rejected_requests_are_not_retried():
+    upstream = Upstream([400])
+
+    gateway, outcomes = asyncio.run(call(upstream, max_retries=2))
+
+    assert type(outcomes[0]) is LLMError
+    assert len(upstream.requests) == 1
+    assert gateway.retries == 0
+
+
+def test_slow_attempts_time_out():
+    upstream = Upstream(delay_s=0.5)
+
+    _, outcomes = asyncio.run(call(
+        upstream, max_retries=5, attempt_timeout_seconds=0.05, deadline_seconds=0.2,
+    ))
+
+    assert isinstance(outcomes[0], LLMTimeoutError)
+    assert len(upstream.requests) >= 2
+
+
+def test_backoff_grows_exponentially_up_to_the_cap(monkeypatch):
+    # no jitter: every delay is the full backoff
+    monkeypatch.setattr(llm_gateway.random, "uniform", lambda low, high: high)
+    upstream = Upstream([503] * 4)
+
+    started = time.perf_counter()
+    gateway, outcomes = asyncio.run(call(
+        upstream, max_retries=4, backoff_base_ms=40, backoff_max_ms=80,
+    ))
+    elapsed = time.perf_counter() - started
+
+    assert outcomes == ["answer"]
+    # 40 + 80 + 80 + 80 ms
+    assert elapsed >= 0.28
+    assert gateway.retries == 4
+
+
+def test_open_circuit_fails_fast_without_calling_upstream():
+    upstream = Upstream([503] * 10)
+
+    gateway, outcomes = asyncio.run(call(
+        upstream, calls=3, max_retries=1, breaker_failures=2, breaker_reset_seconds=60,
+    ))
+
+    assert all(isinstance(outcome, LLMUnavailableError) for outcome in outcomes)
+    # the first call opens the circuit, the other two never reach upstream
+    assert len(upstream.requests) == 2
+    assert gateway.breaker.state == "open"
+
+
+def test_successful_probe_closes_the_circuit():
+    upstream = Upstream([503, 503])
+
+    gateway, outcomes = asyncio.run(call(
+        upstream, calls=3, pause_s=0.06, max_retries=0,
+        breaker_failures=2, breaker_reset_seconds=0.05,
+    ))
+
+    assert [type(outcome) for outcome in outcomes[:2]] == [LLMUnavailableError] * 2
+    assert outcomes[2] == "answer"
+    assert len(upstream.requests) == 3
+    assert gateway.breaker.state == "closed"
+    assert gateway.breaker.opened == 1
+
+
+@pytest.mark.parametrize("token, header", [("secret", "Bearer secret"), ("unused", None)])
+def test_api_token_is_sent_to_custom_endpoints(token, header):
+    upstream = Upstream()
+
+    asyncio.run(call(upstream, api_token=token))
+
+    assert upstream.requests == [header]
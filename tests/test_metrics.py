@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = """
+from metrics import LLM_RETRIES
+LLM_RETRIES.inc({n})
+"""
+SCRAPE = """
+from metrics import render_latest
+print(render_latest()[0].decode())
+"""
+
+
+def run(code, env):
+    return subprocess.run([sys.executable, "-c", code], env=env, cwd=ROOT, check=True,
+                          capture_output=True, text=True).stdout
+
+
+def test_metrics_are_summed_over_worker_processes(tmp_path):
+    # prometheus_client reads the directory at import time: one process per worker
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path), PYTHONPATH=ROOT)
+    run(WORKER.format(n=2), env)
+    run(WORKER.format(n=3), env)
+
+    assert "rag_llm_retries_total 5.0" in run(SCRAPE, env)
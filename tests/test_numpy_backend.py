@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from conftest import unit_vectors
+from rag.backends import NumpyFlatBackend
+
+
+def add_rows(backend, n, start=0, seed=0, source="a.pdf"):
+    ids = [f"c{i}" for i in range(start, start + n)]
+    metas = [{"source": source, "doc_hash": f"h-{source}", "chunk_index": i}
+             for i in range(start, start + n)]
+    vectors = unit_vectors(n, seed=seed)
+    backend.add(ids, [f"text {i}" for i in range(start, start + n)], metas, vectors)
+    return ids, vectors
+
+
+def manifest(index_dir):
+    with open(os.path.join(index_dir, NumpyFlatBackend.MANIFEST)) as f:
+        return json.load(f)
+
+
+def test_query_returns_exact_top_k(tmp_path):
+    backend = NumpyFlatBackend(str(tmp_path))
+    ids, vectors = add_rows(backend, 50)
+
+    hits = backend.query(vectors[7], 3)
+
+    assert hits[0]["id"] == ids[7]
+    assert hits[0]["score"] == pytest.approx(1.0, abs=1e-5)
+    assert [h["score"] for h in hits] == sorted((h["score"] for h in hits), reverse=True)
+    expected = np.argsort(-(vectors @ vectors[7]))[:3]
+    assert [h["id"] for h in hits] == [ids[i] for i in expected]
+
+
+def test_reopen_restores_rows_and_metadata(tmp_path):
+    backend = NumpyFlatBackend(str(tmp_path))
+    ids, vectors = add_rows(backend, 10)
+
+    reopened = NumpyFlatBackend(str(tmp_path))
+
+    assert reopened.count() == 10
+    assert reopened.get([ids[3]])[0]["metadata"]["chunk_index"] == 3
+    assert reopened.query(vectors[3], 1)[0]["id"] == ids[3]
+    assert [chunk_id for chunk_id, _ in reopened.find({"source": "a.pdf"}, limit=2)] == ids[:2]
+
+
+def test_unpublished_bytes_are_ignored_on_reopen(tmp_path):
+    backend = NumpyFlatBackend(str(tmp_path))
+    add_rows(backend, 4)
+    # a write that died before the manifest was replaced
+    chunks = os.path.join(str(tmp_path), manifest(str(tmp_path))["chunks"])
+    with open(chunks, "ab") as f:
+        f.write(b'{"id": "torn", "text": "x", "metadata": {}}\n{"id": "half')
+
+    reopened = NumpyFlatBackend(str(tmp_path))
+    assert reopened.count() == 4
+    assert not reopened.existing_ids(["torn"])
+
+    # and the next add truncates them away
+    add_rows(reopened, 2, start=4, seed=1)
+    assert NumpyFlatBackend(str(tmp_path)).count() == 6
+
+
+def test_delete_writes_tombstones_until_compaction(tmp_path):
+    backend = NumpyFlatBackend(str(tmp_path))
+    ids, vectors = add_rows(backend, 20)
+
+    backend.delete(ids[:3])
+
+    assert manifest(str(tmp_path))["deleted"] == [0, 1, 2]
+    assert manifest(str(tmp_path))["generation"] == 0
+    assert backend.count() == 17
+    assert all(hit["id"] not in ids[:3] for hit in backend.query(vectors[0], 20))
+    assert backend.find({"source": "a.pdf"}, limit=1)[0][0] not in ids[:3]
+    assert NumpyFlatBackend(str(tmp_path)).count() == 17
+
+
+def test_compaction_rewrites_a_new_generation(tmp_path):
+    backend = NumpyFlatBackend(str(tmp_path))
+    ids, vectors = add_rows(backend, 20)
+    old_files = {manifest(str(tmp_path))["vectors"], manifest(str(tmp_path))["chunks"]}
+
+    backend.delete(ids[:6])  # more than a quarter of the rows
+
+    current = manifest(str(tmp_path))
+    assert current["generation"] == 1
+    assert current["deleted"] == []
+    assert current["count"] == 14
+    assert not old_files & set(os.listdir(str(tmp_path)))
+    for opened in (backend, NumpyFlatBackend(str(tmp_path))):
+        assert opened.count() == 14
+        assert opened.query(vectors[10], 1)[0]["id"] == ids[10]
+        assert opened.get([ids[10]])[0]["text"] == "text 10"
+        assert not opened.existing_ids(ids[:6])
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_compressed_dtypes_keep_the_nearest_row(tmp_path, dtype):
+    backend = NumpyFlatBackend(str(tmp_path), dtype=dtype)
+    ids, vectors = add_rows(backend, 200)
+
+    for row in (0, 57, 199):
+        hit = backend.query(vectors[row], 1)[0]
+        assert hit["id"] == ids[row]
+        assert hit["score"] == pytest.approx(1.0, abs=1e-2)
+
+
+def test_stored_dtype_wins_over_the_requested_one(tmp_path):
+    add_rows(NumpyFlatBackend(str(tmp_path), dtype="float16"), 5)
+
+    assert NumpyFlatBackend(str(tmp_path), dtype="float32").dtype == np.float16
+
+
+def test_dimension_mismatch_is_rejected(tmp_path):
+    backend = NumpyFlatBackend(str(tmp_path))
+    add_rows(backend, 3)
+
+    with pytest.raises(ValueError):
+        backend.add(["x"], ["x"], [{}], np.ones((1, 8), dtype=np.float32))
+
+
+def test_reads_during_compaction_never_mix_generations(tmp_path):
+    backend = NumpyFlatBackend(str(tmp_path))
+    ids, _ = add_rows(backend, 400)
+    mismatches = []
+    stop = threading.Event()
+
+    def read():
+        while not stop.is_set():
+            for hit in backend.get(ids[::7]) + backend.find({"source": "a.pdf"}, limit=50):
+                if isinstance(hit, dict) and hit["text"] != f"text {hit['id'][1:]}":
+                    mismatches.append(hit["id"])
+                elif isinstance(hit, tuple) and hit[1]["chunk_index"] != int(hit[0][1:]):
+                    mismatches.append(hit[0])
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        # every few deletes crosses the compaction threshold again
+        for start in range(0, 390, 10):
+            backend.delete(ids[start:start + 10])
+    finally:
+        stop.set()
+        reader.join()
+
+    assert mismatches == []
+    assert manifest(str(tmp_path))["generation"] > 1
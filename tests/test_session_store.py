@@ -0,0 +1,166 @@
+import multiprocessing
+import time
+
+import pytest
+
+from session_store import InMemorySessionStore, SQLiteSessionStore, create_session_store
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_sessions(request, tmp_path):
+    """
+    Factory of session stores of either kind; sqlite stores share one file.
+    """
+    def make(**kwargs):
+        return create_session_store(
+            request.param, path=str(tmp_path / "sessions.sqlite"), **kwargs
+        )
+
+    return make
+
+
+def user(content):
+    return {"role": "user", "content": content, "agent": None}
+
+
+def test_append_assigns_increasing_seq(make_sessions):
+    sessions = make_sessions()
+
+    stored = [sessions.append("s", user(f"turn {i}")) for i in range(3)]
+    sessions.append("other", user("elsewhere"))
+
+    assert [turn["seq"] for turn in stored] == [0, 1, 2]
+    assert [turn["content"] for turn in sessions.load("s")] == ["turn 0", "turn 1", "turn 2"]
+    assert [turn["seq"] for turn in sessions.load("s", limit=2)] == [1, 2]
+    assert sessions.load("other")[0]["seq"] == 0
+    assert sessions.load("unknown") == []
+
+
+def test_only_the_last_max_turns_are_kept(make_sessions):
+    sessions = make_sessions(max_turns=3)
+
+    for i in range(5):
+        sessions.append("s", user(f"turn {i}"))
+
+    assert [turn["seq"] for turn in sessions.load("s")] == [2, 3, 4]
+    assert sessions.append("s", user("next"))["seq"] == 5
+
+
+def test_summary_round_trip(make_sessions):
+    sessions = make_sessions()
+    sessions.append("s", user("hello"))
+
+    assert sessions.get_summary("s") is None
+    sessions.set_summary("s", "greeted", 0)
+    sessions.set_summary("unknown", "ignored", 0)
+
+    assert sessions.get_summary("s") == {"summary": "greeted", "upto_seq": 0}
+    assert sessions.get_summary("unknown") is None
+
+
+def test_delete_forgets_turns_and_summary(make_sessions):
+    sessions = make_sessions()
+    sessions.append("s", user("hello"))
+    sessions.set_summary("s", "greeted", 0)
+
+    sessions.delete("s")
+
+    assert sessions.load("s") == []
+    assert sessions.get_summary("s") is None
+    assert sessions.append("s", user("again"))["seq"] == 0
+
+
+def test_memory_store_expires_idle_sessions():
+    sessions = InMemorySessionStore(idle_ttl_seconds=0.01)
+    sessions.append("idle", user("hello"))
+    time.sleep(0.02)
+
+    sessions.append("active", user("hello"))
+
+    assert sessions.load("idle") == []
+    assert sessions.stats()["expired"] == 1
+
+
+def test_memory_store_evicts_least_recently_used():
+    sessions = InMemorySessionStore(max_sessions=2)
+    sessions.append("a", user("1"))
+    sessions.append("b", user("1"))
+    sessions.append("a", user("2"))
+
+    sessions.append("c", user("1"))
+
+    assert sessions.load("b") == []
+    assert len(sessions.load("a")) == 2
+    assert sessions.stats()["evicted"] == 1
+
+
+def test_memory_store_stays_within_its_byte_budget():
+    sessions = InMemorySessionStore(max_bytes=5000)
+
+    for i in range(50):
+        sessions.append(f"s{i}", user("x" * 500))
+    sessions.set_summary("s49", "y" * 100, 0)
+
+    stats = sessions.stats()
+    assert stats["bytes"] <= 5000
+    assert stats["sessions"] < 50
+    assert sessions.load("s49")
+
+
+def test_sqlite_store_survives_reopen(tmp_path):
+    path = str(tmp_path / "sessions.sqlite")
+    SQLiteSessionStore(path).append("s", user("hello"))
+
+    reopened = SQLiteSessionStore(path)
+
+    assert reopened.load("s")[0]["content"] == "hello"
+    assert reopened.append("s", user("again"))["seq"] == 1
+
+
+def test_sqlite_summary_never_moves_backwards(tmp_path):
+    sessions = SQLiteSessionStore(str(tmp_path / "sessions.sqlite"))
+    for i in range(10):
+        sessions.append("s", user(f"turn {i}"))
+
+    sessions.set_summary("s", "up to 7", 7)
+    # a slower worker finishing an older summary
+    sessions.set_summary("s", "up to 3", 3)
+
+    assert sessions.get_summary("s") == {"summary": "up to 7", "upto_seq": 7}
+
+
+def test_sqlite_store_purges_idle_sessions(tmp_path):
+    sessions = SQLiteSessionStore(str(tmp_path / "sessions.sqlite"), idle_ttl_seconds=0.01)
+    sessions.append("idle", user("hello"))
+    time.sleep(0.02)
+    sessions._last_purge = 0.0
+
+    sessions.append("active", user("hello"))
+
+    assert sessions.load("idle") == []
+    assert sessions.stats()["sessions"] == 1
+    assert sessions.expired == 1
+
+
+def _append_many(path, worker, count):
+    sessions = SQLiteSessionStore(path, max_turns=100)
+    for i in range(count):
+        sessions.append("shared", user(f"worker {worker} turn {i}"))
+
+
+def test_sqlite_appends_from_several_processes_get_distinct_seqs(tmp_path):
+    path = str(tmp_path / "sessions.sqlite")
+    SQLiteSessionStore(path)
+    ctx = multiprocessing.get_context("spawn")
+    workers = [ctx.Process(target=_append_many, args=(path, w, 25)) for w in range(3)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(60)
+
+    assert [process.exitcode for process in workers] == [0, 0, 0]
+    turns = SQLiteSessionStore(path, max_turns=100).load("shared")
+    assert [turn["seq"] for turn in turns] == list(range(75))
+    assert sorted(turn["content"] for turn in turns) == sorted(
+        f"worker {w} turn {i}" for w in range(3) for i in range(25)
+    )
@@ -0,0 +1,123 @@
+import threading
+import time
+
+from conftest import unit_vectors
+from rag.backends import InterProcessLock, NumpyFlatBackend
+
+
+def add_rows(backend, ids, seed=0, source="a.pdf"):
+    metas = [{"source": source, "doc_hash": f"h-{source}"} for _ in ids]
+    backend.add(ids, [f"text of {chunk_id}" for chunk_id in ids], metas,
+                unit_vectors(len(ids), seed=seed))
+
+
+def test_refresh_reports_writes_of_another_backend(tmp_path):
+    writer = NumpyFlatBackend(str(tmp_path))
+    reader = NumpyFlatBackend(str(tmp_path))
+    ids = [f"c{i}" for i in range(10)]
+
+    add_rows(writer, ids)
+    changes = reader.refresh()
+
+    assert [chunk_id for chunk_id, _, _ in changes.added] == ids
+    assert changes.added[0][1] == "text of c0"
+    assert reader.count() == 10
+    assert not reader.refresh()
+
+    writer.update_metadata(["c1"], [{"source": "b.pdf", "doc_hash": "h-b.pdf"}])
+    writer.delete(["c2"])
+    changes = reader.refresh()
+
+    assert changes.updated == [("c1", {"source": "b.pdf", "doc_hash": "h-b.pdf"})]
+    assert changes.removed == ["c2"]
+    assert not changes.reloaded
+    assert reader.find({"source": "b.pdf"})[0][0] == "c1"
+    assert reader.count() == 9
+
+
+def test_refresh_reloads_after_compaction(tmp_path):
+    writer = NumpyFlatBackend(str(tmp_path))
+    reader = NumpyFlatBackend(str(tmp_path))
+    ids = [f"c{i}" for i in range(8)]
+    add_rows(writer, ids)
+    reader.refresh()
+
+    writer.delete(ids[:4])  # more than a quarter: a new generation
+    changes = reader.refresh()
+
+    assert changes.reloaded
+    assert (changes.added, changes.updated, changes.removed) == ([], [], [])
+    assert reader.count() == 4
+    assert not reader.existing_ids(ids[:4])
+
+
+def test_interleaved_adds_keep_every_row(tmp_path):
+    first = NumpyFlatBackend(str(tmp_path))
+    second = NumpyFlatBackend(str(tmp_path))
+
+    add_rows(first, ["a0", "a1"], seed=1)
+    add_rows(second, ["b0", "b1"], seed=2)
+    add_rows(first, ["a2"], seed=3)
+
+    second.refresh()
+    for backend in (first, second, NumpyFlatBackend(str(tmp_path))):
+        assert backend.count() == 5
+        assert backend.existing_ids(["a0", "a1", "a2", "b0", "b1"]) == {
+            "a0", "a1", "a2", "b0", "b1"
+        }
+    vector = unit_vectors(2, seed=2)[1]
+    assert first.query(vector, 1)[0]["id"] == "b1"
+
+
+def test_inter_process_lock_is_reentrant_and_exclusive(tmp_path):
+    path = str(tmp_path / "writer.lock")
+    held = InterProcessLock(path)
+    # another open file description: excluded like another process
+    other = InterProcessLock(path)
+    acquired = threading.Event()
+
+    with held:
+        with held:
+            pass
+        # still held by the outer acquire
+        thread = threading.Thread(target=lambda: (other.acquire(), acquired.set()))
+        thread.start()
+        time.sleep(0.1)
+        assert not acquired.is_set()
+
+    thread.join(5)
+    assert acquired.is_set()
+    other.release()
+
+
+def test_store_sync_applies_other_writers_changes(make_store):
+    writer = make_store(dedup_threshold=0.8)
+    reader = make_store(dedup_threshold=0.8)
+    clause = (
+        "The borrower shall repay the loan in equated monthly instalments over the agreed "
+        "tenure and prepayment before the lock in period attracts a charge on the principal"
+    )
+    writer.add_documents([
+        {"id": "a0", "text": clause, "metadata": {"source": "a.pdf", "doc_hash": "ha"}},
+    ])
+    reader.sync(force=True)
+
+    assert [hit["id"] for hit in reader.search("borrower prepayment", k=1, mode="lexical")] == [
+        "a0"
+    ]
+
+    assert writer.deduplicate([
+        {"id": "b0", "text": clause + " today",
+         "metadata": {"source": "b.pdf", "doc_hash": "hb"}},
+    ]) == []
+    writer.apply_duplicate_refs()
+    reader.sync(force=True)
+
+    assert reader.has_document("hb", source="b.pdf")
+
+    writer.remove_source("a.pdf")
+    writer.remove_source("b.pdf")
+    reader.sync(force=True)
+
+    assert reader.search("borrower prepayment", k=1, mode="lexical") == []
+    assert not reader.has_document("hb")
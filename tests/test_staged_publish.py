@@ -0,0 +1,87 @@
+import pytest
+
+import rag.vector_store as vector_store_module
+
+
+def version(source, doc_hash, texts):
+    return [
+        {
+            "id": f"{doc_hash}-{i}",
+            "text": text,
+            "metadata": {"source": source, "doc_hash": doc_hash, "chunk_index": i},
+        }
+        for i, text in enumerate(texts)
+    ]
+
+
+def found(store, query, mode):
+    return {(hit["metadata"]["doc_hash"], hit["id"]) for hit in store.search(query, k=10, mode=mode)}
+
+
+@pytest.mark.parametrize("mode", ["dense", "lexical", "hybrid"])
+def test_staged_chunks_stay_hidden_until_published(make_store, mode):
+    store = make_store()
+    store.add_documents(version("a.pdf", "old", ["loan interest rate", "loan tenure"]))
+
+    store.add_documents(version("a.pdf", "new", ["loan interest rate revised"]), staged=True)
+
+    assert {doc_hash for doc_hash, _ in found(store, "loan interest", mode)} == {"old"}
+    assert store.has_document("old", source="a.pdf")
+    assert not store.has_document("new")
+
+    assert store.publish("a.pdf", "new") == 1
+
+    assert found(store, "loan interest", mode) == {("new", "new-0")}
+    assert not store.has_document("old")
+    assert store.has_document("new", source="a.pdf")
+
+
+def test_publish_is_seen_by_another_process(make_store):
+    writer = make_store()
+    reader = make_store()
+    writer.add_documents(version("a.pdf", "new", ["loan interest rate"]), staged=True)
+
+    reader.sync(force=True)
+    assert reader.search("loan interest", k=5, mode="hybrid") == []
+
+    writer.publish("a.pdf", "new")
+    reader.sync(force=True)
+    assert [hit["id"] for hit in reader.search("loan interest", k=5, mode="hybrid")] == ["new-0"]
+
+
+def test_failed_ingest_leaves_the_old_version_alone(make_store, monkeypatch, tmp_path):
+    store = make_store()
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"new content")
+    store.add_documents(version(str(pdf), "old", ["loan interest rate"]))
+
+    def broken(pdf_path, doc_hash, category):
+        yield from version(pdf_path, doc_hash, ["loan interest rate revised", "loan tenure"])
+        raise OSError("truncated file")
+
+    monkeypatch.setattr(vector_store_module, "iter_pdf_docs", broken)
+    with pytest.raises(OSError):
+        store.add_pdf(str(pdf), batch_size=1)
+
+    assert [hit["metadata"]["doc_hash"] for hit in store.search("loan", k=5)] == ["old"]
+    assert store.backend.count() == 1
+
+
+def test_add_pdf_replaces_the_old_version_in_one_step(make_store, monkeypatch, tmp_path):
+    store = make_store()
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"new content")
+    store.add_documents(version(str(pdf), "old", ["loan interest rate"]))
+    monkeypatch.setattr(
+        vector_store_module, "iter_pdf_docs",
+        lambda pdf_path, doc_hash, category: iter(
+            version(pdf_path, doc_hash, ["loan interest rate revised", "loan tenure", "emi"])
+        ),
+    )
+
+    assert store.add_pdf(str(pdf), batch_size=1) == 3
+
+    assert store.backend.count() == 3
+    assert {hit["metadata"]["doc_hash"] for hit in store.search("loan", k=5)} == {
+        vector_store_module.file_sha256(str(pdf))
+    }
@@ -0,0 +1,131 @@
+# tools/batch_chat.py
+"""
+Run a file of questions through POST /chat/batch.
+
+    python -m tools.batch_chat questions.jsonl --output answers.jsonl
+    python -m tools.batch_chat questions.txt --concurrency 32 --chunk-size 2000
+
+Input is JSON lines of {"session_id", "message", "id"?} (a multi-turn
+conversation is several lines with one session_id, in order), or plain
+text with one question per line, each in a session of its own. Items
+are sent --chunk-size at a time, one request after another, so the turns
+of a session stay in order across requests. Answers are written as JSON
+lines in completion order (each with "index" into the input file and
+"id"); a summary with throughput, errors and latency percentiles is
+printed at the end.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Dict, List
+
+import aiohttp
+
+from tools.load_driver import latency_summary
+
+
+def read_items(path: str) -> List[Dict]:
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                item = json.loads(line)
+                item.setdefault("id", str(number))
+            else:
+                item = {"session_id": f"batch-{number}", "message": line, "id": str(number)}
+            items.append(item)
+    return items
+
+
+async def run(args) -> Dict:
+    items = read_items(args.input)
+    output = open(args.output, "w", encoding="utf-8") if args.output else None
+    rows: List[Dict] = []
+    timeout = aiohttp.ClientTimeout(total=None, sock_read=args.timeout)
+    started = time.perf_counter()
+    try:
+        async with aiohttp.ClientSession(timeout=timeout) as http:
+            for offset in range(0, len(items), args.chunk_size):
+                chunk = items[offset:offset + args.chunk_size]
+                payload = {"items": chunk, "concurrency": args.concurrency}
+                async with http.post(f"{args.url}/chat/batch", json=payload) as resp:
+                    if resp.status != 200:
+                        raise RuntimeError(
+                            f"/chat/batch returned {resp.status}: {await resp.text()}"
+                        )
+                    async for raw in resp.content:
+                        if not raw.strip():
+                            continue
+                        row = json.loads(raw)
+                        row["index"] += offset
+                        rows.append(row)
+                        if output is not None:
+                            output.write(json.dumps(row) + "\n")
+                print(
+                    f"[BATCH] {len(rows)}/{len(items)} done "
+                    f"({time.perf_counter() - started:.1f}s)",
+                    file=sys.stderr,
+                )
+    finally:
+        if output is not None:
+            output.close()
+    elapsed = time.perf_counter() - started
+
+    ok = [row for row in rows if "error" not in row]
+    errors: Dict[str, int] = {}
+    for row in rows:
+        if "error" in row:
+            errors[row["error"]] = errors.get(row["error"], 0) + 1
+    per_agent: Dict[str, int] = {}
+    for row in ok:
+        per_agent[row["agent"]] = per_agent.get(row["agent"], 0) + 1
+    return {
+        "config": {
+            "url": args.url,
+            "input": args.input,
+            "concurrency": args.concurrency,
+            "chunk_size": args.chunk_size,
+        },
+        "items": len(items),
+        "answered": len(ok),
+        "errors": errors,
+        "cached": sum(1 for row in ok if row.get("cached")),
+        "per_agent": per_agent,
+        "elapsed_s": elapsed,
+        "throughput_items_per_sec": len(rows) / elapsed if elapsed else None,
+        # server-side turn time, and time waiting for a batch slot
+        "latency": latency_summary([row["timings"]["total_ms"] for row in ok]),
+        "batch_wait": latency_summary(
+            [row["timings"].get("batch_wait_ms", 0.0) for row in rows]
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk Q&A through /chat/batch.")
+    parser.add_argument("input", help="JSON lines of {session_id, message, id} or one question per line")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--output", default=None, help="write the answers here (JSON lines)")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="turns in flight on the server (default: BATCH_CONCURRENCY)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="items per request")
+    parser.add_argument("--timeout", type=float, default=300.0,
+                        help="max seconds between two answers")
+    parser.add_argument("--report", default=None, help="write the JSON summary here")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.report:
+        with open(args.report, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# tools/load_driver.py
+"""
+Replay multi-turn chat sessions against the running service.
+
+    python -m tools.load_driver --url http://127.0.0.1:8000 --concurrency 32 --sessions 200
+    python -m tools.load_driver --stream --output load.json
+
+Each session sends --turns messages one after another (a session never
+has two turns in flight); --concurrency sessions run at the same time.
+Reports throughput and p50/p95/p99 latency, overall and per agent, plus
+the mean server-side stage timings returned in each response.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from prompts import intent_router_examples
+
+FOLLOW_UPS = [
+    "can you explain that in simpler terms?",
+    "what documents would I need for that?",
+    "is there any penalty if I pay early?",
+    "thanks, and how long does it usually take?",
+]
+
+
+def build_script(rng: random.Random, turns: int, unwanted_share: float) -> List[str]:
+    """
+    One session: an opening question followed by follow-ups, mostly BFSI.
+    """
+    roll = rng.random()
+    if roll < unwanted_share:
+        intent = "unwanted"
+    elif roll < 0.3:
+        intent = "general"
+    else:
+        intent = "bfsi"
+    messages = [rng.choice(intent_router_examples[intent])]
+    while len(messages) < turns:
+        if rng.random() < 0.5:
+            messages.append(rng.choice(FOLLOW_UPS))
+        else:
+            messages.append(rng.choice(intent_router_examples["bfsi"]))
+    return messages
+
+
+def percentile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    index = min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def latency_summary(samples: List[float]) -> Dict:
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) if ordered else None,
+        "p50_ms": percentile(ordered, 0.50),
+        "p95_ms": percentile(ordered, 0.95),
+        "p99_ms": percentile(ordered, 0.99),
+    }
+
+
+async def send_turn(session: aiohttp.ClientSession, url: str, session_id: str,
+                    message: str, stream: bool) -> Dict:
+    payload = {"session_id": session_id, "message": message}
+    start = time.perf_counter()
+    result = {"ok": False, "agent": None, "cached": False, "timings": {},
+              "first_token_ms": None}
+    try:
+        if not stream:
+            async with session.post(f"{url}/chat", json=payload) as resp:
+                body = await resp.json(content_type=None)
+                result["status"] = resp.status
+                if resp.status == 200:
+                    result.update(ok=True, agent=body.get("agent"),
+                                  cached=body.get("cached", False),
+                                  timings=body.get("timings") or {})
+        else:
+            async with session.post(f"{url}/chat/stream", json=payload) as resp:
+                result["status"] = resp.status
+                event = None
+                async for raw in resp.content:
+                    line = raw.decode("utf-8").rstrip("\n")
+                    if line.startswith("event:"):
+                        event = line[6:].strip()
+                    elif line.startswith("data:"):
+                        if event == "token" and result["first_token_ms"] is None:
+                            result["first_token_ms"] = (time.perf_counter() - start) * 1000
+                        elif event == "done":
+                            done = json.loads(line[5:].strip())
+                            result.update(ok=True, agent=done.get("agent"),
+                                          cached=done.get("cached", False),
+                                          timings=done.get("timings") or {})
+                        elif event == "error":
+                            result["error"] = line[5:].strip()
+    except Exception as exc:
+        result["error"] = str(exc)
+    result["latency_ms"] = (time.perf_counter() - start) * 1000
+    return result
+
+
+async def run(args) -> Dict:
+    rng = random.Random(args.seed)
+    scripts = [build_script(rng, args.turns, args.unwanted_share) for _ in range(args.sessions)]
+    results: List[Dict] = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as http:
+        async def play(script: List[str]):
+            async with semaphore:
+                session_id = f"load-{uuid.uuid4().hex[:12]}"
+                for message in script:
+                    results.append(
+                        await send_turn(http, args.url, session_id, message, args.stream)
+                    )
+                    if args.think_ms:
+                        await asyncio.sleep(rng.uniform(0, 2 * args.think_ms) / 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(play(script) for script in scripts))
+        elapsed = time.perf_counter() - started
+
+    ok = [r for r in results if r["ok"]]
+    by_agent: Dict[str, List[Dict]] = {}
+    for r in ok:
+        by_agent.setdefault(r["agent"] or "unknown", []).append(r)
+
+    def stage_means(rows: List[Dict]) -> Dict:
+        sums: Dict[str, List[float]] = {}
+        for r in rows:
+            for key, value in r["timings"].items():
+                if isinstance(value, (int, float)):
+                    sums.setdefault(key, []).append(value)
+        return {key: sum(v) / len(v) for key, v in sorted(sums.items())}
+
+    report = {
+        "config": {
+            "url": args.url,
+            "concurrency": args.concurrency,
+            "sessions": args.sessions,
+            "turns": args.turns,
+            "stream": args.stream,
+        },
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(ok) / elapsed if elapsed else None,
+        "latency": latency_summary([r["latency_ms"] for r in ok]),
+        "per_agent": {
+            agent: dict(
+                latency_summary([r["latency_ms"] for r in rows]),
+                cached=sum(1 for r in rows if r["cached"]),
+                server_timings_mean_ms=stage_means(rows),
+            )
+            for agent, rows in sorted(by_agent.items())
+        },
+    }
+    if args.stream:
+        report["first_token"] = latency_summary(
+            [r["first_token_ms"] for r in ok if r["first_token_ms"] is not None]
+        )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-turn load driver for /chat.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="sessions in flight at the same time")
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=4, help="messages per session")
+    parser.add_argument("--think-ms", type=float, default=0.0,
+                        help="mean pause between the turns of a session")
+    parser.add_argument("--unwanted-share", type=float, default=0.05)
+    parser.add_argument("--stream", action="store_true", help="use /chat/stream")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="write the JSON report here")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
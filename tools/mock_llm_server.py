@@ -0,0 +1,204 @@
+# tools/mock_llm_server.py
+"""
+Local stand-in for an OpenAI-compatible chat completions API, for load
+tests that must not hit the real Hugging Face endpoint.
+
+    python -m tools.mock_llm_server --port 8001 --latency-ms 600 --tokens-per-sec 40
+    HF_BASE_URL=http://127.0.0.1:8001 uvicorn main:app
+
+Latency to the first token is drawn from --latency-dist (fixed, uniform,
+exponential or lognormal around --latency-ms), then tokens are produced
+at --tokens-per-sec, both for streamed and non-streamed responses.
+--error-rate makes that fraction of requests fail with --error-status.
+Routing prompts get a one-word intent picked by keyword, so the service
+exercises all three agents.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from prompts import intent_router_examples, supervisor_system_prompt
+
+_FILLER = (
+    "Based on the information available, the terms depend on the lender, "
+    "the applicant's credit profile and the tenure chosen. Interest is "
+    "usually charged on the outstanding principal, and prepayment or "
+    "foreclosure may carry a small fee. Please check the sanction letter "
+    "and the schedule of charges for the exact figures that apply to you."
+).split()
+
+
+class MockSettings:
+    def __init__(self, latency_dist: str = "lognormal", latency_ms: float = 500.0,
+                 latency_sigma: float = 0.5, tokens_per_sec: float = 50.0,
+                 answer_tokens: int = 120, error_rate: float = 0.0,
+                 error_status: int = 503, seed: Optional[int] = None):
+        self.latency_dist = latency_dist
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tokens_per_sec = tokens_per_sec
+        self.answer_tokens = answer_tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+
+    def first_token_delay(self) -> float:
+        """
+        Seconds before the first token.
+        """
+        mean = self.latency_ms / 1000.0
+        if self.latency_dist == "fixed":
+            return mean
+        if self.latency_dist == "uniform":
+            return self.rng.uniform(0.0, 2.0 * mean)
+        if self.latency_dist == "exponential":
+            return self.rng.expovariate(1.0 / mean) if mean > 0 else 0.0
+        # lognormal with median latency_ms: a realistic long right tail
+        return mean * self.rng.lognormvariate(0.0, self.latency_sigma)
+
+    def token_delay(self) -> float:
+        return 1.0 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+
+
+_KEYWORDS = {
+    intent: {w for example in examples for w in example.lower().split() if len(w) > 3}
+    for intent, examples in intent_router_examples.items()
+}
+
+
+def _classify(text: str) -> str:
+    words = set(text.lower().split())
+    scores = {intent: len(words & keywords) for intent, keywords in _KEYWORDS.items()}
+    best = max(scores, key=scores.get)
+    return best if scores[best] > 0 else "general"
+
+
+def _reply_tokens(messages: List[Dict], settings: MockSettings) -> List[str]:
+    system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    if system.strip() == supervisor_system_prompt.strip():
+        # the routing prompt puts the user message first
+        user = messages[-1]["content"] if messages else ""
+        return [_classify(user.split("Recent history:")[0])]
+    n = max(1, int(settings.rng.gauss(settings.answer_tokens, settings.answer_tokens / 4)))
+    return [(" " if i else "") + _FILLER[i % len(_FILLER)] for i in range(n)]
+
+
+def create_app(settings: MockSettings) -> FastAPI:
+    app = FastAPI(title="Mock chat completions")
+    stats = {"requests": 0, "errors": 0, "streams": 0}
+
+    def _chunk(completion_id: str, model: str, delta: Dict,
+               finish_reason: Optional[str] = None) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "system_fingerprint": "mock",
+            "choices": [
+                {"index": 0, "delta": delta, "finish_reason": finish_reason, "logprobs": None}
+            ],
+        }
+        return f"data: {json.dumps(payload)}\n\n"
+
+    @app.post("/v1/chat/completions")
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        model = body.get("model") or "mock"
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+        if settings.rng.random() < settings.error_rate:
+            stats["errors"] += 1
+            await asyncio.sleep(settings.first_token_delay() / 4)
+            return JSONResponse(
+                {"error": "mock upstream failure"}, status_code=settings.error_status
+            )
+
+        tokens = _reply_tokens(body.get("messages") or [], settings)
+        await asyncio.sleep(settings.first_token_delay())
+
+        if body.get("stream"):
+            stats["streams"] += 1
+
+            async def events():
+                yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+                for token in tokens:
+                    yield _chunk(completion_id, model, {"content": token})
+                    await asyncio.sleep(settings.token_delay())
+                yield _chunk(completion_id, model, {}, finish_reason="stop")
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(settings.token_delay() * len(tokens))
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "system_fingerprint": "mock",
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                    "logprobs": None,
+                }
+            ],
+            "usage": {
+                "prompt_tokens": 0,
+                "completion_tokens": len(tokens),
+                "total_tokens": len(tokens),
+            },
+        }
+
+    @app.get("/stats")
+    def get_stats():
+        return dict(stats)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible chat server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-dist", default="lognormal",
+                        choices=["fixed", "uniform", "exponential", "lognormal"])
+    parser.add_argument("--latency-ms", type=float, default=500.0,
+                        help="mean (median for lognormal) time to first token")
+    parser.add_argument("--latency-sigma", type=float, default=0.5,
+                        help="lognormal shape; larger means a longer tail")
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0)
+    parser.add_argument("--answer-tokens", type=int, default=120,
+                        help="mean answer length in tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    settings = MockSettings(
+        latency_dist=args.latency_dist,
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        tokens_per_sec=args.tokens_per_sec,
+        answer_tokens=args.answer_tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()